@@ -1,11 +1,28 @@
+import threading
 import streamlit as st
 from config.database import init_db
 from config.seed import seed_db
+from lib.parsers.base import BankParser
+from lib.pool import pool
 
 # Initialize database and seed
 init_db()
 seed_db()
 
+@st.cache_resource
+def warm_parsers():
+    """
+    Import the parsers and create their shared instances once per process,
+    in the background so the first page doesn't wait for them, and start
+    the warm parse workers
+    """
+    pool.start()
+    thread = threading.Thread(target=BankParser.warm, name="warm-parsers", daemon=True)
+    thread.start()
+    return thread
+
+warm_parsers()
+
 if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
 
@@ -16,13 +33,15 @@ def logout():
 login_page = st.Page('views/login.py', title="Log in", icon=":material/login:")
 logout_page = st.Page(logout, title="Log out", icon=":material/logout:")
 transformer_page = st.Page('views/transformer.py', title="Transformer", icon=":material/dashboard:")
+merge_page = st.Page('views/merge.py', title="Merge", icon=":material/merge:")
+history_page = st.Page('views/history.py', title="History", icon=":material/history:")
 admin_page = st.Page('views/admin.py', title="Admin", icon=":material/overview:")
 
 if st.session_state.logged_in:
     if st.session_state.username == "admin":
-        pg = st.navigation([transformer_page, admin_page, logout_page])
+        pg = st.navigation([transformer_page, merge_page, history_page, admin_page, logout_page])
     else:
-        pg = st.navigation([transformer_page, logout_page])
+        pg = st.navigation([transformer_page, merge_page, history_page, logout_page])
 else:
     pg = st.navigation([login_page])
 
@@ -1,15 +1,25 @@
-import requests
-import streamlit as st
-from typing import Dict
+import os
+from typing import Dict, List
 import time
+from lib import debug
+
+def api_key() -> str:
+    """
+    DataLab API key from DATALAB_API_KEY, falling back to the Streamlit secrets
+    """
+    key = os.environ.get("DATALAB_API_KEY")
+    if key:
+        return key
+
+    import streamlit as st
+    return st.secrets.datalab.api_key
+
+def request(endpoint: str, data: bytes) -> Dict:
+    """Submit the PDF to a DataLab endpoint and poll until the result is complete."""
+    import requests
 
-def parse(data: bytes) -> Dict:
-    """Call the DataLab API to recognize tables in the PDF."""
-    api_endpoint = "https://www.datalab.to/api/v1/table_rec"
-    api_key = st.secrets.datalab.api_key
-    
     headers = {
-        "X-Api-Key": api_key
+        "X-Api-Key": api_key()
     }
     # Read PDF bytes
     files = {
@@ -17,7 +27,7 @@ def parse(data: bytes) -> Dict:
     }
     
     try:
-        response = requests.post(api_endpoint, headers=headers, files=files)
+        response = requests.post(endpoint, headers=headers, files=files)
         response.raise_for_status()
         data = response.json()
         check_url = data['request_check_url']
@@ -31,16 +41,41 @@ def parse(data: bytes) -> Dict:
             data = check_response.json()
 
             if data['status'] == 'complete' and data['pages']:
-                tables = [table for page in data['pages'] for table in page['tables']]
-
-                return parse_tables(tables)
+                return data
             
-        st.error("DataLab API request timed out")
+        debug.error("DataLab API request timed out")
         return None
     except requests.exceptions.RequestException as e:
-        st.error(f"Error calling DataLab API: {str(e)}")
+        debug.error("Error calling DataLab API: %s", e)
         return None
 
+def parse(data: bytes) -> Dict:
+    """Call the DataLab API to recognize tables in the PDF."""
+    result = request("https://www.datalab.to/api/v1/table_rec", data)
+    if result is None:
+        return None
+
+    tables = [table for page in result['pages'] for table in page['tables']]
+
+    return parse_tables(tables)
+
+def ocr(data: bytes) -> List[Dict]:
+    """Call the DataLab API to OCR the PDF into text lines with their bounding boxes."""
+    result = request("https://www.datalab.to/api/v1/ocr", data)
+    if result is None:
+        return None
+
+    # Stack pages vertically so that y grows through the whole document
+    elements = []
+    offset = 0.0
+    for page in result['pages']:
+        for line in page['text_lines']:
+            x0, y0, x1, y1 = line['bbox']
+            elements.append({'text': line['text'], 'bbox': [x0, y0 + offset, x1, y1 + offset]})
+        offset += page['image_bbox'][3]
+
+    return elements
+
 def parse_tables(data: Dict) -> Dict:
     rows_data = []
 
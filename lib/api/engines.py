@@ -0,0 +1,161 @@
+import tempfile
+from typing import Callable, Dict, List, Optional
+
+from lib.api import datalab
+
+
+def _open(data: bytes):
+    # Imported on first use: it is the slowest import of the app
+    import pymupdf
+
+    with tempfile.NamedTemporaryFile(delete=True, suffix='.pdf') as temp_file:
+        temp_file.write(data)
+        temp_file.flush()
+        return pymupdf.open(temp_file.name)
+
+
+# Called after each page is extracted with (page index, page count, output of the page)
+PageCallback = Callable[[int, int, object], None]
+
+
+def _each_page(data: bytes, read: Callable, on_page: Optional[PageCallback]) -> List:
+    """
+    read applied to every page of the document, reporting each to on_page
+    """
+    doc = _open(data)
+    total = len(doc)
+    outputs = []
+    for index, page in enumerate(doc):
+        output = read(page)
+        if on_page:
+            on_page(index, total, output)
+        outputs.append(output)
+    return outputs
+
+
+class ExtractionEngine:
+    """
+    One way of turning PDF bytes into the input of a parser. Engines with the
+    same output shape are interchangeable; cost orders them within a chain.
+    """
+    name = ""
+    output = ""
+    cost = 0
+    remote = False
+
+    def extract(self, data: bytes, on_page: Optional[PageCallback] = None):
+        """
+        Output for the parser. on_page is told about each page as it is
+        extracted; remote engines, which get the document back at once,
+        don't report pages.
+        """
+        raise NotImplementedError
+
+
+class TextEngine(ExtractionEngine):
+    """
+    Plain text per page, in content-stream order
+    """
+    name = "text"
+    output = "pages"
+    cost = 1
+
+    def extract(self, data: bytes, on_page: Optional[PageCallback] = None) -> List[str]:
+        return _each_page(data, lambda page: page.get_text(), on_page)
+
+
+class SortedTextEngine(ExtractionEngine):
+    """
+    Plain text per page, with blocks reordered top to bottom, left to right.
+    Helps statements whose content stream is not in reading order.
+    """
+    name = "text_sorted"
+    output = "pages"
+    cost = 2
+
+    def extract(self, data: bytes, on_page: Optional[PageCallback] = None) -> List[str]:
+        return _each_page(data, lambda page: page.get_text(sort=True), on_page)
+
+
+class PositionalEngine(ExtractionEngine):
+    """
+    Words with their bounding boxes; pages are stacked vertically so that
+    y grows through the whole document
+    """
+    name = "positional"
+    output = "elements"
+    cost = 3
+
+    def extract(self, data: bytes, on_page: Optional[PageCallback] = None) -> List[Dict]:
+        elements = []
+        offset = 0.0
+        for words, height in _each_page(data, lambda page: (page.get_text("words"), page.rect.height), on_page):
+            for x0, y0, x1, y1, text, *_ in words:
+                elements.append({'text': text, 'bbox': [x0, y0 + offset, x1, y1 + offset]})
+            offset += height
+        return elements
+
+
+class TablesEngine(ExtractionEngine):
+    """
+    Rows of the tables found on each page, as col_<n> cells plus table_order
+    (the same shape as the DataLab table recognition)
+    """
+    name = "tables"
+    output = "rows"
+    cost = 5
+
+    def extract(self, data: bytes, on_page: Optional[PageCallback] = None) -> List[Dict]:
+        rows = []
+        order = 0
+        for tables in _each_page(data, lambda page: [table.extract() for table in page.find_tables().tables], on_page):
+            for table in tables:
+                for cells in table:
+                    row = {f"col_{index}": (cell or "").strip() for index, cell in enumerate(cells) if cell is not None}
+                    row['table_order'] = order
+                    rows.append(row)
+                order += 1
+        return rows
+
+
+class DatalabTablesEngine(ExtractionEngine):
+    """
+    Remote table recognition
+    """
+    name = "datalab"
+    output = "rows"
+    cost = 100
+    remote = True
+
+    def extract(self, data: bytes, on_page: Optional[PageCallback] = None) -> List[Dict]:
+        return datalab.parse(data)
+
+
+class DatalabOCREngine(ExtractionEngine):
+    """
+    Remote OCR: text lines with their bounding boxes
+    """
+    name = "datalab_ocr"
+    output = "elements"
+    cost = 100
+    remote = True
+
+    def extract(self, data: bytes, on_page: Optional[PageCallback] = None) -> List[Dict]:
+        return datalab.ocr(data)
+
+
+engines = {engine.name: engine for engine in (
+    TextEngine(),
+    SortedTextEngine(),
+    PositionalEngine(),
+    TablesEngine(),
+    DatalabTablesEngine(),
+    DatalabOCREngine(),
+)}
+
+
+def get_engine(name: str) -> ExtractionEngine:
+    if name in engines:
+        return engines[name]
+    else:
+        raise ValueError(f"No extraction engine named: {name}")
@@ -1,27 +1,74 @@
-import pymupdf
 import tempfile
 
-from typing import Dict
+from typing import Dict, List
+
+def _pymupdf():
+    # Imported on first use: it is the slowest import of the app
+    import pymupdf
+    return pymupdf
+
+def _call(fn, *args):
+    # pymupdf can't be used from several threads: the work goes to a warm
+    # worker of the pool, or is serialized where there is none
+    from lib.pool import call
+    return call(fn, *args)
+
+def _parse(data: bytes) -> Dict:
+    with tempfile.NamedTemporaryFile(delete=True, suffix='.pdf') as temp_file:
+        temp_file.write(data)
+        temp_file.flush()
+        doc = _pymupdf().open(temp_file.name)
+
+    return [page.get_text() for page in doc]
 
 def parse(data: bytes) -> Dict:
     """
     Parse tables in a PDF file
     """
+    return _call(_parse, data)
+
+def _stats(data: bytes) -> Dict:
     with tempfile.NamedTemporaryFile(delete=True, suffix='.pdf') as temp_file:
         temp_file.write(data)
         temp_file.flush()
-        doc = pymupdf.open(temp_file.name)
+        doc = _pymupdf().open(temp_file.name)
+        stats = { "pages": len(doc) }
 
-    return [page.get_text() for page in doc]
+    return stats
 
 def stats(data: bytes) -> Dict:
     """
     Get stats from a PDF file
     """
+    return _call(_stats, data)
+
+def _select_pages(data: bytes, pages: List[int]) -> bytes:
+    with tempfile.NamedTemporaryFile(delete=True, suffix='.pdf') as temp_file:
+        temp_file.write(data)
+        temp_file.flush()
+        doc = _pymupdf().open(temp_file.name)
+        doc.select(pages)
+        selected = doc.tobytes()
+
+    return selected
+
+def select_pages(data: bytes, pages: List[int]) -> bytes:
+    """
+    A new PDF with only the given pages (0-based) of the document
+    """
+    return _call(_select_pages, data, pages)
+
+def _first_page(data: bytes) -> str:
     with tempfile.NamedTemporaryFile(delete=True, suffix='.pdf') as temp_file:
         temp_file.write(data)
         temp_file.flush()
-        doc = pymupdf.open(temp_file.name)
-        stats = { "pages": len(doc) }
+        doc = _pymupdf().open(temp_file.name)
+        text = doc[0].get_text() if len(doc) else ""
 
-    return stats
+    return text
+
+def first_page(data: bytes) -> str:
+    """
+    Extract only the text of the first page, used for bank detection
+    """
+    return _call(_first_page, data)
@@ -0,0 +1,170 @@
+import os
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+from io import BytesIO
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from lib import debug
+from lib.api.file import first_page, stats
+from lib.conversion import Conversion, convert, conversion_stats
+from lib.executor import executor
+from lib.extraction import document_key
+from lib.export import export_rows, get_format
+from lib.parsers.base import BankParser
+from lib.parsers.watchdog import ParseGuardError
+
+# Files of a batch queued on the shared executor at a time; the executor
+# decides when each runs, fairly with the other users' conversions
+BATCH_WORKERS = int(os.environ.get("CONVERTER_BATCH_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+class BatchItem:
+    """
+    Outcome of one file of a batch: the bank it was converted as, its status
+    ("done", "failed" or "skipped"), the conversion and the diagnostics
+    """
+    def __init__(self, name: str, bank: Optional[str] = None):
+        self.name = name
+        self.bank = bank
+        self.status = "pending"
+        self.conversion: Optional[Conversion] = None
+        self.error: Optional[str] = None
+        self.stats: Dict = {}
+        self.diagnostics: List[Dict] = []
+        # Set when the accounts are moved out of the item (e.g. to the result store)
+        self.handle: Optional[str] = None
+        self.document_key: Optional[str] = None
+        self.account_count = 0
+
+    def stem(self) -> str:
+        return os.path.basename(self.name).rsplit('.', 1)[0]
+
+
+def _is_pdf(name: str) -> bool:
+    return name.lower().endswith('.pdf') and not os.path.basename(name).startswith('.') and '__MACOSX/' not in name
+
+
+def iter_documents(name: str, data: bytes) -> Iterator[Tuple[str, bytes]]:
+    """
+    PDFs of an upload: the file itself, or the PDF entries of a ZIP archive
+    read one at a time from memory
+    """
+    if not zipfile.is_zipfile(BytesIO(data)):
+        yield name, data
+        return
+
+    with zipfile.ZipFile(BytesIO(data)) as archive:
+        for entry in archive.infolist():
+            if entry.is_dir() or not _is_pdf(entry.filename):
+                continue
+            with archive.open(entry) as member:
+                yield entry.filename, member.read()
+
+
+def convert_document(name: str, data: bytes, bank_name: Optional[str] = None) -> BatchItem:
+    """
+    Convert one file of a batch, detecting its bank when none is given.
+    Never raises: failures are recorded on the item.
+    """
+    item = BatchItem(name, bank_name)
+    item.document_key = document_key(data)
+    with debug.capture() as diagnostics:
+        try:
+            if item.bank is None:
+                item.bank, _ = BankParser.detect_bank(first_page(data))
+            if item.bank is None:
+                item.status, item.error = "skipped", "Bank not recognised"
+            else:
+                item.conversion = convert(item.bank, data)
+                if item.conversion:
+                    item.status = "done"
+                    item.account_count = len(item.conversion.accounts)
+                    item.stats = stats(data)
+                    item.stats['bank'] = item.bank
+                    item.stats.update(conversion_stats(item.conversion))
+                else:
+                    item.status, item.error = "failed", "Nothing could be extracted"
+        except ParseGuardError as e:
+            item.status, item.error = "failed", str(e)
+        except Exception as e:
+            debug.error("Conversion of %s failed: %s", name, e)
+            item.status, item.error = "failed", f"{type(e).__name__}: {e}"
+    item.diagnostics = diagnostics.records()
+    return item
+
+
+def _pages(data: bytes) -> int:
+    """
+    Page count of a document, its cost on the executor; 0 when it can't be
+    read (its conversion then fails fast)
+    """
+    try:
+        return stats(data)["pages"]
+    except Exception:
+        return 0
+
+
+def process_batch(documents: Iterable[Tuple[str, bytes]], bank_name: Optional[str] = None, user: str = "batch",
+                  workers: int = BATCH_WORKERS, on_done: Optional[Callable[[BatchItem], None]] = None) -> List[BatchItem]:
+    """
+    Convert the documents as jobs of user on the shared executor, with at
+    most `workers` of them queued or running at a time. Documents are read
+    from the iterable only as jobs finish, so a large archive is never held
+    decompressed in full. on_done is called from the calling thread as each
+    file finishes. Items are returned in input order.
+    """
+    items = {}
+    documents = iter(documents)
+    order = 0
+
+    running = {}
+    exhausted = False
+    try:
+        while running or not exhausted:
+            while not exhausted and len(running) < workers:
+                document = next(documents, None)
+                if document is None:
+                    exhausted = True
+                    break
+                name, data = document
+                running[executor.submit(user, _pages(data), convert_document, name, data, bank_name)] = order
+                order += 1
+
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                items[running.pop(future)] = item = future.result()
+                if on_done:
+                    on_done(item)
+    finally:
+        # Files still queued when the caller goes away aren't converted
+        for future in running:
+            future.cancel()
+
+    return [items[index] for index in sorted(items)]
+
+
+def bundle(items: List[BatchItem], format_name: str = "xlsx",
+           load: Optional[Callable[[BatchItem], Optional[List]]] = None) -> bytes:
+    """
+    ZIP with the files of every converted account, named after their
+    document (document_account.ext). load gives the accounts of an item when
+    they aren't kept on its conversion.
+    """
+    export_format = get_format(format_name)
+    buffer = BytesIO()
+    used = set()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for item in items:
+            if item.status != "done":
+                continue
+            stem, suffix = item.stem(), 2
+            while stem in used:
+                stem, suffix = f"{item.stem()} ({suffix})", suffix + 1
+            used.add(stem)
+            accounts = load(item) if load else item.conversion.accounts
+            for number, account in enumerate(accounts or [], start=1):
+                with archive.open(f"{stem}_{number}.{export_format.extension}", 'w') as member:
+                    export_rows(account, format_name, member)
+    return buffer.getvalue()
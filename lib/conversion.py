@@ -0,0 +1,370 @@
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from lib import debug, extraction
+from lib.api.engines import get_engine
+from lib.api.file import select_pages
+from lib.pages import page_dates, parse_date
+from lib.parsers.accounts import AccountEntry, account_directory
+from lib.parsers.base import BankParser
+from lib.parsers.watchdog import ParseFailed, ParseGuardError, run_guarded
+from lib.progress import ConversionCancelled, Progress
+
+# Tolerance when checking that balances follow from the movements
+BALANCE_TOLERANCE = 0.01
+
+
+class Conversion:
+    """
+    Result of converting a document: the parsed accounts, the engine that
+    produced them, whether their balances reconcile and what each engine
+    tried before it did (engine name, outcome)
+    """
+    def __init__(self, accounts: List, engine: str, reconciled: bool, attempts: List[Tuple[str, str]]):
+        self.accounts = accounts
+        self.engine = engine
+        self.reconciled = reconciled
+        self.attempts = attempts
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def reconcile(accounts: List) -> bool:
+    """
+    Whether every printed SALDO equals the previous one plus CREDITOS minus
+    DEBITOS. Output that isn't in the canonical format can't be checked and
+    is accepted.
+    """
+    for account in accounts:
+        if not isinstance(account, list):
+            return True
+
+        previous = None
+        for row in account:
+            if not isinstance(row, dict) or "SALDO" not in row:
+                return True
+
+            saldo = row["SALDO"]
+            if not _is_number(saldo):
+                continue
+
+            debitos, creditos = row.get("DEBITOS"), row.get("CREDITOS")
+            movement = (creditos if _is_number(creditos) else 0) - (abs(debitos) if _is_number(debitos) else 0)
+            if previous is not None and abs(previous + movement - saldo) > BALANCE_TOLERANCE:
+                return False
+            previous = saldo
+
+    return True
+
+
+def _page_callback(bank_name: str, engine, progress: Optional[Progress], guarded: bool):
+    """
+    Page callback of an extraction reporting to progress. The first page of
+    page-text engines is parsed on its own right away for the preview.
+    """
+    if progress is None:
+        return None
+
+    def on_page(index: int, total: int, output) -> None:
+        progress.page(index, total, output)
+        if index == 0 and engine.output == "pages" and progress.wants_preview():
+            try:
+                accounts = _parse(bank_name, [output], guarded)
+            except Exception as e:
+                debug.debug("Preview parse of the first page failed: %s", e)
+                accounts = None
+            progress.preview(next((account for account in accounts or [] if account), []))
+
+    return on_page
+
+
+def convert(bank_name: str, data: bytes, guarded: bool = True, prefetched: Optional[Dict] = None,
+            verify: bool = True, progress: Optional[Progress] = None, locate: bool = True) -> Optional[Conversion]:
+    """
+    Extract and parse the document trying the engines of the bank cheapest
+    first. An engine whose output doesn't parse or doesn't reconcile falls
+    through to the next one; when none reconciles, the first parsed result is
+    returned. Returns None when no engine extracted anything, and raises the
+    last parse error when nothing could be parsed.
+    prefetched maps engine names to output already extracted from data.
+    Without verify the first parsed result is returned unchecked.
+    progress, when given, is told about every page and can cancel.
+    With locate, a guard tripping on the last engine reports its page.
+    """
+    prefetched = prefetched or {}
+    attempts = []
+    fallback = None
+    last_error = None
+
+    chain = BankParser.get_engine_chain(bank_name)
+    for position, engine in enumerate(chain):
+        if progress:
+            progress.start("extract", engine=engine.name)
+        try:
+            if engine.name in prefetched:
+                extracted = prefetched[engine.name]
+            else:
+                extracted = extraction.extract(data, engine.name, _page_callback(bank_name, engine, progress, guarded))
+        except ConversionCancelled:
+            raise
+        except Exception as e:
+            debug.warning("%s extraction failed: %s", engine.name, e)
+            attempts.append((engine.name, f"extraction failed: {e}"))
+            continue
+
+        if not extracted:
+            attempts.append((engine.name, "nothing extracted"))
+            continue
+
+        if progress:
+            progress.start("parse", engine=engine.name)
+        try:
+            if guarded:
+                accounts = run_guarded(bank_name, extracted, locate=locate and position == len(chain) - 1)
+            else:
+                accounts = BankParser.parse(bank_name, extracted)
+        except ParseGuardError as e:
+            last_error = e
+            attempts.append((engine.name, str(e)))
+            continue
+        except Exception as e:
+            last_error = ParseFailed(bank_name, f"{type(e).__name__}: {e}")
+            attempts.append((engine.name, str(last_error)))
+            continue
+
+        if not accounts:
+            attempts.append((engine.name, "no movements parsed"))
+            continue
+
+        if not verify or reconcile(accounts):
+            attempts.append((engine.name, "ok"))
+            if progress:
+                progress.finish()
+            return Conversion(accounts, engine.name, verify, attempts)
+
+        debug.warning("%s output of %s doesn't reconcile", engine.name, bank_name)
+        attempts.append((engine.name, "balances don't reconcile"))
+        if fallback is None:
+            fallback = Conversion(accounts, engine.name, False, attempts)
+
+    if fallback is not None:
+        return fallback
+    if last_error is not None:
+        raise last_error
+    return None
+
+
+def _parse(bank_name: str, pages: List[str], guarded: bool) -> List:
+    return run_guarded(bank_name, pages) if guarded else BankParser.parse(bank_name, pages)
+
+
+def convert_account(bank_name: str, pages: List[str], directory: List[AccountEntry], index: int, guarded: bool = True) -> List[Dict]:
+    """
+    Parse a single account of the directory. Only the first page (for the
+    statement header) and the pages of its section are parsed; when that
+    doesn't yield exactly the accounts starting on those pages, the whole
+    document is parsed instead. Raises ParseFailed when the parser doesn't
+    split the document into the accounts of the directory, rather than
+    returning another account's movements.
+    """
+    entry = directory[index]
+    subset = sorted({0} | set(range(entry.first_page, entry.last_page + 1)))
+    expected = [other.index for other in directory if other.first_page in subset]
+
+    if len(subset) < len(pages):
+        try:
+            accounts = _parse(bank_name, [pages[page] for page in subset], guarded)
+            if accounts and len(accounts) == len(expected):
+                return accounts[expected.index(index)]
+            debug.info("Partial parse of account %s found %s accounts instead of %s, parsing the whole document",
+                       index + 1, len(accounts or []), len(expected))
+        except Exception as e:
+            debug.info("Partial parse of account %s failed, parsing the whole document: %s", index + 1, e)
+
+    accounts = _parse(bank_name, pages, guarded)
+    if len(accounts or []) != len(directory):
+        raise ParseFailed(bank_name, f"the parser found {len(accounts or [])} accounts where the statement "
+                                     f"lists {len(directory)}; convert the whole statement instead")
+    return accounts[index]
+
+
+def _implied_opening(row: Dict) -> Optional[float]:
+    """
+    Balance right before a movement, following from its printed saldo and
+    amounts; None when it prints no saldo
+    """
+    if not _is_number(row.get("SALDO")):
+        return None
+    debitos = abs(row["DEBITOS"]) if _is_number(row.get("DEBITOS")) else 0
+    creditos = row["CREDITOS"] if _is_number(row.get("CREDITOS")) else 0
+    return round(row["SALDO"] - creditos + debitos, 2)
+
+
+def _opening_balance(before: List[Dict], window: List[Dict]):
+    """
+    Balance right before the first movement of the window: the saldo printed
+    on the last row before it. When that row prints none, it follows from the
+    first movement of the window, failing that from the last printed balance.
+    """
+    if before and _is_number(before[-1].get("SALDO")):
+        return before[-1]["SALDO"]
+    implied = _implied_opening(window[0]) if window else None
+    if implied is not None:
+        return implied
+    return next((row["SALDO"] for row in reversed(before) if _is_number(row.get("SALDO"))), "")
+
+
+def _consistent_opening(account: List[Dict]) -> bool:
+    """
+    Whether the opening balance of a filtered account agrees with what its
+    first movement implies (a parser that reads each movement against the
+    previous balance misreads it when that balance is missing)
+    """
+    if len(account) < 2:
+        return True
+    implied = _implied_opening(account[1])
+    if implied is None:
+        return True
+    opening = account[0]["SALDO"]
+    return _is_number(opening) and abs(opening - implied) <= BALANCE_TOLERANCE
+
+
+def filter_range(accounts: List, start: date, end: date) -> List:
+    """
+    Keep the movements dated within [start, end], each account opening with
+    its balance at the start of the window. Accounts whose dates can't be read
+    are kept whole.
+    """
+    filtered = []
+    for account in accounts:
+        if not isinstance(account, list) or not any(isinstance(row, dict) and parse_date(row.get("FECHA")) for row in account):
+            debug.warning("Dates of an account can't be read, it is kept whole")
+            filtered.append(account)
+            continue
+
+        dates = [parse_date(row.get("FECHA")) for row in account]
+        window = [row for row, day in zip(account, dates) if day and start <= day <= end]
+        first = next((position for position, day in enumerate(dates) if day and start <= day <= end), len(account))
+        before = [row for row, day in zip(account[:first], dates[:first]) if not day or day < start]
+
+        opening = {"FECHA": "", "DETALLE": "SALDO ANTERIOR", "REFERENCIA": "", "DEBITOS": "", "CREDITOS": "",
+                   "SALDO": _opening_balance(before, window)}
+        filtered.append([opening] + window)
+
+    return filtered
+
+
+def _window_pages(dates: List[Tuple], start: date, end: date, skip_before: bool) -> List[int]:
+    """
+    Pages needed for the window: the first one (statement header and opening
+    block), then, with skip_before, from the last page entirely before the
+    window (whose last balance opens it), up to the last page that isn't
+    entirely after it. Pages without dates never start or end a skipped run.
+    """
+    first = 1
+    if skip_before:
+        while first < len(dates) and dates[first][1] and dates[first][1] < start:
+            first += 1
+        first = max(1, first - 1)
+
+    # Trailing pages are dropped only if every later dated page is past the window
+    last = len(dates) - 1
+    while last >= first and dates[last][0] and dates[last][0] > end:
+        last -= 1
+
+    return [0] + list(range(first, last + 1)) if dates else []
+
+
+def convert_range(bank_name: str, data: bytes, start: date, end: date, guarded: bool = True,
+                  progress: Optional[Progress] = None) -> Optional[Conversion]:
+    """
+    Convert only the movements dated within [start, end].
+
+    A per-page date scan decides which pages are extracted and parsed: pages
+    entirely after the window are always left out, pages entirely before it
+    only for banks whose movements carry their printed balance, and the last
+    of those is kept for the balance opening the window. The trimmed result
+    is kept when every account reconciles within the window, its opening
+    balance agrees with its first movement and (after skipping earlier
+    pages) every movement has a printed balance; otherwise the whole
+    document is converted and filtered.
+    """
+    engine = get_engine("text")
+    if progress:
+        progress.start("extract", engine=engine.name)
+    texts = extraction.extract(data, engine.name, _page_callback(bank_name, engine, progress, guarded))
+    dates = [page_dates(text) for text in texts]
+    pages = _window_pages(dates, start, end, BankParser.prints_balances(bank_name))
+
+    if pages and len(pages) < len(texts):
+        skipped_before = len(pages) > 1 and pages[1] > 1
+        try:
+            # Skipped pages break the balance chain; it is checked after filtering
+            conversion = convert(bank_name, select_pages(data, pages), guarded, {"text": [texts[page] for page in pages]},
+                                 verify=False, progress=progress, locate=False)
+        except ParseGuardError as e:
+            debug.info("Parse of pages %s failed, converting the whole document: %s", pages, e)
+            conversion = None
+
+        if conversion:
+            accounts = filter_range(conversion.accounts, start, end)
+            valid = (all(reconcile([account]) and _consistent_opening(account) for account in accounts)
+                     and any(len(account) > 1 for account in accounts))
+            if valid and skipped_before:
+                valid = all(_is_number(row.get("SALDO")) for account in accounts for row in account[1:])
+            if valid:
+                debug.info("Converted %s of %s pages for the date range", len(pages), len(texts))
+                conversion.accounts = accounts
+                conversion.reconciled = True
+                return conversion
+            debug.info("Pages %s don't cover the date range consistently, converting the whole document", pages)
+
+    conversion = convert(bank_name, data, guarded, {"text": texts}, progress=progress)
+    if conversion:
+        conversion.accounts = filter_range(conversion.accounts, start, end)
+    return conversion
+
+
+def conversion_stats(conversion: Conversion) -> Dict:
+    """
+    Fields of a conversion recorded with the usage statistics
+    """
+    return {
+        "engine": conversion.engine,
+        "reconciled": conversion.reconciled,
+        "attempts": len(conversion.attempts)
+    }
+
+
+def can_reconvert(key: str, engine_name: str) -> bool:
+    """
+    Whether reconvert can work without the source document
+    """
+    return extraction.extraction_cache.get(key, engine_name) is not None
+
+
+def reconvert(bank_name: str, key: str, engine_name: str, date_range: Optional[Tuple[date, date]] = None,
+              account_indexes: Optional[List[int]] = None, guarded: bool = True,
+              source: Optional[bytes] = None) -> Optional[List]:
+    """
+    Parse a document again, to rebuild a result that was dropped: the whole
+    conversion, or only some accounts of the directory, filtered to
+    date_range when given. The cached extraction is used, or the source
+    document extracted again once evicted; None when there is neither.
+    """
+    extracted = extraction.extraction_cache.get(key, engine_name)
+    if extracted is None and source is not None:
+        extracted = extraction.extract(source, engine_name, key=key)
+    if not extracted:
+        return None
+
+    if account_indexes is not None:
+        directory = account_directory(bank_name, extracted)
+        accounts = [convert_account(bank_name, extracted, directory, index, guarded) for index in account_indexes]
+    else:
+        accounts = _parse(bank_name, extracted, guarded)
+    if accounts and date_range:
+        accounts = filter_range(accounts, *date_range)
+    return accounts
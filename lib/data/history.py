@@ -0,0 +1,130 @@
+import streamlit as st
+from typing import Dict, List, Optional
+from sqlalchemy import text
+
+from lib.results import pack, unpack
+
+
+class ConversionHistory:
+    def __init__(self):
+        # The table is created on first use, so importing doesn't connect
+        self._table_ready = False
+
+    def _ensure_table(self):
+        if not self._table_ready:
+            self._create_table_if_not_exists()
+            self._table_ready = True
+
+    def _create_table_if_not_exists(self):
+        """Create the conversions table if it doesn't exist"""
+        conn = st.connection('postgres')
+
+        try:
+            with conn.session as session:
+                session.execute(text("""
+                    CREATE TABLE IF NOT EXISTS conversions (
+                        id SERIAL PRIMARY KEY,
+                        user_name TEXT NOT NULL,
+                        document_hash TEXT NOT NULL,
+                        bank TEXT NOT NULL,
+                        scope TEXT NOT NULL DEFAULT '',
+                        file_name TEXT,
+                        accounts INTEGER,
+                        movements INTEGER,
+                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        output BYTEA,
+                        UNIQUE (document_hash, user_name, bank, scope)
+                    )
+                """))
+                session.commit()
+        except Exception as e:
+            raise e
+
+    def record(self, document_hash: str, bank: str, file_name: str, accounts: List, scope: str = "") -> None:
+        """
+        Store the canonical output of a conversion for the current user,
+        replacing an earlier conversion of the same document, bank and scope
+        (e.g. a date range or a selection of accounts)
+        """
+        self._ensure_table()
+        username = st.session_state.get('username', 'anonymous')
+        conn = st.connection('postgres')
+
+        try:
+            with conn.session as session:
+                session.execute(
+                    text("""
+                    INSERT INTO conversions (user_name, document_hash, bank, scope, file_name, accounts, movements, output, timestamp)
+                    VALUES (:user, :document_hash, :bank, :scope, :file_name, :accounts, :movements, :output, CURRENT_TIMESTAMP)
+                    ON CONFLICT (document_hash, user_name, bank, scope) DO UPDATE
+                    SET file_name = EXCLUDED.file_name, accounts = EXCLUDED.accounts, movements = EXCLUDED.movements,
+                        output = EXCLUDED.output, timestamp = CURRENT_TIMESTAMP
+                    """),
+                    {
+                        'user': username,
+                        'document_hash': document_hash,
+                        'bank': bank,
+                        'scope': scope,
+                        'file_name': file_name,
+                        'accounts': len(accounts),
+                        'movements': sum(len(account) for account in accounts if isinstance(account, list)),
+                        'output': pack(accounts)
+                    }
+                )
+                session.commit()
+        except Exception as e:
+            raise e
+
+    def get_user_history(self, username: Optional[str] = None) -> List[Dict]:
+        """
+        Past conversions of a user, newest first, without their output
+        """
+        self._ensure_table()
+        username = username or st.session_state.get('username', 'anonymous')
+        conn = st.connection('postgres')
+
+        with conn.session as session:
+            result = session.execute(text("""
+                SELECT id, timestamp, file_name, bank, scope, accounts, movements, document_hash
+                FROM conversions
+                WHERE user_name = :username
+                ORDER BY timestamp DESC
+            """),
+            {'username': username}
+            )
+
+            return [{
+                'id': record[0],
+                'timestamp': record[1],
+                'file_name': record[2],
+                'bank': record[3],
+                'scope': record[4],
+                'accounts': record[5],
+                'movements': record[6],
+                'document_hash': record[7]
+            } for record in result.fetchall()]
+
+    def load(self, conversion_id: int, username: Optional[str] = None) -> Optional[List]:
+        """
+        Output of a past conversion of the user, None when there is none
+        """
+        self._ensure_table()
+        username = username or st.session_state.get('username', 'anonymous')
+        conn = st.connection('postgres')
+
+        with conn.session as session:
+            record = session.execute(text("""
+                SELECT output
+                FROM conversions
+                WHERE id = :id AND user_name = :username
+            """),
+            {'id': conversion_id, 'username': username}
+            ).fetchone()
+
+        if record is None or record[0] is None:
+            return None
+        return unpack(bytes(record[0]))
+
+
+# Create a global instance of the conversion history
+conversion_history = ConversionHistory()
@@ -4,16 +4,32 @@ from typing import Dict, Optional
 from sqlalchemy import text
 
 class UsageTracker:
-    def __init__(self):
-        # Ensure the table exists
-        self._create_table_if_not_exists()
+    def __init__(self, database_url: Optional[str] = None):
+        # Outside Streamlit (e.g. the HTTP API) a database URL is given
+        # instead of using the app's connection
+        self.database_url = database_url
+        self._engine = None
+        # The table is created on first use, so importing doesn't connect
+        self._table_ready = False
+
+    def _session(self):
+        if self.database_url is None:
+            return st.connection('postgres').session
+        if self._engine is None:
+            from sqlalchemy import create_engine
+            self._engine = create_engine(self.database_url, pool_pre_ping=True)
+        from sqlalchemy.orm import Session
+        return Session(self._engine)
+
+    def _ensure_table(self):
+        if not self._table_ready:
+            self._create_table_if_not_exists()
+            self._table_ready = True
 
     def _create_table_if_not_exists(self):
         """Create the usages table if it doesn't exist"""
-        conn = st.connection('postgres')
-
         try:
-            with conn.session as session:
+            with self._session() as session:
                 session.execute(text("""
                     CREATE TABLE IF NOT EXISTS usages (
                         id SERIAL PRIMARY KEY,
@@ -26,15 +42,15 @@ class UsageTracker:
         except Exception as e:
             raise e
 
-    def record_conversion(self, stats: Dict) -> None:
+    def record_conversion(self, stats: Dict, username: Optional[str] = None) -> None:
         """
-        Record a conversion event for the current user in the database
+        Record a conversion event for the given or current user in the database
         """
-        username = st.session_state.get('username', 'anonymous')
-        conn = st.connection('postgres')
-        
+        self._ensure_table()
+        username = username or st.session_state.get('username', 'anonymous')
+
         try:
-            with conn.session as session:
+            with self._session() as session:
                 session.execute(
                     text("""
                     INSERT INTO usages (user_name, stats, timestamp)
@@ -50,10 +66,10 @@ class UsageTracker:
         """
         Get usage statistics for a specific user or current user from database
         """
+        self._ensure_table()
         username = username or st.session_state.get('username', 'anonymous')
-        conn = st.connection('postgres')
 
-        with conn.session as session:
+        with self._session() as session:
             result = session.execute(text("""
                 SELECT timestamp, stats
                 FROM usages
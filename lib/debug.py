@@ -0,0 +1,103 @@
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40, "off": 100}
+
+# Minimum level recorded, e.g. CONVERTER_DEBUG_LEVEL=debug
+LEVEL = os.environ.get("CONVERTER_DEBUG_LEVEL", "warning").lower()
+# Records kept per channel; older ones are dropped
+MAX_RECORDS = 500
+# Characters kept per message
+MAX_LENGTH = 2000
+
+
+class DebugChannel:
+    """
+    Bounded, level-gated diagnostics buffer. Messages below the level are
+    never formatted; the rest are truncated and only the latest max_records
+    are kept, so the UI can render them on demand.
+    """
+    def __init__(self, level: str = LEVEL, max_records: int = MAX_RECORDS, max_length: int = MAX_LENGTH):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown debug level: {level}")
+        self.level = level
+        self.max_length = max_length
+        self._threshold = LEVELS[level]
+        self._records = deque(maxlen=max_records)
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def enabled(self, level: str) -> bool:
+        return LEVELS[level] >= self._threshold
+
+    def log(self, level: str, message: str, *args) -> None:
+        if not self.enabled(level):
+            return
+        text = message % args if args else message
+        if len(text) > self.max_length:
+            text = text[:self.max_length] + f"... ({len(text) - self.max_length} more characters)"
+        self.extend([{"level": level, "message": text}])
+
+    def extend(self, records: Iterable[Dict]) -> None:
+        with self._lock:
+            for record in records:
+                if len(self._records) == self._records.maxlen:
+                    self._dropped += 1
+                self._records.append(record)
+
+    def records(self) -> List[Dict]:
+        with self._lock:
+            return list(self._records)
+
+    @property
+    def dropped(self) -> int:
+        return self._dropped
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+            self._dropped = 0
+
+
+_default = DebugChannel()
+_current: ContextVar[Optional[DebugChannel]] = ContextVar("debug_channel", default=None)
+
+
+def channel() -> DebugChannel:
+    """
+    The channel of the current context, or the process-wide one
+    """
+    return _current.get() or _default
+
+
+@contextmanager
+def capture(level: str = LEVEL):
+    """
+    Route diagnostics of the enclosed code (e.g. one conversion) to a fresh channel
+    """
+    new_channel = DebugChannel(level)
+    token = _current.set(new_channel)
+    try:
+        yield new_channel
+    finally:
+        _current.reset(token)
+
+
+def debug(message: str, *args) -> None:
+    channel().log("debug", message, *args)
+
+
+def info(message: str, *args) -> None:
+    channel().log("info", message, *args)
+
+
+def warning(message: str, *args) -> None:
+    channel().log("warning", message, *args)
+
+
+def error(message: str, *args) -> None:
+    channel().log("error", message, *args)
@@ -0,0 +1,132 @@
+import contextvars
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from lib import debug
+
+# Conversions running at the same time across every session of the server
+CONCURRENCY = int(os.environ.get("CONVERTER_CONCURRENCY", max(1, (os.cpu_count() or 2) // 2)))
+# Pages a queued job gains per second of waiting, so large jobs can't starve
+AGING_PAGES_PER_SECOND = float(os.environ.get("CONVERTER_AGING_PAGES_PER_SECOND", 5))
+
+
+class Job:
+    def __init__(self, user: str, cost: int, fn: Callable, args, kwargs, sequence: int):
+        self.user = user
+        self.cost = cost
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.sequence = sequence
+        self.submitted = time.monotonic()
+        self.future = Future()
+        # Runs in the submitter's context, so e.g. its debug channel gets the records
+        self.context = contextvars.copy_context()
+
+
+class FairExecutor:
+    """
+    Server-wide executor for conversions. A free worker takes the queued job
+    of the user with the fewest running jobs, and among those the one with
+    the fewest pages (shortest job first), so a small statement never waits
+    behind a large one and no user can fill every worker. Waiting jobs age
+    so large ones still get their turn.
+    """
+    def __init__(self, max_workers: int = CONCURRENCY, aging: float = AGING_PAGES_PER_SECOND):
+        self.max_workers = max_workers
+        self.aging = aging
+        self._queue: List[Job] = []
+        self._jobs: Dict[Future, Job] = {}
+        self._running: Dict[str, int] = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._workers: List[threading.Thread] = []
+
+    def submit(self, user: str, cost: int, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Queue fn(*args, **kwargs) for user; cost is its size in pages
+        """
+        job = Job(user, max(cost, 0), fn, args, kwargs, next(self._sequence))
+        with self._condition:
+            self._queue.append(job)
+            self._jobs[job.future] = job
+            self._start_workers()
+            self._condition.notify()
+        return job.future
+
+    def position(self, future: Future) -> Optional[int]:
+        """
+        Jobs that would start before this one if a worker freed up now (0 is
+        next); None once it is running or finished
+        """
+        with self._condition:
+            job = self._jobs.get(future)
+            if job is None or job not in self._queue:
+                return None
+            now = time.monotonic()
+            ranked = sorted(self._queue, key=lambda queued: self._priority(queued, now))
+            return ranked.index(job)
+
+    def stats(self) -> Dict:
+        with self._condition:
+            return {
+                "workers": self.max_workers,
+                "running": sum(self._running.values()),
+                "queued": len(self._queue),
+                "running_by_user": {user: count for user, count in self._running.items() if count}
+            }
+
+    def _priority(self, job: Job, now: float):
+        return (self._running.get(job.user, 0), job.cost - (now - job.submitted) * self.aging, job.sequence)
+
+    def _start_workers(self) -> None:
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, name=f"converter-{len(self._workers)}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _next(self) -> Job:
+        with self._condition:
+            while True:
+                # Cancelled jobs leave the queue here
+                for job in [job for job in self._queue if job.future.cancelled()]:
+                    self._queue.remove(job)
+                    self._jobs.pop(job.future, None)
+                if self._queue:
+                    now = time.monotonic()
+                    job = min(self._queue, key=lambda queued: self._priority(queued, now))
+                    self._queue.remove(job)
+                    if job.future.set_running_or_notify_cancel():
+                        self._running[job.user] = self._running.get(job.user, 0) + 1
+                        return job
+                    self._jobs.pop(job.future, None)
+                    continue
+                self._condition.wait()
+
+    def _work(self) -> None:
+        try:
+            while True:
+                job = self._next()
+                try:
+                    job.future.set_result(job.context.run(job.fn, *job.args, **job.kwargs))
+                except BaseException as e:
+                    debug.debug("Job of %s failed: %s", job.user, e)
+                    job.future.set_exception(e)
+                    # SystemExit and the like still end the worker, once the job is resolved
+                    if not isinstance(e, Exception):
+                        raise
+                finally:
+                    with self._condition:
+                        self._running[job.user] -= 1
+                        self._jobs.pop(job.future, None)
+        finally:
+            # The next submit starts a replacement
+            with self._condition:
+                self._workers.remove(threading.current_thread())
+
+
+executor = FairExecutor()
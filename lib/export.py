@@ -0,0 +1,390 @@
+import importlib.util
+from io import BytesIO
+from itertools import chain
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional
+
+from lib.pages import parse_date
+from lib.parsers.patterns import PatternRegistry
+
+# Canonical columns of the parser output
+COLUMNS = ["FECHA", "DETALLE", "REFERENCIA", "DEBITOS", "CREDITOS", "SALDO"]
+AMOUNT_COLUMNS = ("DEBITOS", "CREDITOS", "SALDO")
+
+DATE_FORMAT = "DD/MM/YYYY"
+AMOUNT_FORMAT = "#,##0.00"
+
+# Excel caps sheet names at 31 characters and forbids some of them
+SHEET_NAME_LENGTH = 31
+SHEET_NAME_FORBIDDEN = '[]:*?/\\'
+
+# Rows per record batch of the Arrow based formats
+ARROW_BATCH_ROWS = 8192
+
+EXCEL_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+patterns = PatternRegistry("Export", {
+    # Amounts as some parsers leave them: 1.234,56, -1234,5, $ 12,00 or 1.234,56-
+    "amount": r'([-−]?)\s*\$?\s*(\d{1,3}(?:\.\d{3})+|\d+)(?:,(\d+))?\s*(-?)',
+})
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def parse_amount(value) -> Optional[float]:
+    """
+    Number of an amount cell: numbers as they are, strings written the
+    Argentine way (dot thousands, comma decimals) parsed; None otherwise
+    """
+    if _is_number(value):
+        return float(value)
+    match = patterns.fullmatch("amount", value.strip()) if isinstance(value, str) else None
+    if not match:
+        return None
+    sign, whole, decimals, trailing = match.groups()
+    amount = float(whole.replace('.', '') + '.' + (decimals or '0'))
+    return -amount if sign or trailing else amount
+
+
+def columns(rows: List[Dict]) -> List[str]:
+    """
+    Canonical columns when the rows have them, else the keys of the first row
+    """
+    if not rows or all(column in rows[0] for column in COLUMNS):
+        return COLUMNS
+    return list(rows[0].keys())
+
+
+def sheet_name(label: str, used: set) -> str:
+    """
+    Valid sheet name for label, unique among the used ones
+    """
+    name = ''.join('_' if char in SHEET_NAME_FORBIDDEN else char for char in label)[:SHEET_NAME_LENGTH] or "Sheet"
+    base, suffix = name, 2
+    while name in used:
+        tail = f" ({suffix})"
+        name = base[:SHEET_NAME_LENGTH - len(tail)] + tail
+        suffix += 1
+    used.add(name)
+    return name
+
+
+class ExcelWriter:
+    """
+    Write-only workbook: rows go straight from the parser output to the file
+    without openpyxl building a cell object model, so memory stays flat
+    however long the account. Dates and amounts are written as typed cells.
+    """
+    def __init__(self):
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+
+        self._cell = WriteOnlyCell
+        self._bold = Font(bold=True)
+        self.workbook = Workbook(write_only=True)
+        self.used_names = set()
+
+    def _header(self, sheet, names: List[str]) -> List:
+        header = []
+        for name in names:
+            cell = self._cell(sheet, value=name)
+            cell.font = self._bold
+            header.append(cell)
+        return header
+
+    def _typed(self, sheet, column: str, value):
+        if value == "" or value is None:
+            return None
+        if column == "FECHA":
+            day = parse_date(value)
+            if day:
+                cell = self._cell(sheet, value=day)
+                cell.number_format = DATE_FORMAT
+                return cell
+        if column in AMOUNT_COLUMNS:
+            amount = parse_amount(value)
+            if amount is not None:
+                cell = self._cell(sheet, value=amount)
+                cell.number_format = AMOUNT_FORMAT
+                return cell
+        return value
+
+    def add_sheet(self, label: str, rows: Iterable[Dict], names: Optional[List[str]] = None) -> int:
+        """
+        Append a sheet with the rows; returns how many were written
+        """
+        rows = iter(rows)
+        first = next(rows, None)
+        names = names or columns([first] if first else [])
+
+        sheet = self.workbook.create_sheet(sheet_name(label, self.used_names))
+        sheet.append(self._header(sheet, names))
+
+        written = 0
+        for row in chain([first] if first else [], rows):
+            sheet.append([self._typed(sheet, name, row.get(name)) for name in names])
+            written += 1
+        return written
+
+    def add_summary(self, summaries: List[Dict]) -> None:
+        """
+        Summary sheet with a row per account, placed before the accounts
+        """
+        names = ["ACCOUNT", "MOVEMENTS", "FIRST DATE", "LAST DATE", "OPENING", "DEBITOS", "CREDITOS", "CLOSING"]
+        sheet = self.workbook.create_sheet(sheet_name("Summary", self.used_names), 0)
+        sheet.append(self._header(sheet, names))
+        for summary in summaries:
+            row = []
+            for name in names:
+                value = summary.get(name)
+                if isinstance(value, float):
+                    cell = self._cell(sheet, value=value)
+                    cell.number_format = AMOUNT_FORMAT
+                    value = cell
+                elif name.endswith("DATE") and value:
+                    cell = self._cell(sheet, value=value)
+                    cell.number_format = DATE_FORMAT
+                    value = cell
+                row.append(value)
+            sheet.append(row)
+
+    def save(self, output=None):
+        """
+        Write the workbook to output (path or file object), or return its bytes
+        """
+        if output is not None:
+            self.workbook.save(output)
+            return None
+        buffer = BytesIO()
+        self.workbook.save(buffer)
+        return buffer.getvalue()
+
+
+def account_summary(label: str, rows: List[Dict]) -> Dict:
+    """
+    Movement count, date span, balances and totals of an account
+    """
+    dates = [day for day in (parse_date(row.get("FECHA")) for row in rows) if day]
+    saldos = [saldo for saldo in (parse_amount(row.get("SALDO")) for row in rows) if saldo is not None]
+    debitos = [abs(debito) for debito in (parse_amount(row.get("DEBITOS")) for row in rows) if debito is not None]
+    creditos = [credito for credito in (parse_amount(row.get("CREDITOS")) for row in rows) if credito is not None]
+    return {
+        "ACCOUNT": label,
+        "MOVEMENTS": len(debitos) + len(creditos),
+        "FIRST DATE": min(dates) if dates else None,
+        "LAST DATE": max(dates) if dates else None,
+        "OPENING": float(saldos[0]) if saldos else None,
+        "DEBITOS": float(round(sum(debitos), 2)),
+        "CREDITOS": float(round(sum(creditos), 2)),
+        "CLOSING": float(saldos[-1]) if saldos else None
+    }
+
+
+def excel_account(rows: Iterable[Dict], label: str = "Movimientos", output=None):
+    """
+    Workbook with a single account
+    """
+    writer = ExcelWriter()
+    writer.add_sheet(label, rows)
+    return writer.save(output)
+
+
+def excel_workbook(accounts: List[List[Dict]], labels: Optional[List[str]] = None, summary: bool = True, output=None):
+    """
+    One workbook with a sheet per account, preceded by a summary sheet
+    """
+    labels = labels or [f"Account {index + 1}" for index in range(len(accounts))]
+    writer = ExcelWriter()
+    for label, rows in zip(labels, accounts):
+        writer.add_sheet(label, rows)
+    if summary:
+        writer.add_summary([account_summary(label, rows) for label, rows in zip(labels, accounts)])
+    return writer.save(output)
+
+
+def _plain(column: str, value):
+    """
+    Value of a cell for the line and columnar formats: ISO dates, amounts as
+    numbers (kept as written when they aren't one) and empty cells as None
+    """
+    if value == "" or value is None:
+        return None
+    if column == "FECHA":
+        day = parse_date(value)
+        return day.isoformat() if day else value
+    if column in AMOUNT_COLUMNS:
+        amount = parse_amount(value)
+        if amount is not None:
+            return amount
+    return value if isinstance(value, str) else str(value)
+
+
+def _peek(rows: Iterable[Dict], names: Optional[List[str]]):
+    """
+    Columns to write (from the first row when not given) and the rows, still
+    unconsumed
+    """
+    if names:
+        return names, rows
+    rows = iter(rows)
+    first = next(rows, None)
+    return columns([first] if first else []), chain([first] if first else [], rows)
+
+
+def _records(rows: Iterable[Dict], names: List[str]) -> Iterable[Dict]:
+    # Ledgers repeat few distinct dates, each is parsed once
+    dates = {}
+    for row in rows:
+        record = {}
+        for name in names:
+            value = row.get(name)
+            if name == "FECHA" and isinstance(value, str):
+                if value not in dates:
+                    dates[value] = _plain(name, value)
+                record[name] = dates[value]
+            else:
+                record[name] = _plain(name, value)
+        yield record
+
+
+def write_csv(rows: Iterable[Dict], output: BinaryIO, names: Optional[List[str]] = None) -> int:
+    import csv
+    from io import TextIOWrapper
+
+    names, rows = _peek(rows, names)
+    text = TextIOWrapper(output, encoding='utf-8', newline='', write_through=True)
+    writer = csv.DictWriter(text, fieldnames=names)
+    writer.writeheader()
+    written = 0
+    for record in _records(rows, names):
+        writer.writerow(record)
+        written += 1
+    text.detach()
+    return written
+
+
+def write_jsonl(rows: Iterable[Dict], output: BinaryIO, names: Optional[List[str]] = None) -> int:
+    import json
+
+    names, rows = _peek(rows, names)
+    written = 0
+    for record in _records(rows, names):
+        output.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+        written += 1
+    return written
+
+
+def _arrow_schema(names: List[str]):
+    import pyarrow as pa
+
+    types = {"FECHA": pa.string()} | {column: pa.float64() for column in AMOUNT_COLUMNS}
+    return pa.schema([(name, types.get(name, pa.string())) for name in names])
+
+
+def _arrow_batches(rows: Iterable[Dict], names: List[str]):
+    import pyarrow as pa
+
+    schema = _arrow_schema(names)
+    batch = {name: [] for name in names}
+    size = 0
+    amounts = [name for name in names if name in AMOUNT_COLUMNS]
+    for record in _records(rows, names):
+        # Amount columns are typed: what isn't a number can't be stored in them
+        for name in amounts:
+            if isinstance(record[name], str):
+                record[name] = None
+        for name in names:
+            batch[name].append(record[name])
+        size += 1
+        if size == ARROW_BATCH_ROWS:
+            yield pa.RecordBatch.from_pydict(batch, schema=schema)
+            batch = {name: [] for name in names}
+            size = 0
+    if size:
+        yield pa.RecordBatch.from_pydict(batch, schema=schema)
+
+
+def write_parquet(rows: Iterable[Dict], output: BinaryIO, names: Optional[List[str]] = None) -> int:
+    import pyarrow.parquet as pq
+
+    names, rows = _peek(rows, names)
+    written = 0
+    with pq.ParquetWriter(output, _arrow_schema(names)) as writer:
+        for batch in _arrow_batches(rows, names):
+            writer.write_batch(batch)
+            written += batch.num_rows
+    return written
+
+
+def write_arrow(rows: Iterable[Dict], output: BinaryIO, names: Optional[List[str]] = None) -> int:
+    import pyarrow as pa
+
+    names, rows = _peek(rows, names)
+    written = 0
+    with pa.ipc.new_file(output, _arrow_schema(names)) as writer:
+        for batch in _arrow_batches(rows, names):
+            writer.write_batch(batch)
+            written += batch.num_rows
+    return written
+
+
+def write_excel(rows: Iterable[Dict], output: BinaryIO, names: Optional[List[str]] = None) -> int:
+    writer = ExcelWriter()
+    written = writer.add_sheet("Movimientos", rows, names)
+    writer.save(output)
+    return written
+
+
+class ExportFormat:
+    """
+    An output format: its writer, file extension and MIME type, and the
+    optional package it needs
+    """
+    def __init__(self, name: str, label: str, extension: str, mime: str, writer: Callable, requires: Optional[str] = None):
+        self.name = name
+        self.label = label
+        self.extension = extension
+        self.mime = mime
+        self.writer = writer
+        self.requires = requires
+
+    def available(self) -> bool:
+        return self.requires is None or importlib.util.find_spec(self.requires) is not None
+
+
+formats: Dict[str, ExportFormat] = {
+    "xlsx": ExportFormat("xlsx", "Excel", "xlsx", EXCEL_MIME, write_excel),
+    "csv": ExportFormat("csv", "CSV", "csv", "text/csv", write_csv),
+    "parquet": ExportFormat("parquet", "Parquet", "parquet", "application/vnd.apache.parquet", write_parquet, "pyarrow"),
+    "arrow": ExportFormat("arrow", "Arrow IPC", "arrow", "application/vnd.apache.arrow.file", write_arrow, "pyarrow"),
+    "jsonl": ExportFormat("jsonl", "JSON Lines", "jsonl", "application/jsonl", write_jsonl),
+}
+
+
+def available_formats() -> List[ExportFormat]:
+    return [export_format for export_format in formats.values() if export_format.available()]
+
+
+def get_format(name: str) -> ExportFormat:
+    if name not in formats:
+        raise ValueError(f"Unknown export format: {name}")
+    export_format = formats[name]
+    if not export_format.available():
+        raise ValueError(f"Export format {name} needs the {export_format.requires} package")
+    return export_format
+
+
+def export_rows(rows: Iterable[Dict], format_name: str, output: Optional[BinaryIO] = None):
+    """
+    Write the rows of an account in the given format to output, or return
+    the bytes. Rows are consumed as they come, so they can be a generator.
+    """
+    export_format = get_format(format_name)
+    if output is not None:
+        export_format.writer(rows, output)
+        return None
+    buffer = BytesIO()
+    export_format.writer(rows, buffer)
+    return buffer.getvalue()
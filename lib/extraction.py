@@ -0,0 +1,194 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from lib import debug
+from lib.api.engines import PageCallback, get_engine
+from lib.parsers.watchdog import process_context
+from lib.pool import EXTRACT_SECONDS, MAX_TASKS, PoolUnavailable, pool, preload, pymupdf_lock, report, usable
+
+# Documents whose extraction is kept, and the rough size they may take
+CACHE_ENTRIES = int(os.environ.get("CONVERTER_EXTRACTION_CACHE_ENTRIES", 64))
+CACHE_MB = int(os.environ.get("CONVERTER_EXTRACTION_CACHE_MB", 256))
+# Background extractions running at the same time
+SPECULATIVE_WORKERS = int(os.environ.get("CONVERTER_SPECULATIVE_WORKERS", 2))
+
+# Rough size of an element or row of the positional and table engines
+ITEM_SIZE = 200
+
+
+def document_key(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def _size(output) -> int:
+    if isinstance(output, list):
+        return sum(len(item) if isinstance(item, str) else ITEM_SIZE for item in output)
+    return ITEM_SIZE
+
+
+class ExtractionCache:
+    """
+    Process-wide cache of engine output per document, least recently used
+    evicted first once over CACHE_ENTRIES or CACHE_MB
+    """
+    def __init__(self, max_entries: int = CACHE_ENTRIES, max_bytes: int = CACHE_MB * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str, engine_name: str):
+        with self._lock:
+            entry = self._entries.get((key, engine_name))
+            if entry is None:
+                return None
+            self._entries.move_to_end((key, engine_name))
+            return entry[0]
+
+    def put(self, key: str, engine_name: str, output) -> None:
+        size = _size(output)
+        with self._lock:
+            previous = self._entries.pop((key, engine_name), None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[(key, engine_name)] = (output, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def outputs(self, key: str) -> Dict:
+        """
+        Every cached engine output of a document, by engine name
+        """
+        with self._lock:
+            return {engine_name: entry[0] for (entry_key, engine_name), entry in self._entries.items() if entry_key == key}
+
+
+extraction_cache = ExtractionCache()
+
+_executor = None
+_pending: Dict = {}
+_lock = threading.Lock()
+
+
+def _executor_instance() -> ProcessPoolExecutor:
+    # Extraction runs in worker processes: pymupdf can't be used from several threads
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=SPECULATIVE_WORKERS, mp_context=process_context(),
+                                        initializer=preload, max_tasks_per_child=MAX_TASKS)
+    return _executor
+
+
+def _report_page(index: int, total: int, output) -> None:
+    report((index, total, output))
+
+
+def _run(engine_name: str, data: bytes, report_pages: bool = False):
+    """
+    Output of the engine, in a worker process; with report_pages, each page
+    is also sent to the caller as soon as it is extracted
+    """
+    return get_engine(engine_name).extract(data, _report_page if report_pages else None)
+
+
+def _finished(key: str, engine_name: str, future: Future) -> None:
+    with _lock:
+        _pending.pop((key, engine_name), None)
+    try:
+        extraction_cache.put(key, engine_name, future.result())
+    except Exception as e:
+        debug.info("Background %s extraction failed: %s", engine_name, e)
+
+
+def speculate(data: bytes, engine_names: List[str]) -> str:
+    """
+    Start extracting the document with the given engines in the background,
+    so the output is ready when the conversion asks for it. Remote engines
+    are never started speculatively. Returns the document key.
+    """
+    key = document_key(data)
+    for engine_name in engine_names:
+        if get_engine(engine_name).remote or extraction_cache.get(key, engine_name) is not None:
+            continue
+        with _lock:
+            if (key, engine_name) in _pending:
+                continue
+            try:
+                future = _executor_instance().submit(_run, engine_name, data)
+            except Exception as e:
+                debug.info("Background extraction couldn't start: %s", e)
+                continue
+            _pending[(key, engine_name)] = future
+        future.add_done_callback(lambda done, engine_name=engine_name: _finished(key, engine_name, done))
+    return key
+
+
+def _extract_now(engine, data: bytes, on_page: Optional[PageCallback]):
+    """
+    Extract with a local engine in a warm worker of the pool, so conversions
+    on the executor threads neither share pymupdf nor hold the GIL. Pages
+    come back to on_page while the worker goes on, so progress and previews
+    are live and raising from on_page (a cancelled conversion) stops the
+    worker. Remote engines, which only wait on the network, and processes
+    that can't use the pool extract here, one at a time.
+    """
+    if engine.remote:
+        return engine.extract(data, on_page)
+    if usable():
+        try:
+            return pool.run(_run, engine.name, data, on_page is not None, timeout=EXTRACT_SECONDS,
+                            on_progress=(lambda page: on_page(*page)) if on_page else None)
+        except PoolUnavailable as e:
+            debug.warning("Worker pool unavailable, extracting here: %s", e)
+    with pymupdf_lock:
+        return engine.extract(data, on_page)
+
+
+def extract(data: bytes, engine_name: str, on_page: Optional[PageCallback] = None, key: Optional[str] = None):
+    """
+    Output of the engine for the document: from the cache, from a background
+    extraction still running, or extracted now (and cached). Cached page text
+    is replayed to on_page so progress and previews still see every page.
+    """
+    engine = get_engine(engine_name)
+    key = key or document_key(data)
+
+    output = extraction_cache.get(key, engine_name)
+    if output is None:
+        with _lock:
+            future = _pending.get((key, engine_name))
+        if future is not None:
+            try:
+                output = future.result()
+                extraction_cache.put(key, engine_name, output)
+            except Exception as e:
+                debug.info("Background %s extraction failed, extracting again: %s", engine_name, e)
+
+    if output is None:
+        output = _extract_now(engine, data, on_page)
+        if output:
+            extraction_cache.put(key, engine_name, output)
+        return output
+
+    if on_page and engine.output == "pages":
+        for index, page in enumerate(output):
+            on_page(index, len(output), page)
+    return output
+
+
+def status(data: bytes, engine_name: str) -> Optional[str]:
+    """
+    "ready", "running" or None (not started) for an engine's output
+    """
+    key = document_key(data)
+    if extraction_cache.get(key, engine_name) is not None:
+        return "ready"
+    with _lock:
+        return "running" if (key, engine_name) in _pending else None
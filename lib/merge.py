@@ -0,0 +1,167 @@
+from typing import Dict, List, Optional, Tuple
+
+from lib import debug, extraction
+from lib.conversion import BALANCE_TOLERANCE, reconcile
+from lib.pages import page_dates, page_key, parse_date
+from lib.parsers.base import BankParser
+from lib.parsers.watchdog import run_guarded
+
+
+class MergedStatement:
+    """
+    One continuous canonical table built from several statements of an
+    account, and what was done with each document: pages, pages skipped
+    because they were already covered, rows dropped as overlap and whether
+    it connected to the previous one through the balance chain
+    """
+    def __init__(self, rows: List[Dict], documents: List[Dict]):
+        self.rows = rows
+        self.documents = documents
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_balance_row(row: Dict) -> bool:
+    """
+    Opening and closing balance rows carry a SALDO but no movement
+    """
+    return not _is_number(row.get("DEBITOS")) and not _is_number(row.get("CREDITOS"))
+
+
+def _row_key(row: Dict) -> Tuple:
+    return (row.get("FECHA"), row.get("DEBITOS"), row.get("CREDITOS"), row.get("SALDO"))
+
+
+def _last_date(rows: List[Dict]):
+    return next((found for found in (parse_date(row.get("FECHA")) for row in reversed(rows)) if found), None)
+
+
+def _closing_body(rows: List[Dict]) -> List[Dict]:
+    """
+    The merged rows without their trailing closing balance rows
+    """
+    body = list(rows)
+    while body and _is_balance_row(body[-1]):
+        body.pop()
+    return body
+
+
+def find_overlap(rows: List[Dict], new_rows: List[Dict]) -> Optional[int]:
+    """
+    Number of leading rows of new_rows up to and including the last merged
+    movement, or None when it isn't among them
+    """
+    body = _closing_body(rows)
+    if not body:
+        return None
+    key = _row_key(body[-1])
+    return next((index + 1 for index in range(len(new_rows) - 1, -1, -1) if _row_key(new_rows[index]) == key), None)
+
+
+def stitch(rows: List[Dict], new_rows: List[Dict]) -> Tuple[List[Dict], int, bool]:
+    """
+    Append the rows of a later statement to the merged ones, dropping the
+    overlap. The overlap ends at the last merged movement (same date,
+    amounts and saldo); without one, the later statement connects when its
+    opening balance equals the merged closing balance.
+    Returns (merged rows, rows dropped from new_rows, connected).
+    """
+    if not rows:
+        return list(new_rows), 0, True
+
+    body = _closing_body(rows)
+    last = body[-1] if body else rows[-1]
+
+    overlap = find_overlap(rows, new_rows)
+    if overlap is not None:
+        connected = True
+    else:
+        overlap = 0
+        while overlap < len(new_rows) and _is_balance_row(new_rows[overlap]):
+            overlap += 1
+        opening = new_rows[overlap - 1].get("SALDO") if overlap else None
+        connected = bool(_is_number(opening) and _is_number(last.get("SALDO"))
+                         and abs(opening - last["SALDO"]) <= BALANCE_TOLERANCE)
+
+    appended = new_rows[overlap:]
+    if not appended:
+        return list(rows), overlap, connected
+    return body + appended, overlap, connected
+
+
+def _parse_account(bank_name: str, pages: List[str], account: int, guarded: bool) -> List[Dict]:
+    accounts = run_guarded(bank_name, pages) if guarded else BankParser.parse(bank_name, pages)
+    if not accounts or account >= len(accounts):
+        return []
+    return accounts[account]
+
+
+def merge_statements(bank_name: str, documents: List[bytes], account: int = 0, guarded: bool = True) -> MergedStatement:
+    """
+    Merge statements of one account into a single canonical table.
+
+    Documents are ordered by the earliest date on their first page. Pages of
+    a later document that are already covered, because an identical page was
+    processed or because all their dates fall before the last merged
+    movement, are left out of its parse (the first page is always kept for
+    the opening block). When that trimmed parse doesn't line up with the
+    merged rows, the whole document is parsed instead.
+    """
+    engine = BankParser.get_engine_chain(bank_name)[0]
+    if engine.output != "pages":
+        raise ValueError(f"Merging needs page text, {bank_name} is extracted with {engine.name}")
+
+    extracted = [extraction.extract(data, engine.name) for data in documents]
+    starts = [page_dates(pages[0])[0] if pages else None for pages in extracted]
+    order = list(range(len(extracted)))
+    if all(starts):
+        order.sort(key=lambda index: starts[index])
+
+    page_index = set()
+    rows = []
+    summaries = []
+
+    for index in order:
+        pages = extracted[index]
+        keys = [page_key(page) for page in pages]
+        summary = {"document": index, "pages": len(pages), "skipped_pages": 0, "overlap_rows": 0, "connected": True}
+
+        # Leading run of covered pages after the first one
+        covered_end = _last_date(rows)
+        first_new = 1
+        while first_new < len(pages):
+            last_on_page = page_dates(pages[first_new])[1]
+            covered = keys[first_new] in page_index or (covered_end and last_on_page and last_on_page < covered_end)
+            if not covered:
+                break
+            first_new += 1
+
+        merged = None
+        if rows and first_new > 1:
+            try:
+                trimmed = _parse_account(bank_name, pages[:1] + pages[first_new:], account, guarded)
+                # Accept it only if it picks up right after the last merged
+                # movement and its balances follow from there
+                if find_overlap(rows, trimmed) is not None:
+                    candidate, overlap, connected = stitch(rows, trimmed)
+                    appended = len(trimmed) - overlap
+                    if reconcile([candidate[-appended - 1:]]):
+                        merged = candidate
+                        summary.update(skipped_pages=first_new - 1, overlap_rows=overlap, connected=connected)
+            except Exception as e:
+                debug.info("Trimmed parse of document %s failed, parsing it whole: %s", index, e)
+
+        if merged is None:
+            new_rows = _parse_account(bank_name, pages, account, guarded)
+            merged, overlap, connected = stitch(rows, new_rows)
+            summary.update(overlap_rows=overlap, connected=connected)
+            if not connected:
+                debug.warning("Document %s doesn't connect with the previous ones through the balance chain", index)
+
+        rows = merged
+        page_index.update(keys)
+        summaries.append(summary)
+
+    return MergedStatement(rows, summaries)
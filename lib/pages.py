@@ -0,0 +1,49 @@
+import hashlib
+from datetime import date
+from typing import Optional, Tuple
+
+from lib.parsers.patterns import PatternRegistry
+
+patterns = PatternRegistry("Pages", {
+    # dd/mm/yy, dd/mm/yyyy, dd-mm-yy and dd-mm-yyyy
+    "date": r'(?<!\d)(\d{1,2})([/-])(\d{1,2})\2(\d{4}|\d{2})(?!\d)',
+})
+
+
+def page_key(text: str) -> str:
+    """
+    Hash of the text of a page, used to recognise pages already processed
+    """
+    return hashlib.sha1(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def _to_date(day: str, month: str, year: str) -> Optional[date]:
+    year = int(year)
+    if year < 100:
+        year += 2000
+    try:
+        return date(year, int(month), int(day))
+    except ValueError:
+        return None
+
+
+def parse_date(value: str) -> Optional[date]:
+    """
+    Date of a FECHA value; None when it has no year or isn't a date
+    """
+    match = patterns.fullmatch("date", value.strip()) if isinstance(value, str) else None
+    if not match:
+        return None
+    return _to_date(match.group(1), match.group(3), match.group(4))
+
+
+def page_dates(text: str) -> Tuple[Optional[date], Optional[date]]:
+    """
+    Earliest and latest date printed on a page. Header dates (issue date,
+    statement period) are included, so the range is never narrower than the
+    movements of the page.
+    """
+    dates = [found for found in (_to_date(m.group(1), m.group(3), m.group(4)) for m in patterns.finditer("date", text)) if found]
+    if not dates:
+        return None, None
+    return min(dates), max(dates)
@@ -0,0 +1,132 @@
+import re
+from typing import Dict, List, Optional
+
+from lib.parsers.markers import MarkerMatcher
+from lib.parsers.patterns import PatternRegistry
+
+# Lines above an account marker searched for its identifier and currency
+LOOKBACK_LINES = 20
+
+# Markers opening each account section of multi-account statements, and the
+# marker after which sections start (e.g. past the BBVA summary)
+ACCOUNT_SECTIONS = {
+    "BBVA": {"markers": ["SALDO ANTERIOR"], "after": "Movimientos en cuentas", "ignore_case": True},
+    # The parser opens an account at each "Saldo Anterior" row; the section
+    # header also repeats on pages where an account continues
+    "Comafi": {"markers": ["Saldo Anterior"]},
+    "ICBC": {"markers": ["SALDO ULTIMO EXTRACTO"]},
+    "Supervielle": {"markers": ["Saldo del período anterior"]},
+}
+
+patterns = PatternRegistry("Accounts", {
+    "identifier": r'(?:N[úu]mero|NRO\.?|Nro\.?|N°|CUENTA|Cuenta|CBU:?)\s*(\d[\d\-/]{4,}\d)',
+    "usd": (r'\b(?:D[OÓ]LARES|U\$S|USD)\b', re.IGNORECASE),
+    "ars": (r'\bPESOS\b|\$', re.IGNORECASE),
+})
+
+_matchers = {
+    bank: (MarkerMatcher(spec["markers"], spec.get("ignore_case", False)),
+           MarkerMatcher([spec["after"]], spec.get("ignore_case", False)) if spec.get("after") else None)
+    for bank, spec in ACCOUNT_SECTIONS.items()
+}
+
+
+class AccountEntry:
+    """
+    One account of a statement as found by the directory pass: its position
+    among the parsed accounts, identifier and currency when printed next to
+    it, and the 0-based pages its section spans
+    """
+    def __init__(self, index: int, identifier: Optional[str], currency: Optional[str], first_page: int, last_page: int):
+        self.index = index
+        self.identifier = identifier
+        self.currency = currency
+        self.first_page = first_page
+        self.last_page = last_page
+
+    def label(self) -> str:
+        parts = [f"Account {self.index + 1}"]
+        if self.identifier:
+            parts.append(self.identifier)
+        if self.currency:
+            parts.append(self.currency)
+        if self.first_page == self.last_page:
+            parts.append(f"page {self.first_page + 1}")
+        else:
+            parts.append(f"pages {self.first_page + 1}-{self.last_page + 1}")
+        return " · ".join(parts)
+
+    def to_dict(self) -> Dict:
+        return {
+            "index": self.index,
+            "identifier": self.identifier,
+            "currency": self.currency,
+            "first_page": self.first_page,
+            "last_page": self.last_page
+        }
+
+
+def _currency(lines: List[str]) -> Optional[str]:
+    for line in reversed(lines):
+        if patterns.search("usd", line):
+            return "USD"
+        if patterns.search("ars", line):
+            return "ARS"
+    return None
+
+
+def _describe(lines: List[str]):
+    """
+    Identifier printed closest above the marker, and the currency named on
+    its line or the account title right above it
+    """
+    for position in range(len(lines) - 1, -1, -1):
+        found = patterns.search("identifier", lines[position])
+        if found:
+            return found.group(1), _currency(lines[max(position - 1, 0):position + 1])
+    return None, _currency(lines[-2:])
+
+
+def has_directory(bank_name: str) -> bool:
+    return bank_name in ACCOUNT_SECTIONS
+
+
+def account_directory(bank_name: str, pages: List[str]) -> List[AccountEntry]:
+    """
+    Cheap pass listing the accounts of a statement without parsing their
+    movements. Banks without multi-account sections get a single entry
+    covering the whole document.
+    """
+    if not has_directory(bank_name):
+        return [AccountEntry(0, None, None, 0, max(len(pages) - 1, 0))]
+
+    markers, after = _matchers[bank_name]
+    started = after is None
+    starts = []
+
+    # Lines of the whole document, so the lookback can reach the previous page
+    lines = []
+    previous = -1
+    for page_number, page in enumerate(pages):
+        offset = len(lines)
+        lines.extend(page.split('\n'))
+        after_hits = after.line_hits(page) if not started else {}
+        for line_number in sorted(markers.line_hits(page)):
+            if not started:
+                # Sections only count once the "after" marker has been seen
+                if not any(hit <= line_number for hit in after_hits):
+                    continue
+                started = True
+            line_number += offset
+            window = lines[max(previous + 1, line_number - LOOKBACK_LINES):line_number + 1]
+            starts.append((page_number, _describe(window)))
+            previous = line_number
+        if not started and after_hits:
+            started = True
+
+    entries = []
+    for index, (page_number, (identifier, currency)) in enumerate(starts):
+        last_page = starts[index + 1][0] if index + 1 < len(starts) else len(pages) - 1
+        entries.append(AccountEntry(index, identifier, currency, page_number, last_page))
+
+    return entries
@@ -1,65 +1,114 @@
-#from lib.api.datalab import parse as datalab_parse
-#rom lib.api.datalab_ocr import parse as datalab_ocr_parse
-from lib.api.file import parse as file_parse
-#from lib.api.file_alt import parse as file_alt_parse
-#from lib.api.file_tables import parse as file_tables_parse
-#from lib.api.file_ocr import parse as file_ocr_parse
-#from lib.api.llamaparse import parse as llama_parse
+from lib.api.engines import get_engine
 
-from lib.parsers.bbva import BBVAParser
-from lib.parsers.bpn import BPNParser
-from lib.parsers.comafi import ComafiParser
-from lib.parsers.credicoop import CredicoopParser
-from lib.parsers.galicia import GaliciaParser
-from lib.parsers.hsbc import HSBCParser
-from lib.parsers.icbc import ICBCParser
-from lib.parsers.macro import MacroParser
-from lib.parsers.nacion import NacionParser
-from lib.parsers.patagonia import PatagoniaParser
-from lib.parsers.roela import RoelaParser
-from lib.parsers.santander import SantanderParser
-from lib.parsers.supervielle import SupervielleParser
-from lib.parsers.mercadopago import MercadoPagoParser
+from lib.parsers.detect import detect_bank
+from lib.parsers.variants import FormatVariant, variant_registry
+from lib.parsers.context import parser_instance, resolve
+
+# Extraction chains, cheapest engine first
+TEXT_CHAIN = ["text", "text_sorted"]
+
+# Parsers are "module:Class" paths, imported when the bank is first used
+NACION_ALT = "lib.parsers.nacion_alt:NacionParser"
 
 parser_map = {
-    "BBVA": (BBVAParser, file_parse, "✅"),
-    "BPN": (BPNParser, file_parse, "✅"),
-    "Comafi": (ComafiParser, file_parse, "✅"),
-    "Credicoop": (CredicoopParser, file_parse, "✅"),
-    "Galicia": (GaliciaParser, file_parse, "✅"),
-    "HSBC": (HSBCParser, file_parse, "✅"),
-    "ICBC": (ICBCParser, file_parse, "✅"),
-    "Macro": (MacroParser, file_parse, "❌"),
-    "Mercado Pago": (MercadoPagoParser, file_parse, "✅"),
-    "Nación": (NacionParser, file_parse, "✅"),
-    "Patagonia": (PatagoniaParser, file_parse, "❌"),
-    "Roela": (RoelaParser, file_parse, "✅"),
-    "Santander": (SantanderParser, file_parse, "✅"),
-    "Supervielle": (SupervielleParser, file_parse, "✅")
+    "BBVA": {"parser": "lib.parsers.bbva:BBVAParser", "engines": TEXT_CHAIN, "status": "✅"},
+    "BPN": {"parser": "lib.parsers.bpn:BPNParser", "engines": TEXT_CHAIN, "status": "✅"},
+    "Comafi": {"parser": "lib.parsers.comafi:ComafiParser", "engines": TEXT_CHAIN, "status": "✅"},
+    "Credicoop": {"parser": "lib.parsers.credicoop:CredicoopParser", "engines": TEXT_CHAIN, "status": "✅"},
+    "Galicia": {"parser": "lib.parsers.galicia:GaliciaParser", "engines": TEXT_CHAIN, "status": "✅"},
+    "HSBC": {"parser": "lib.parsers.hsbc:HSBCParser", "engines": TEXT_CHAIN, "status": "✅"},
+    "ICBC": {"parser": "lib.parsers.icbc:ICBCParser", "engines": TEXT_CHAIN, "status": "✅"},
+    "Macro": {"parser": "lib.parsers.macro:MacroParser", "engines": ["positional", "datalab_ocr"], "status": "❌"},
+    "Mercado Pago": {"parser": "lib.parsers.mercadopago:MercadoPagoParser", "engines": TEXT_CHAIN, "status": "✅"},
+    "Nación": {"parser": "lib.parsers.nacion:NacionParser", "engines": TEXT_CHAIN, "status": "✅"},
+    "Patagonia": {"parser": "lib.parsers.patagonia:PatagoniaParser", "engines": ["tables", "datalab"], "status": "❌"},
+    "Roela": {"parser": "lib.parsers.roela:RoelaParser", "engines": TEXT_CHAIN, "status": "✅"},
+    "Santander": {"parser": "lib.parsers.santander:SantanderParser", "engines": TEXT_CHAIN, "status": "✅"},
+    "Supervielle": {"parser": "lib.parsers.supervielle:SupervielleParser", "engines": TEXT_CHAIN, "status": "✅"}
 }
 
+# Banks with several statement layouts, checked in order before parsing
+variant_registry.register("Nación", [
+    FormatVariant("standard", "lib.parsers.nacion:NacionParser", "lib.parsers.nacion:NacionParser.is_standard_layout", "parse_standard"),
+    FormatVariant("alternate", NACION_ALT)
+])
+variant_registry.register("Santander", [
+    FormatVariant("old", "lib.parsers.santander:SantanderParser", "lib.parsers.santander:SantanderParser.is_old_format", "parse_old_format"),
+    FormatVariant("new", "lib.parsers.santander:SantanderParser", method="parse_new_format")
+])
+
 class BankParser:
     @staticmethod
     def get_parser(bank_name: str):
         if bank_name in parser_map:
-            return parser_map[bank_name][0]()
+            return parser_instance(parser_map[bank_name]["parser"])
         else:
             raise ValueError(f"No parser found for bank: {bank_name}")
 
     @staticmethod
-    def get_parser_api(bank_name: str):
+    def parse(bank_name: str, data):
+        """
+        Parse extracted data with the parser of the bank, dispatching to the
+        matching format variant when the bank has several layouts
+        """
+        if variant_registry.has_variants(bank_name):
+            return variant_registry.select(bank_name, data).parse(data)
+        else:
+            return BankParser.get_parser(bank_name).parse(data)
+
+    @staticmethod
+    def get_engine_chain(bank_name: str):
+        """
+        Extraction engines of the bank, in the order they are tried
+        """
         if bank_name in parser_map:
-            return parser_map[bank_name][1]
+            return [get_engine(name) for name in parser_map[bank_name]["engines"]]
         else:
-            raise ValueError(f"No parser API found for bank: {bank_name}")
+            raise ValueError(f"No extraction engines found for bank: {bank_name}")
+
+    @staticmethod
+    def get_parser_api(bank_name: str):
+        """
+        Extraction function of the cheapest engine of the bank
+        """
+        return BankParser.get_engine_chain(bank_name)[0].extract
     
     @staticmethod
     def get_parser_status(bank_name: str):
         if bank_name in parser_map:
-            return parser_map[bank_name][2]
+            return parser_map[bank_name]["status"]
         else:
             raise ValueError(f"No parser status found for bank: {bank_name}")
 
+    @staticmethod
+    def prints_balances(bank_name: str) -> bool:
+        """
+        Whether every movement parsed for the bank carries the balance printed
+        in the statement, so pages before a given movement can be left out
+        """
+        if bank_name in parser_map:
+            return getattr(resolve(parser_map[bank_name]["parser"]), "prints_balances", False)
+        else:
+            raise ValueError(f"No parser found for bank: {bank_name}")
+
+    @staticmethod
+    def detect_bank(first_page: str):
+        bank_name, confidence = detect_bank(first_page)
+        if bank_name in parser_map:
+            return bank_name, confidence
+        else:
+            return None, 0.0
+
+    @staticmethod
+    def warm():
+        """
+        Create the shared parser instances up front so the first conversion
+        of each bank doesn't pay for it
+        """
+        for entry in parser_map.values():
+            parser_instance(entry["parser"])
+        parser_instance(NACION_ALT)
+
     @staticmethod
     def bank_names():
         return list(parser_map.keys())
@@ -1,7 +1,19 @@
 import re
-import streamlit as st
 from typing import List, Dict
 from datetime import datetime
+from lib.parsers.patterns import PatternRegistry
+
+patterns = PatternRegistry("BBVA", {
+    "date": r'^(\d{2}/\d{2})(/\d{4})?$',
+    "year": r'Información al: \d{2}/\d{2}/(\d{4})',
+    "movimientos_start": (r'Movimientos en cuentas', re.IGNORECASE),
+    "saldo_anterior": (r'SALDO ANTERIOR', re.IGNORECASE),
+    "movimientos_end": (r'TOTAL MOVIMIENTOS', re.IGNORECASE),
+    "saldo_amount": r'^\d{1,3}(?:\.\d{3})*,\d{2}$',
+    "origen": r'^([A-Z]{1,2}\s?\d*)$',
+    "currency": r'^-?\d{1,3}(?:\.\d{3})*,\d{2}$',
+    "saldo_al": (r'SALDO AL .* DE .*', re.IGNORECASE),
+})
 
 def convert_to_canonical_format(data: Dict) -> Dict:
     canonical_rows = []
@@ -21,22 +33,22 @@ def convert_to_canonical_format(data: Dict) -> Dict:
     return canonical_rows
 
 class BBVAParser:
-    # Define date_regex as a class variable
-    date_regex = re.compile(r'^(\d{2}/\d{2})(/\d{4})?$')
+    # Every movement row carries the balance printed in the statement
+    prints_balances = True
 
     def parse(self, data: List[str]) -> List[List[Dict[str, str]]]:
         # Combine all data into a single string
         raw_text = "\n".join(data)
 
         # Extract year
-        year_matches = re.findall(r'Información al: \d{2}/\d{2}/(\d{4})', raw_text)
+        year_matches = patterns.findall("year", raw_text)
         if year_matches:
             year = max(int(y) for y in year_matches)
         else:
             year = datetime.now().year
 
         # Find the initial "Movimientos en cuentas" section
-        movimientos_start = re.search(r'Movimientos en cuentas', raw_text, re.IGNORECASE)
+        movimientos_start = patterns.search("movimientos_start", raw_text)
         if not movimientos_start:
             return []
 
@@ -46,7 +58,7 @@ class BBVAParser:
 
         while True:
             # Find next "SALDO ANTERIOR" section
-            saldo_anterior_start = re.search(r'SALDO ANTERIOR', raw_text[current_pos:], re.IGNORECASE)
+            saldo_anterior_start = patterns.search("saldo_anterior", raw_text[current_pos:])
             if not saldo_anterior_start:
                 break
 
@@ -54,7 +66,7 @@ class BBVAParser:
             current_pos += saldo_anterior_start.start()
 
             # Find next "TOTAL MOVIMIENTOS"
-            movimientos_end = re.search(r'TOTAL MOVIMIENTOS', raw_text[current_pos:], re.IGNORECASE)
+            movimientos_end = patterns.search("movimientos_end", raw_text[current_pos:])
             if not movimientos_end:
                 break
 
@@ -86,7 +98,7 @@ class BBVAParser:
         # Handle "SALDO ANTERIOR"
         while i < total_lines:
             if lines[i].lower() == "saldo anterior":
-                if i + 1 < total_lines and re.match(r'^\d{1,3}(?:\.\d{3})*,\d{2}$', lines[i + 1]):
+                if i + 1 < total_lines and patterns.match("saldo_amount", lines[i + 1]):
                     transactions.append({
                         "FECHA": "",
                         "ORIGEN": "",
@@ -104,8 +116,7 @@ class BBVAParser:
         # Parse all transactions
         while i < total_lines:
             line = lines[i]
-            # Now we can use self.date_regex
-            date_match = self.date_regex.match(line)
+            date_match = patterns.match("date", line)
             if date_match:
                 # If there's an existing transaction being built, save it
                 if current_transaction:
@@ -137,7 +148,7 @@ class BBVAParser:
                 if i < total_lines:
                     next_line = lines[i]
                     # ORIGEN is typically a single letter or starts with a letter followed by numbers
-                    origen_match = re.match(r'^([A-Z]{1,2}\s?\d*)$', next_line)
+                    origen_match = patterns.match("origen", next_line)
                     if origen_match:
                         current_transaction['ORIGEN'] = origen_match.group(1).strip()
                         i += 1
@@ -145,7 +156,7 @@ class BBVAParser:
                 while i < total_lines:
                     concept_line = lines[i]
                     # Check if the line is a currency amount
-                    currency_match = re.match(r'^-?\d{1,3}(?:\.\d{3})*,\d{2}$', concept_line)
+                    currency_match = patterns.match("currency", concept_line)
                     if currency_match:
                         # This line is either DÉBITO or CRÉDITO
                         amount = concept_line
@@ -157,7 +168,7 @@ class BBVAParser:
                         # The next line should be SALDO
                         if i < total_lines:
                             saldo_line = lines[i]
-                            saldo_match = re.match(r'^-?\d{1,3}(?:\.\d{3})*,\d{2}$', saldo_line)
+                            saldo_match = patterns.match("currency", saldo_line)
                             if saldo_match:
                                 current_transaction['SALDO'] = saldo_line
                                 i += 1
@@ -184,7 +195,7 @@ class BBVAParser:
                 cleaned_transactions.append(tx)
 
         # Add "SALDO AL ..." as the last transaction
-        saldo_al_match = re.search(r'SALDO AL .* DE .*', account_text, re.IGNORECASE)
+        saldo_al_match = patterns.search("saldo_al", account_text)
         if saldo_al_match:
             saldo_al_index = saldo_al_match.end()
             saldo_al_lines = [line.strip() for line in account_text[saldo_al_index:].split('\n') if line.strip()]
@@ -1,5 +1,17 @@
 from typing import List, Dict, Tuple
 import re
+from lib.parsers.patterns import PatternRegistry
+
+HEADERS = ["Fecha", "Conceptos", "Referencias", "Débitos", "Créditos", "Saldo"]
+
+patterns = PatternRegistry("Comafi", {
+    "saldo_al_line": r'Saldo al:\s*\d{2}/\d{2}/\d{4}',
+    "transporte": r'Transporte\s+([\d\.]+,[\d]{2})',
+    "transaction": r'^(\d{2}/\d{2}/\d{2,4})\s+(.*)',
+    "saldo_anterior": r'Saldo Anterior\s*([\d\.,]+)',
+    "saldo_al": r'Saldo al:\s*(\d{2}/\d{2}/\d{4})\s*([\d\.,]+)',
+    **{f"header_{header}": r'\b' + re.escape(header) + r'\b' for header in HEADERS},
+})
 
 def convert_to_canonical_format(data: Dict) -> Dict:
     canonical_rows = []
@@ -22,25 +34,24 @@ def convert_to_canonical_format(data: Dict) -> Dict:
     return canonical_rows
 
 class ComafiParser:
-    def __init__(self):
-        # Configurable offsets (in characters)
-        self.offset_fecha_start = -1
-        self.offset_fecha_end = 0
+    # Configurable offsets (in characters), shared by every parse
+    offset_fecha_start = -1
+    offset_fecha_end = 0
 
-        self.offset_conceptos_start = 0
-        self.offset_conceptos_end = -1
+    offset_conceptos_start = 0
+    offset_conceptos_end = -1
 
-        self.offset_referencias_start = 0
-        self.offset_referencias_end = -8
+    offset_referencias_start = 0
+    offset_referencias_end = -8
 
-        self.offset_debitos_start = -6
-        self.offset_debitos_end = 1
+    offset_debitos_start = -6
+    offset_debitos_end = 1
 
-        self.offset_creditos_start = -6
-        self.offset_creditos_end = 1
+    offset_creditos_start = -6
+    offset_creditos_end = 1
 
-        self.offset_saldo_start = -9
-        self.offset_saldo_end = 2
+    offset_saldo_start = -9
+    offset_saldo_end = 2
 
     def parse(self, data: List[str]) -> List[List[Dict[str, str]]]:
         transactions_per_account = []
@@ -62,7 +73,7 @@ class ComafiParser:
                     continue
 
                 # Detect end of section
-                if re.match(r'Saldo al:\s*\d{2}/\d{2}/\d{4}', line_strip):
+                if patterns.match("saldo_al_line", line_strip):
                     saldo_al_data = self.extract_saldo_al(line_strip)
                     if saldo_al_data:
                         current_account_transactions.append(saldo_al_data)
@@ -82,14 +93,14 @@ class ComafiParser:
                     continue
 
                 # Skip "Transporte" sections and capture currency formatted number
-                if re.match(r'Transporte\s+([\d\.]+,[\d]{2})', line_strip):
+                if patterns.match("transporte", line_strip):
                     continue
 
                 if not line_strip:
                     continue
 
                 # Process transaction lines
-                transaction_match = re.match(r'^(\d{2}/\d{2}/\d{2,4})\s+(.*)', line_strip)
+                transaction_match = patterns.match("transaction", line_strip)
                 if transaction_match:
                     fecha = self.extract_fecha(line, header_positions)
                     conceptos, referencias = self.extract_conceptos_referencias(line, header_positions)
@@ -188,14 +199,12 @@ class ComafiParser:
         return transactions_per_account
 
     def is_header_line(self, line: str) -> bool:
-        headers = ["Fecha", "Conceptos", "Referencias", "Débitos", "Créditos", "Saldo"]
-        return all(header in line for header in headers)
+        return all(header in line for header in HEADERS)
 
     def get_headers_positions(self, header_line: str) -> Dict[str, Tuple[int, int]]:
-        headers = ["Fecha", "Conceptos", "Referencias", "Débitos", "Créditos", "Saldo"]
         positions = {}
-        for header in headers:
-            match = re.search(r'\b' + re.escape(header) + r'\b', header_line)
+        for header in HEADERS:
+            match = patterns.search(f"header_{header}", header_line)
             if match:
                 positions[header] = (match.start(), match.end())
             else:
@@ -232,7 +241,7 @@ class ComafiParser:
         return line[start:end].strip()
 
     def extract_saldo_anterior(self, text: str) -> Dict[str, str]:
-        match = re.search(r'Saldo Anterior\s*([\d\.,]+)', text)
+        match = patterns.search("saldo_anterior", text)
         if match:
             saldo = match.group(1)
             return {
@@ -246,7 +255,7 @@ class ComafiParser:
         return {}
 
     def extract_saldo_al(self, text: str) -> Dict[str, str]:
-        match = re.search(r'Saldo al:\s*(\d{2}/\d{2}/\d{4})\s*([\d\.,]+)', text)
+        match = patterns.search("saldo_al", text)
         if match:
             fecha = self.format_date(match.group(1))
             saldo = match.group(2)
@@ -0,0 +1,47 @@
+import importlib
+import threading
+from typing import Dict, List, Union
+
+_instances: Dict[type, object] = {}
+_lock = threading.Lock()
+
+
+class ParseContext:
+    """
+    Per-document state of a parse. Parsers keep nothing on the instance, so
+    one instance can serve concurrent parses; anything that must survive
+    between helper calls lives here instead.
+    """
+    def __init__(self, data: List[str]):
+        self.data = data
+        self.balance = None
+
+
+def resolve(path: Union[str, object]):
+    """
+    Object named by "module:attribute" (the attribute may be dotted, e.g.
+    "lib.parsers.nacion:NacionParser.is_standard_layout"), importing the
+    module on first use. Anything else is returned as is.
+    """
+    if not isinstance(path, str):
+        return path
+    module_name, _, attribute = path.partition(':')
+    target = importlib.import_module(module_name)
+    for name in attribute.split('.'):
+        target = getattr(target, name)
+    return target
+
+
+def parser_instance(parser_class: Union[str, type]):
+    """
+    The shared instance of a parser class (or its "module:Class" path),
+    created on first use
+    """
+    parser_class = resolve(parser_class)
+    instance = _instances.get(parser_class)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(parser_class)
+            if instance is None:
+                instance = _instances[parser_class] = parser_class()
+    return instance
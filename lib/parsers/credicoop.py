@@ -1,5 +1,15 @@
-import re
-from typing import Dict, List
+from typing import Dict, List, Tuple
+from lib.parsers.layout import infer_field_config, layout_key
+from lib.parsers.markers import MarkerMatcher
+from lib.parsers.patterns import PatternRegistry
+
+patterns = PatternRegistry("Credicoop", {
+    "date": r'^\d{2}/\d{2}/\d{2}$',
+    "header": r'^FECHA\s+COMBTE\s+DESCRIPCION\s+DEBITO\s+CREDITO\s+SALDO',
+    "saldo_final": r'SALDO AL\s+(\d{2}/\d{2}/\d{2})\s+([\d\.,\-−]+)',
+})
+
+section_markers = MarkerMatcher(["SALDO ANTERIOR", "CONTINUA EN PAGINA SIGUIENTE", "SALDO AL"], ignore_case=False)
 
 def convert_to_canonical_format(data: Dict) -> Dict:
     canonical_rows = []
@@ -29,13 +39,39 @@ class CredicoopParser:
         "SALDO": (92, 109),     # Till end of line
     }
 
-    DATE_REGEX = re.compile(r'^\d{2}/\d{2}/\d{2}$')
+    def page_layout(self, data: List[str]) -> Tuple[List[str], List[Dict[str, tuple]]]:
+        """
+        Lines of the document, each with the left margin of its page (the
+        indentation of its movement lines) removed, and the column slices for
+        every line. Slices are inferred from the movement lines of each page
+        with a column header (cached per header layout) and carried over to
+        the following pages; FIELD_CONFIG is used whenever inference doesn't
+        find the expected columns under the header titles. Inference and
+        slicing both work on the margin-free lines, so continuation lines keep
+        their offsets.
+        """
+        lines = []
+        configs = []
+        config = self.FIELD_CONFIG
+        for page in data:
+            page_lines = page.split('\n')
+            margin = min((len(line) - len(line.lstrip()) for line in page_lines
+                          if patterns.match("date", line.strip()[:8])), default=0)
+            page_lines = [line[margin:] if not line[:margin].strip() else line.lstrip() for line in page_lines]
+            header = next((line.rstrip() for line in page_lines if patterns.match("header", line.strip())), None)
+            if header is not None:
+                rows = [line.rstrip() for line in page_lines if patterns.match("date", line[:8])]
+                config = infer_field_config(rows, list(self.FIELD_CONFIG), key=layout_key(header.strip()),
+                                            header_line=header) or self.FIELD_CONFIG
+            lines.extend(page_lines)
+            configs.extend([config] * len(page_lines))
+        return lines, configs
 
     def parse(self, data: List[str]) -> List[List[Dict[str, str]]]:
         # Combine all pages into a single list of lines
-        lines = []
-        for page in data:
-            lines.extend(page.split('\n'))
+        text = "\n".join(data)
+        marker_hits = section_markers.line_hits(text)
+        lines, configs = self.page_layout(data)
 
         entries = []
         saldo_anterior = None
@@ -44,9 +80,6 @@ class CredicoopParser:
         skip_until_headers = False
         i = 0
 
-        # Regular expression to match the header line
-        header_regex = re.compile(r'^FECHA\s+COMBTE\s+DESCRIPCION\s+DEBITO\s+CREDITO\s+SALDO')
-
         # Function to format amounts
         def format_amount(value):
             if value is None:
@@ -66,9 +99,10 @@ class CredicoopParser:
 
         while i < len(lines):
             line = lines[i].strip()
+            line_markers = marker_hits.get(i, ())
 
             if not processing:
-                if "SALDO ANTERIOR" in line:
+                if "SALDO ANTERIOR" in line_markers:
                     processing = True
                     # Extract the SALDO ANTERIOR value
                     parts = line.split()
@@ -86,19 +120,19 @@ class CredicoopParser:
                         "SALDO": format_amount(balance)
                     })
             else:
-                if "CONTINUA EN PAGINA SIGUIENTE" in line:
+                if "CONTINUA EN PAGINA SIGUIENTE" in line_markers:
                     skip_until_headers = True
                 elif skip_until_headers:
-                    if header_regex.match(line):
+                    if patterns.match("header", line):
                         skip_until_headers = False
                     # Else, continue skipping
                 elif not line:
                     # Ignore blank lines
                     pass
-                elif "SALDO AL" in line:
+                elif "SALDO AL" in line_markers:
                     # Extract the date and balance for SALDO FINAL
                     # Example: "SALDO AL 31/05/24 9.910.825,60"
-                    saldo_final_match = re.search(r'SALDO AL\s+(\d{2}/\d{2}/\d{2})\s+([\d\.,\-−]+)', line)
+                    saldo_final_match = patterns.search("saldo_final", line)
                     if saldo_final_match:
                         date = saldo_final_match.group(1)
                         saldo_final_str = saldo_final_match.group(2)
@@ -118,14 +152,16 @@ class CredicoopParser:
                     break  # Assuming SALDO FINAL is the end
                 else:
                     # Check if line starts with a valid date
-                    fecha_str = line[self.FIELD_CONFIG["FECHA"][0]:self.FIELD_CONFIG["FECHA"][1]].strip()
-                    if self.DATE_REGEX.match(fecha_str):
+                    # Slice the margin-free line, like the continuation lines below
+                    row, config = lines[i], configs[i]
+                    fecha_str = row[config["FECHA"][0]:config["FECHA"][1]].strip()
+                    if patterns.match("date", fecha_str):
                         # Start of a new entry
-                        combte_str = line[self.FIELD_CONFIG["COMBTE"][0]:self.FIELD_CONFIG["COMBTE"][1]].strip()
-                        descripcion_str = line[self.FIELD_CONFIG["DESCRIPCION"][0]:self.FIELD_CONFIG["DESCRIPCION"][1]].strip()
-                        debito_str = line[self.FIELD_CONFIG["DEBITO"][0]:self.FIELD_CONFIG["DEBITO"][1]].strip()
-                        credito_str = line[self.FIELD_CONFIG["CREDITO"][0]:self.FIELD_CONFIG["CREDITO"][1]].strip()
-                        saldo_str = line[self.FIELD_CONFIG["SALDO"][0]:].strip()
+                        combte_str = row[config["COMBTE"][0]:config["COMBTE"][1]].strip()
+                        descripcion_str = row[config["DESCRIPCION"][0]:config["DESCRIPCION"][1]].strip()
+                        debito_str = row[config["DEBITO"][0]:config["DEBITO"][1]].strip()
+                        credito_str = row[config["CREDITO"][0]:config["CREDITO"][1]].strip()
+                        saldo_str = row[config["SALDO"][0]:].strip()
 
                         current_entry = {
                             "FECHA": fecha_str,
@@ -140,10 +176,11 @@ class CredicoopParser:
                         j = i + 1
                         while j < len(lines):
                             next_line = lines[j]
-                            next_fecha = next_line[self.FIELD_CONFIG["FECHA"][0]:self.FIELD_CONFIG["FECHA"][1]].strip()
-                            if not self.DATE_REGEX.match(next_fecha) and next_line.strip() and "SALDO AL" not in next_line.strip():
+                            next_config = configs[j]
+                            next_fecha = next_line[next_config["FECHA"][0]:next_config["FECHA"][1]].strip()
+                            if not patterns.match("date", next_fecha) and next_line.strip() and "SALDO AL" not in marker_hits.get(j, ()):
                                 # Continuation line
-                                continuation_descr = next_line[self.FIELD_CONFIG["DESCRIPCION"][0]:self.FIELD_CONFIG["DESCRIPCION"][1]].strip()
+                                continuation_descr = next_line[next_config["DESCRIPCION"][0]:next_config["DESCRIPCION"][1]].strip()
                                 if continuation_descr:
                                     current_entry["DESCRIPCION"] += "\n" + continuation_descr
                                 j += 1
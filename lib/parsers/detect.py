@@ -0,0 +1,77 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Only the head of the first page is inspected; every marker below shows up
+# in the statement header or the opening balance line.
+DETECTION_WINDOW = 3000
+
+# Distinctive markers per bank and their weight. Bank names weigh the most,
+# layout markers shared by several banks (e.g. "SALDO ANTERIOR") weigh less.
+FINGERPRINTS = {
+    "BBVA": {"BBVA": 3, "Información al": 2, "Movimientos en cuentas": 2},
+    "BPN": {"Banco Provincia del Neuquén": 3, "BPN": 2, "Saldo Anterior en $": 2},
+    "Comafi": {"COMAFI": 3, "RESUMEN DE OPERACIONES": 1, "DETALLE DE MOVIMIENTOS": 1},
+    "Credicoop": {"CREDICOOP": 3, "FECHA COMBTE DESCRIPCION": 2, "CONTINUA EN PAGINA SIGUIENTE": 1},
+    "Galicia": {"GALICIA": 3, "Período de movimientos": 2, "Consolidado de retención de impuestos": 1},
+    "HSBC": {"HSBC": 3, "EXTRACTO DEL": 2, "- SALDO ANTERIOR": 1},
+    "ICBC": {"ICBC": 3, "SALDO ULTIMO EXTRACTO": 2, "PERIODO": 1},
+    "Macro": {"MACRO": 3, "SALDO FINAL AL DIA": 2},
+    "Mercado Pago": {"Mercado Pago": 3, "Saldo inicial:": 2, "DETALLE DE MOVIMIENTOS": 1},
+    "Nación": {"BANCO DE LA NACION": 3, "COMPROB.": 1, "SALDO ANTERIOR": 1},
+    "Patagonia": {"PATAGONIA": 3, "FECHA VALOR": 1},
+    "Roela": {"ROELA": 3, "Saldo Al Inicio": 2},
+    "Santander": {"SANTANDER": 3, "Saldo Inicial": 1, "Saldo en cuenta": 1},
+    "Supervielle": {"SUPERVIELLE": 3, "Saldo del período anterior": 2, "SALDO PERIODO ACTUAL": 1},
+}
+
+
+def _build_index(fingerprints: Dict[str, Dict[str, int]]) -> Tuple[re.Pattern, Dict[str, List[Tuple[str, int]]], Dict[str, int]]:
+    """
+    Precompute a single alternation over every marker plus an inverted index
+    from marker to the banks (and weights) it votes for.
+    """
+    index = {}
+    totals = {}
+    for bank, markers in fingerprints.items():
+        totals[bank] = sum(markers.values())
+        for marker, weight in markers.items():
+            index.setdefault(marker.lower(), []).append((bank, weight))
+
+    # Longest markers first so "- SALDO ANTERIOR" wins over "SALDO ANTERIOR"
+    alternatives = sorted(index, key=len, reverse=True)
+    pattern = re.compile("|".join(re.escape(marker) for marker in alternatives), re.IGNORECASE)
+
+    return pattern, index, totals
+
+
+_pattern, _index, _totals = _build_index(FINGERPRINTS)
+
+
+def detect_bank(first_page: str, window: int = DETECTION_WINDOW) -> Tuple[Optional[str], float]:
+    """
+    Guess the bank of a statement from the head of its first page.
+    Returns the bank name (None if nothing matched) and a confidence in [0, 1].
+    """
+    head = re.sub(r'[ \t]+', ' ', first_page[:window])
+
+    seen = set()
+    scores = {}
+    for match in _pattern.finditer(head):
+        marker = match.group(0).lower()
+        if marker in seen:
+            continue
+        seen.add(marker)
+        for bank, weight in _index[marker]:
+            scores[bank] = scores.get(bank, 0) + weight
+
+    if not scores:
+        return None, 0.0
+
+    ranked = sorted(((score / _totals[bank], bank) for bank, score in scores.items()), reverse=True)
+    best_score, best_bank = ranked[0]
+    runner_up = ranked[1][0] if len(ranked) > 1 else 0.0
+
+    # Full fingerprint coverage with no competing bank gives 1.0
+    confidence = best_score * (1 - runner_up / (best_score + runner_up))
+
+    return best_bank, round(confidence, 3)
@@ -1,6 +1,11 @@
-import re
-
 from typing import Dict, List
+from lib.parsers.patterns import PatternRegistry
+
+patterns = PatternRegistry("Galicia", {
+    "date": r"^\d{2}/\d{2}/\d{2}$",
+    # Currency with optional trailing '-'
+    "currency": r"-?\d{1,3}(?:\.\d{3})*,\d{2}-?$",
+})
 
 def convert_to_canonical_format(data: Dict) -> Dict:
     canonical_rows = []
@@ -20,6 +25,9 @@ def convert_to_canonical_format(data: Dict) -> Dict:
     return canonical_rows
 
 class GaliciaParser:
+    # Every movement row carries the balance printed in the statement
+    prints_balances = True
+
     def parse(self, data: List[str]) -> List[List[Dict[str, str]]]:
         """
         Parses the provided bank statement data and extracts transaction details.
@@ -34,10 +42,6 @@ class GaliciaParser:
         full_text = "\n".join(data)
         lines = full_text.split("\n")
 
-        # Define regex patterns
-        date_pattern = re.compile(r"^\d{2}/\d{2}/\d{2}$")
-        # Updated currency pattern to allow optional trailing '-'
-        currency_pattern = re.compile(r"-?\d{1,3}(?:\.\d{3})*,\d{2}-?$")
         stop_phrase = "Consolidado de retención de impuestos"
 
         transactions = []
@@ -49,12 +53,12 @@ class GaliciaParser:
         for i, line in enumerate(lines):
             if "Período de movimientos" in line:
                 # Skip the first currency value
-                while i < total_lines and not currency_pattern.match(lines[i].replace('$', '').strip()):
+                while i < total_lines and not patterns.match("currency", lines[i].replace('$', '').strip()):
                     i += 1
                 i += 1  # Skip the first currency value
 
                 # Get the second currency value (initial balance)
-                while i < total_lines and not currency_pattern.match(lines[i].replace('$', '').strip()):
+                while i < total_lines and not patterns.match("currency", lines[i].replace('$', '').strip()):
                     i += 1
 
                 if i < total_lines:
@@ -86,7 +90,7 @@ class GaliciaParser:
                 break
 
             # Check if the line is a date
-            if date_pattern.match(line):
+            if patterns.match("date", line):
                 transaction = {
                     'Fecha': line,
                     'Descripción': '',
@@ -102,7 +106,7 @@ class GaliciaParser:
                 while i < total_lines:
                     desc_line = lines[i].strip()
                     # Stop if line matches currency, date, or is empty
-                    if currency_pattern.match(desc_line) or date_pattern.match(desc_line) or desc_line == '':
+                    if patterns.match("currency", desc_line) or patterns.match("date", desc_line) or desc_line == '':
                         break
                     description_lines.append(desc_line)
                     i += 1
@@ -113,14 +117,14 @@ class GaliciaParser:
                 # Optionally capture 'Origen' if present
                 if i < total_lines:
                     next_line = lines[i].strip()
-                    if not currency_pattern.match(next_line) and not date_pattern.match(next_line) and next_line != '':
+                    if not patterns.match("currency", next_line) and not patterns.match("date", next_line) and next_line != '':
                         transaction['Origen'] = next_line
                         i += 1
 
                 # Capture Crédito or Débito
                 if i < total_lines:
                     credit_debit_line = lines[i].strip()
-                    credit_debit_match = currency_pattern.match(credit_debit_line)
+                    credit_debit_match = patterns.match("currency", credit_debit_line)
                     if credit_debit_match:
                         if credit_debit_line.startswith('-'):
                             transaction['Débito'] = credit_debit_line
@@ -134,7 +138,7 @@ class GaliciaParser:
                 # Capture Saldo
                 if i < total_lines:
                     saldo_line = lines[i].strip()
-                    saldo_match = currency_pattern.match(saldo_line)
+                    saldo_match = patterns.match("currency", saldo_line)
                     if saldo_match:
                         # Handle Saldo with trailing '-'
                         if saldo_line.endswith('-'):
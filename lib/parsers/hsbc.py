@@ -1,6 +1,22 @@
-import re
-import streamlit as st
 from typing import List, Dict
+from lib import debug
+from lib.parsers.markers import MarkerMatcher
+from lib.parsers.patterns import PatternRegistry
+
+patterns = PatternRegistry("HSBC", {
+    "year": r"EXTRACTO DEL \d{2}/\d{2}/(\d{4}) AL",
+    "page_header": r'^HOJA\s+\d+\s+DE\s+\d+',
+    "trailing_amount": r'([\d.,]+-?)$',
+    "date": r'^(\d{2})-([A-Z]{3})',
+    "trailing_number": r'(\d+)$',
+})
+
+# Sections following the movements; the first one ends the parse
+ending_markers = MarkerMatcher([
+    "- RESUMEN DE ACUERDOS -",
+    "- CALCULO DE INTERESES POR DESCUBIERTO -",
+    "- DETALLE DE INTERESES DEVENGADOS Y DEBITADOS -"
+], ignore_case=False)
 
 def convert_to_canonical_format(data: Dict) -> Dict:
     canonical_rows = []
@@ -21,7 +37,7 @@ def convert_to_canonical_format(data: Dict) -> Dict:
 
 class HSBCParser:
     def parse(self, data: List[str]) -> List[List[Dict[str, str]]]:
-        st.write(data)
+        debug.debug("HSBC input: %s", data)
         records = []
         current_date = ""
         previous_saldo = None
@@ -37,7 +53,7 @@ class HSBCParser:
 
         # First pass to extract the year
         for page in data:
-            match_year = re.search(r"EXTRACTO DEL \d{2}/\d{2}/(\d{4}) AL", page)
+            match_year = patterns.search("year", page)
             if match_year:
                 current_year = match_year.group(1)
                 break
@@ -46,18 +62,17 @@ class HSBCParser:
             raise ValueError("Year not found in the data.")
 
         # Split data into lines
-        lines = []
-        for page in data:
-            page_lines = page.split('\n')
-            lines.extend(page_lines)
+        text = "\n".join(data)
+        lines = text.split('\n')
+        ending_lines = ending_markers.line_hits(text)
 
-        for line in lines:
+        for line_index, line in enumerate(lines):
             line = line.strip()
             if not line:
                 continue
 
             # Ignore lines starting with "HOJA X DE Y"
-            if re.match(r'^HOJA\s+\d+\s+DE\s+\d+', line):
+            if patterns.match("page_header", line):
                 ignoring = True
                 continue
 
@@ -79,17 +94,12 @@ class HSBCParser:
 
             # Stop processing at "- SALDO FINAL"
             #if line.startswith("- SALDO FINAL"):
-            ending_lines = [
-                "- RESUMEN DE ACUERDOS -",
-                "- CALCULO DE INTERESES POR DESCUBIERTO -",
-                "- DETALLE DE INTERESES DEVENGADOS Y DEBITADOS -"
-            ]
-            if any(ending_line in line for ending_line in ending_lines):
+            if line_index in ending_lines:
                 break
 
             # Handle "SALDO ANTERIOR"
             if line.startswith("- SALDO ANTERIOR"):
-                saldo_match = re.search(r'([\d.,]+-?)$', line)
+                saldo_match = patterns.search("trailing_amount", line)
                 if saldo_match:
                     saldo_str = saldo_match.group(1)
                     records.append({
@@ -107,7 +117,7 @@ class HSBCParser:
                 continue
 
             # Handle date lines
-            date_match = re.match(r'^(\d{2})-([A-Z]{3})', line)
+            date_match = patterns.match("date", line)
             if date_match:
                 day, month_str = date_match.groups()
                 month = months.get(month_str, '00')
@@ -145,7 +155,7 @@ class HSBCParser:
         }
 
         # Extract SALDO
-        saldo_match = re.search(r'([\d.,]+-?)$', line)
+        saldo_match = patterns.search("trailing_amount", line)
         if not saldo_match:
             raise ValueError(f"SALDO not found in line: {line}")
         saldo_str = saldo_match.group(1)
@@ -153,14 +163,14 @@ class HSBCParser:
         line = line[:saldo_match.start()].strip()
 
         # Extract DEBITO or CREDITO
-        amount_match = re.search(r'([\d.,]+-?)$', line)
+        amount_match = patterns.search("trailing_amount", line)
         if not amount_match:
             raise ValueError(f"Amount (DEBITO/CREDITO) not found in line: {line}")
         amount_str = amount_match.group(1)
         line = line[:amount_match.start()].strip()
 
         # Extract NRO
-        nro_match = re.search(r'(\d+)$', line)
+        nro_match = patterns.search("trailing_number", line)
         if nro_match:
             record['NRO'] = nro_match.group(1)
             line = line[:nro_match.start()].strip()
@@ -1,6 +1,14 @@
-import re
 import datetime
 from typing import Dict, List, Tuple
+from lib.parsers.patterns import PatternRegistry
+
+patterns = PatternRegistry("ICBC", {
+    "periodo": r'PERIODO\s+\d{2}-\d{2}-(\d{4})',
+    "trailing_amount": r'(\d{1,3}(?:\.\d{3})*,\d{2}-?)$',
+    "saldo_ultimo_extracto": r'SALDO ULTIMO EXTRACTO AL (\d{2}/\d{2}/\d{4})\s+([\d\.,-]+)',
+    "fecha": r'^(\d{2})-(\d{2})\s+(.*)',
+    "f_valor": r'(\d{2}-\d{2})$',
+})
 
 def convert_to_canonical_format(data: Dict) -> Dict:
     canonical_rows = []
@@ -38,7 +46,7 @@ class ICBCParser:
         # Extract the year from the "PERIODO" line
         for line in lines:
             if "PERIODO" in line:
-                periodo_match = re.search(r'PERIODO\s+\d{2}-\d{2}-(\d{4})', line)
+                periodo_match = patterns.search("periodo", line)
                 if periodo_match:
                     year = periodo_match.group(1)
                 break  # Assuming "PERIODO" appears only once
@@ -68,9 +76,8 @@ class ICBCParser:
         # Function to extract amounts from the end of the line
         def extract_amounts_from_end_of_line(line: str) -> Tuple[str, List[str]]:
             amounts = []
-            pattern = r'(\d{1,3}(?:\.\d{3})*,\d{2}-?)$'
             while True:
-                match = re.search(pattern, line)
+                match = patterns.search("trailing_amount", line)
                 if match:
                     amount_str = match.group(1)
                     amounts.insert(0, amount_str)  # Insert at the beginning
@@ -91,7 +98,7 @@ class ICBCParser:
                     accounts.append(convert_to_canonical_format(rows))
                     rows = []
                 # Handle initial balance with proper decimal handling
-                match = re.search(r'SALDO ULTIMO EXTRACTO AL (\d{2}/\d{2}/\d{4})\s+([\d\.,-]+)', text)
+                match = patterns.search("saldo_ultimo_extracto", text)
                 if match:
                     saldo_str = match.group(2).replace('.', '').replace(',', '.').rstrip('-')
                     if match.group(2).endswith('-'):
@@ -114,7 +121,7 @@ class ICBCParser:
                 continue
 
             # Check if line starts with date
-            fecha_match = re.match(r'^(\d{2})-(\d{2})\s+(.*)', text)
+            fecha_match = patterns.match("fecha", text)
             if fecha_match:
                 dia, mes, rest_of_line = fecha_match.groups()
                 fecha = f"{dia}/{mes}/{year}"
@@ -123,7 +130,7 @@ class ICBCParser:
                 rest_of_line, amount_tokens = extract_amounts_from_end_of_line(rest_of_line)
 
                 # Now, try to extract 'F. VALOR' from 'rest_of_line' if present
-                f_valor_match = re.search(r'(\d{2}-\d{2})$', rest_of_line)
+                f_valor_match = patterns.search("f_valor", rest_of_line)
                 if f_valor_match:
                     f_valor_raw = f_valor_match.group(1)
                     f_valor = f"{f_valor_raw.replace('-', '/')}/{year}"
@@ -0,0 +1,168 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Number of inferred layouts remembered
+CACHE_SIZE = 128
+
+# Fewer movement lines than this are not enough to trust an inferred layout
+MIN_LINES = 5
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def layout_key(header_line: str) -> str:
+    """
+    Hash of a column header line; pages sharing it share the column layout
+    """
+    return hashlib.sha1(header_line.encode('utf-8')).hexdigest()
+
+
+def _occupancy(lines: List[str]) -> np.ndarray:
+    """
+    Boolean character matrix of the lines: True where a character is not blank
+    """
+    width = max(len(line) for line in lines)
+    buffer = "".join(line.ljust(width) for line in lines).encode('utf-32-le')
+    return np.frombuffer(buffer, dtype=np.uint32).reshape(len(lines), width) != ord(' ')
+
+
+def _token_starts(header_line: str) -> np.ndarray:
+    occupied = _occupancy([header_line])[0]
+    return np.flatnonzero(occupied & ~np.concatenate(([False], occupied[:-1])))
+
+
+def infer_columns(lines: List[str], min_gap: int = 2, header_line: Optional[str] = None) -> List[Tuple[int, int]]:
+    """
+    Infer fixed-width columns from a whitespace-occupancy histogram.
+
+    The lines are laid out as a character matrix; a character position is a
+    gutter when no line has a non-blank character there. Runs of occupied
+    positions separated by gutters narrower than min_gap (e.g. the single
+    spaces inside a description) are merged into one column, unless a token
+    of the header line starts right there.
+    Returns (start, end) spans, end exclusive.
+    """
+    lines = [line for line in lines if line.strip()]
+    if not lines:
+        return []
+
+    histogram = np.count_nonzero(_occupancy(lines), axis=0)
+    occupied = np.concatenate(([0], (histogram > 0).astype(np.int8), [0]))
+    edges = np.diff(occupied)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    keep = starts[1:] - ends[:-1] >= min_gap
+    if header_line:
+        keep |= np.isin(starts[1:], _token_starts(header_line))
+    starts = np.concatenate((starts[:1], starts[1:][keep]))
+    ends = np.concatenate((ends[:-1][keep], ends[-1:]))
+
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def _header_tokens(header_line: str) -> Dict[str, Tuple[int, int]]:
+    """
+    (start, end) span of every whitespace-separated token of the header line
+    """
+    occupied = np.concatenate(([False], _occupancy([header_line])[0], [False])).astype(np.int8)
+    edges = np.diff(occupied)
+    spans = zip(np.flatnonzero(edges == 1).tolist(), np.flatnonzero(edges == -1).tolist())
+    return {header_line[start:end]: (start, end) for start, end in spans}
+
+
+def matches_header(config: Dict[str, Tuple[int, int]], header_line: str) -> bool:
+    """
+    Whether every field named in the header line has its title inside the
+    field's slice, i.e. the inferred columns are the ones the header announces
+    and not, say, a description split in two standing in for a missing column
+    """
+    tokens = _header_tokens(header_line)
+    for field, (start, end) in config.items():
+        title = tokens.get(field)
+        if title is not None and (title[1] <= start or (end is not None and title[0] >= end)):
+            return False
+    return True
+
+
+def fits(config: Dict[str, Tuple[int, int]], lines: List[str]) -> bool:
+    """
+    Whether no line has text running across a boundary of the field config,
+    i.e. the columns of these lines still fall inside its slices
+    """
+    boundaries = [start for start, _ in config.values()][1:]
+    for line in lines:
+        for boundary in boundaries:
+            if boundary < len(line) and line[boundary - 1] != ' ' and line[boundary] != ' ':
+                return False
+    return True
+
+
+def _right_aligned(occupancy: np.ndarray, start: int, end: int) -> bool:
+    """
+    Whether every line that has text in the column ends it at the same position
+    """
+    column = occupancy[:, start:end]
+    filled = column.any(axis=1)
+    last = end - 1 - np.argmax(column[filled, ::-1], axis=1)
+    return bool(np.all(last == last[0]))
+
+
+def infer_field_config(lines: List[str], fields: List[str], key: Optional[str] = None,
+                       header_line: Optional[str] = None) -> Optional[Dict[str, Tuple[int, int]]]:
+    """
+    Map inferred columns onto the given fields, in order, as (start, end)
+    slices in the same shape as a parser's static FIELD_CONFIG. The last
+    slice is open ended. A boundary sits where the previous column ends when
+    that column is right aligned, mid-gutter when only the next one is (it may
+    grow to the left) and where the next column starts otherwise.
+
+    Returns None with fewer than MIN_LINES lines, when the number of columns
+    doesn't match the fields or when a field titled in header_line doesn't
+    sit under its title, so the caller can fall back. Successful layouts
+    are cached under key, and a cached one is only reused when the lines fit
+    it (e.g. a later statement with wider amounts is inferred again).
+    """
+    lines = [line for line in lines if line.strip()]
+    if key is not None:
+        with _lock:
+            config = _cache.get(key)
+            if config is not None:
+                _cache.move_to_end(key)
+        if config is not None and fits(config, lines):
+            return config
+
+    if len(lines) < MIN_LINES:
+        return None
+
+    spans = infer_columns(lines, header_line=header_line)
+    if len(spans) != len(fields):
+        return None
+
+    occupancy = _occupancy(lines)
+    aligned = [_right_aligned(occupancy, start, end) for start, end in spans]
+    boundaries = []
+    for (_, previous_end), (next_start, _), previous_right, next_right in zip(spans, spans[1:], aligned, aligned[1:]):
+        if previous_right:
+            boundaries.append(previous_end)
+        elif next_right:
+            boundaries.append((previous_end + next_start) // 2)
+        else:
+            boundaries.append(next_start)
+
+    config = dict(zip(fields, zip([0] + boundaries, boundaries + [None])))
+    if header_line and not matches_header(config, header_line):
+        return None
+
+    if key is not None:
+        with _lock:
+            _cache[key] = config
+            if len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+
+    return config
@@ -1,11 +1,21 @@
-import streamlit as st
 from typing import Dict, List
 import re
+from lib import debug
+from lib.parsers.patterns import PatternRegistry
+
+patterns = PatternRegistry("Macro", {
+    "saldo_ultimo_extracto_line": (r"SALDO ULTIMO EXTRACTO", re.IGNORECASE),
+    "saldo_ultimo_extracto": (r"SALDO ULTIMO EXTRACTO AL\s*(\d{1,2}/\d{1,2}/\d{4})\s*([\d.,]+)", re.IGNORECASE),
+    "saldo_final_line": (r"SALDO FINAL AL DIA", re.IGNORECASE),
+    "saldo_final": (r"SALDO FINAL AL DIA\s*(\d{1,2}/\d{1,2}/\d{4})\s*([\d.,]+)", re.IGNORECASE),
+    "fecha_descripcion": r"^(\d{1,2}/\d{1,2}/\d{2,4})\s+(.*)",
+    # REFERENCIA is either a number or '0' and DEBITOS is a number with possible commas and dots
+    "transaction": r"^(?P<descripcion>.*?)\s+(?:(?P<referencia>\d+|0)\s+)?(?P<debitos>[\d.,]+)(?:\s+[\d.,]+)?$",
+    "date": r"^\d{1,2}/\d{1,2}/\d{2,4}",
+})
 
 class MacroParser:
     def parse(self, data: List[Dict]) -> List[Dict]:
-        st.write("### MACRO PARSER")
-        
         # Step 1: Extract and Sort Text Elements
         texts = []
         for element in data:
@@ -22,12 +32,12 @@ class MacroParser:
                 elif all(isinstance(coord, (int, float)) for coord in bbox):
                     # bbox is a flat list of coordinates
                     if len(bbox) % 2 != 0:
-                        st.warning(f"Invalid bbox format for text: {text}")
+                        debug.warning("Invalid bbox format for text: %s", text)
                         continue
                     x_coords = bbox[0::2]
                     y_coords = bbox[1::2]
                 else:
-                    st.warning(f"Invalid bbox structure for text: {text}")
+                    debug.warning("Invalid bbox structure for text: %s", text)
                     continue
                 x0 = min(x_coords)
                 y0 = min(y_coords)
@@ -37,11 +47,11 @@ class MacroParser:
                     'y0': y0
                 })
             else:
-                st.warning(f"Unexpected bbox type for text: {text}")
+                debug.warning("Unexpected bbox type for text: %s", text)
                 continue
 
         if not texts:
-            st.error("No valid text data found.")
+            debug.error("No valid text data found.")
             return []
 
         # Step 2: Sort texts by y0 (top to bottom) then x0 (left to right)
@@ -50,19 +60,18 @@ class MacroParser:
         # Step 3: Group texts into lines based on y0 proximity
         lines = self.group_texts_into_lines(texts, y_threshold=10)  # Adjust y_threshold as needed
 
-        st.write(f"Total lines detected: {len(lines)}")
+        debug.info("Total lines detected: %s", len(lines))
 
         # Step 4: Construct line strings
         line_strings = self.construct_line_strings(lines)
 
-        st.write(f"Constructed {len(line_strings)} line strings.")
+        debug.info("Constructed %s line strings.", len(line_strings))
 
         # Step 5: Parse each line using regex
         parsed_data = self.parse_lines(line_strings)
 
-        # Step 6: Display parsed data
-        st.write("### Parsed Data:")
-        st.json(parsed_data)
+        # Step 6: Record parsed data for diagnostics
+        debug.debug("Parsed data: %s", parsed_data)
         return parsed_data
 
     def group_texts_into_lines(self, texts: List[Dict], y_threshold: int = 10) -> List[List[Dict]]:
@@ -110,10 +119,10 @@ class MacroParser:
         saldo_final_present = False  # Flag to identify SALDO FINAL
 
         for idx, line in enumerate(line_strings):
-            st.write(f"Processing line {idx}: '{line}'")
+            debug.debug("Processing line %s: '%s'", idx, line)
             # Check for SALDO ULTIMO EXTRACTO
-            if re.search(r"SALDO ULTIMO EXTRACTO", line, re.IGNORECASE):
-                match = re.search(r"SALDO ULTIMO EXTRACTO AL\s*(\d{1,2}/\d{1,2}/\d{4})\s*([\d.,]+)", line, re.IGNORECASE)
+            if patterns.search("saldo_ultimo_extracto_line", line):
+                match = patterns.search("saldo_ultimo_extracto", line)
                 if match:
                     fecha = match.group(1)
                     saldo = match.group(2)
@@ -125,14 +134,14 @@ class MacroParser:
                         "CREDITOS": "",
                         "SALDO": saldo
                     })
-                    st.write(f"Extracted SALDO ULTIMO EXTRACTO: Fecha={fecha}, Saldo={saldo}")
+                    debug.debug("Extracted SALDO ULTIMO EXTRACTO: Fecha=%s, Saldo=%s", fecha, saldo)
                 else:
-                    st.warning(f"Could not parse SALDO ULTIMO EXTRACTO from line {idx}: '{line}'")
+                    debug.warning("Could not parse SALDO ULTIMO EXTRACTO from line %s: '%s'", idx, line)
                 continue
 
             # Check for SALDO FINAL
-            if re.search(r"SALDO FINAL AL DIA", line, re.IGNORECASE):
-                match = re.search(r"SALDO FINAL AL DIA\s*(\d{1,2}/\d{1,2}/\d{4})\s*([\d.,]+)", line, re.IGNORECASE)
+            if patterns.search("saldo_final_line", line):
+                match = patterns.search("saldo_final", line)
                 if match:
                     fecha = match.group(1)
                     saldo = match.group(2)
@@ -144,39 +153,36 @@ class MacroParser:
                         "CREDITOS": "",
                         "SALDO": saldo
                     })
-                    st.write(f"Extracted SALDO FINAL: Fecha={fecha}, Saldo={saldo}")
+                    debug.debug("Extracted SALDO FINAL: Fecha=%s, Saldo=%s", fecha, saldo)
                     saldo_final_present = True
                 else:
-                    st.warning(f"Could not parse SALDO FINAL AL DIA from line {idx}: '{line}'")
+                    debug.warning("Could not parse SALDO FINAL AL DIA from line %s: '%s'", idx, line)
                 continue
 
             # Check if the line starts with a date
             if self.is_date(line):
                 # Extract FECHA and DESCRIPCION
-                match = re.match(r"^(\d{1,2}/\d{1,2}/\d{2,4})\s+(.*)", line)
+                match = patterns.match("fecha_descripcion", line)
                 if match:
                     fecha = match.group(1)
                     descripcion = match.group(2)
                 else:
-                    st.warning(f"Could not parse FECHA and DESCRIPCION from line {idx}: '{line}'")
+                    debug.warning("Could not parse FECHA and DESCRIPCION from line %s: '%s'", idx, line)
                     continue
 
                 # Initialize fields
                 referencia = ""
                 debitos = ""
 
-                # Regex to extract DESCRIPCION, REFERENCIA, DEBITOS
-                # This pattern assumes that REFERENCIA is either a number or '0'
-                # and DEBITOS is a number with possible commas and dots
-                transaction_pattern = r"^(?P<descripcion>.*?)\s+(?:(?P<referencia>\d+|0)\s+)?(?P<debitos>[\d.,]+)(?:\s+[\d.,]+)?$"
-                trans_match = re.match(transaction_pattern, descripcion)
+                # Extract DESCRIPCION, REFERENCIA, DEBITOS
+                trans_match = patterns.match("transaction", descripcion)
 
                 if trans_match:
                     descripcion = trans_match.group('descripcion').strip()
                     referencia = trans_match.group('referencia').strip() if trans_match.group('referencia') else ""
                     debitos = trans_match.group('debitos').strip() if trans_match.group('debitos') else ""
                 else:
-                    st.warning(f"Could not parse transaction details from line {idx}: '{line}'")
+                    debug.warning("Could not parse transaction details from line %s: '%s'", idx, line)
                     continue
 
                 # Assign fields without normalization to preserve original format
@@ -190,15 +196,15 @@ class MacroParser:
                 }
 
                 parsed_data.append(parsed_entry)
-                st.write(f"Extracted Transaction: {parsed_entry}")
+                debug.debug("Extracted Transaction: %s", parsed_entry)
                 continue
 
             # Skip other lines
-            st.write(f"Skipping non-transaction line {idx}: '{line}'")
+            debug.debug("Skipping non-transaction line %s: '%s'", idx, line)
 
         # Optionally, verify if SALDO FINAL was captured
         if not saldo_final_present:
-            st.warning("SALDO FINAL not found in the document.")
+            debug.warning("SALDO FINAL not found in the document.")
 
         return parsed_data
 
@@ -206,4 +212,4 @@ class MacroParser:
         """
         Checks if a string starts with a date pattern (e.g., dd/mm/yyyy or dd/mm/yy).
         """
-        return bool(re.match(r"^\d{1,2}/\d{1,2}/\d{2,4}", s))
+        return bool(patterns.match("date", s))
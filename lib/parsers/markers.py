@@ -0,0 +1,110 @@
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class MarkerMatcher:
+    """
+    Aho-Corasick automaton over a fixed set of markers. Built once per bank at
+    import, it reports every marker occurrence in a single pass over the text.
+
+    Case folding is compiled into the transitions (both cases of every marker
+    character lead to the same state), so the scanned text is never copied.
+    """
+    def __init__(self, markers: Iterable[str], ignore_case: bool = True):
+        self.markers = list(dict.fromkeys(markers))
+        self.ignore_case = ignore_case
+        self._delta, self._output = self._build(self.markers, ignore_case)
+
+    @staticmethod
+    def _variants(char: str) -> Set[str]:
+        variants = {char, char.lower(), char.upper()}
+        return {variant for variant in variants if len(variant) == 1}
+
+    @classmethod
+    def _build(cls, markers: List[str], ignore_case: bool) -> Tuple[List[Dict[str, int]], List[Tuple[str, ...]]]:
+        # Trie
+        goto = [{}]
+        output = [[]]
+        for marker in markers:
+            state = 0
+            for char in marker:
+                chars = cls._variants(char) if ignore_case else {char}
+                next_state = next((goto[state][c] for c in chars if c in goto[state]), None)
+                if next_state is None:
+                    goto.append({})
+                    output.append([])
+                    next_state = len(goto) - 1
+                for c in chars:
+                    goto[state][c] = next_state
+                state = next_state
+            output[state].append(marker)
+
+        # Failure links, folded into a full transition table so scanning
+        # never has to walk back through them
+        fail = [0] * len(goto)
+        delta = [dict(transitions) for transitions in goto]
+        queue = deque()
+        for state in set(goto[0].values()):
+            queue.append(state)
+
+        visited = set(queue)
+        while queue:
+            state = queue.popleft()
+            output[state].extend(output[fail[state]])
+            for char, next_state in goto[state].items():
+                if next_state not in visited:
+                    visited.add(next_state)
+                    fail[next_state] = delta[fail[state]].get(char, 0) if state else 0
+                    queue.append(next_state)
+            for char, next_state in delta[fail[state]].items():
+                delta[state].setdefault(char, next_state)
+
+        return delta, [tuple(markers) for markers in output]
+
+    def scan(self, text: str) -> List[Tuple[int, str]]:
+        """
+        Return (start offset, marker) for every marker occurrence in the text
+        """
+        delta = self._delta
+        output = self._output
+        hits = []
+        state = 0
+        for index, char in enumerate(text):
+            state = delta[state].get(char, 0)
+            if output[state]:
+                for marker in output[state]:
+                    hits.append((index - len(marker) + 1, marker))
+        return hits
+
+    def line_hits(self, text: str) -> Dict[int, Set[str]]:
+        """
+        Return the markers found on each line of the text, keyed by line index
+        (as in text.split('\\n')). Lines without hits are left out.
+        """
+        delta = self._delta
+        output = self._output
+        hits = {}
+        state = 0
+        line = 0
+        for char in text:
+            if char == '\n':
+                line += 1
+                state = 0
+                continue
+            state = delta[state].get(char, 0)
+            if output[state]:
+                hits.setdefault(line, set()).update(output[state])
+        return hits
+
+    def matches(self, text: str) -> bool:
+        """
+        Whether any marker occurs in the text
+        """
+        delta = self._delta
+        output = self._output
+        state = 0
+        for char in text:
+            state = delta[state].get(char, 0)
+            if output[state]:
+                return True
+        return False
@@ -1,6 +1,20 @@
-import re
 from typing import Dict, List, Optional
 from decimal import Decimal
+from lib.parsers.context import ParseContext
+from lib.parsers.patterns import PatternRegistry
+
+DATE_PATTERN = r'\d{2}-\d{2}-\d{2}\d{2}'
+CURRENCY_PATTERN = r'\$\s*-?\d+(?:(?:\.\d{3})*,\d{2}|,\d{2})'
+
+patterns = PatternRegistry("Mercado Pago", {
+    "date": DATE_PATTERN,
+    "currency": CURRENCY_PATTERN,
+    "initial_balance": r'Saldo inicial:\s*' + CURRENCY_PATTERN,
+    "leading_date": r'^\d{2}-\d{2}-\d{4}\s*',
+    "short_id": r'\d{8}',
+    "id": r'\d{11}',
+    "header_end": r'DETALLE DE MOVIMIENTOS',
+})
 
 def convert_to_canonical_format(data: Dict) -> Dict:
     canonical_rows = []
@@ -23,30 +37,28 @@ def convert_to_canonical_format(data: Dict) -> Dict:
 
 
 class MercadoPagoParser:
-    def __init__(self):
-        self.current_balance = Decimal('0')
-        self.date_pattern = r'\d{2}-\d{2}-\d{2}\d{2}'
-        self.currency_pattern = r'\$\s*-?\d+(?:(?:\.\d{3})*,\d{2}|,\d{2})'
+    # Every movement row carries the balance printed in the statement
+    prints_balances = True
 
     def _parse_currency(self, value: str) -> str:
         """Convert currency format '$ 1.234,56' or '$ -1.234,56' to '1.234,56' or '-1.234,56'"""
         return value.replace('$', '').strip()
 
-    def _validate_balance(self, value: str, balance: str) -> None:
-        """Validate that current_balance + value equals the expected balance"""
+    def _validate_balance(self, context: ParseContext, value: str, balance: str) -> None:
+        """Validate that the running balance + value equals the expected balance"""
         value_decimal = Decimal(value.replace('.', '').replace(',', '.'))
         balance_decimal = Decimal(balance.replace('.', '').replace(',', '.'))
-        self.current_balance += value_decimal
+        context.balance += value_decimal
 
-        if abs(self.current_balance - balance_decimal) > Decimal('0.01'):
-            raise ValueError(f"Balance mismatch: Expected {balance_decimal}, got {self.current_balance}")
+        if abs(context.balance - balance_decimal) > Decimal('0.01'):
+            raise ValueError(f"Balance mismatch: Expected {balance_decimal}, got {context.balance}")
 
-    def _find_initial_balance(self, text: str) -> Optional[str]:
+    def _find_initial_balance(self, context: ParseContext, text: str) -> Optional[str]:
         """Find the initial balance in the text"""
-        match = re.search(r'Saldo inicial:\s*' + self.currency_pattern, text)
+        match = patterns.search("initial_balance", text)
         if match:
             balance = self._parse_currency(match.group().split(':')[1])
-            self.current_balance = Decimal(balance.replace('.', '').replace(',', '.'))
+            context.balance = Decimal(balance.replace('.', '').replace(',', '.'))
             return balance
         return None
 
@@ -59,15 +71,14 @@ class MercadoPagoParser:
         lines = [line.strip() for line in segment.split('\n') if line.strip()]
 
         # Find the line with the ID (8 digits)
-        id_pattern = r'\d{8}'
         description_lines = []
 
         for i, line in enumerate(lines):
-            line = re.sub(r'^\d{2}-\d{2}-\d{4}\s*', '', line)
+            line = patterns.sub("leading_date", '', line)
             # If line contains ID pattern, keep the text before it
-            if re.search(id_pattern, line):
+            if patterns.search("short_id", line):
                 # Split the line at the ID pattern and keep the text before it
-                pre_id_text = re.split(id_pattern, line)[0].strip()
+                pre_id_text = patterns.split("short_id", line)[0].strip()
                 if pre_id_text:
                     description_lines.append(pre_id_text)
                 break
@@ -76,17 +87,17 @@ class MercadoPagoParser:
 
         return ' '.join(description_lines).strip()
 
-    def _extract_transaction(self, text: str, start_idx: int) -> tuple[Optional[Dict[str, str]], int]:
+    def _extract_transaction(self, context: ParseContext, text: str, start_idx: int) -> tuple[Optional[Dict[str, str]], int]:
         """Extract a single transaction starting from the given index"""
         # Find next date
-        date_match = re.search(self.date_pattern, text[start_idx:])
+        date_match = patterns.search("date", text[start_idx:])
         if not date_match:
             return None, len(text)
 
         transaction_start = start_idx + date_match.start()
 
         # Find next date to determine transaction end
-        next_date_match = re.search(self.date_pattern, text[transaction_start + 10:])
+        next_date_match = patterns.search("date", text[transaction_start + 10:])
         transaction_end = transaction_start + 10 + next_date_match.start() if next_date_match else len(text)
 
         transaction_text = text[transaction_start:transaction_end]
@@ -98,11 +109,11 @@ class MercadoPagoParser:
         description = self._extract_description(text, transaction_start, transaction_end)
 
         # Find ID (numeric sequence)
-        id_match = re.search(r'\d{11}', transaction_text)
+        id_match = patterns.search("id", transaction_text)
         id_value = id_match.group() if id_match else ""
 
         # Find currency values (should be last two numbers in transaction)
-        currency_matches = re.finditer(self.currency_pattern, transaction_text)
+        currency_matches = patterns.finditer("currency", transaction_text)
         currency_values = [self._parse_currency(m.group()) for m in currency_matches]
 
         if len(currency_values) >= 2:
@@ -110,7 +121,7 @@ class MercadoPagoParser:
             saldo = currency_values[-1]
 
             # Validate balance
-            #self._validate_balance(valor, saldo)
+            #self._validate_balance(context, valor, saldo)
 
             return {
                 "Fecha": date,
@@ -123,6 +134,8 @@ class MercadoPagoParser:
         return None, transaction_start + 10
 
     def parse(self, data: List[str]) -> List[List[Dict[str, str]]]:
+        context = ParseContext(data)
+        context.balance = Decimal('0')
         result = []
 
         for page in data:
@@ -130,7 +143,7 @@ class MercadoPagoParser:
 
             # Handle initial balance for first page
             if len(result) == 0:
-                initial_balance = self._find_initial_balance(page)
+                initial_balance = self._find_initial_balance(context, page)
                 if initial_balance:
                     page_transactions.append({
                         "Fecha": "",
@@ -141,7 +154,7 @@ class MercadoPagoParser:
                     })
 
             # Skip header section - find "DETALLE DE MOVIMIENTOS" first
-            header_end_match = re.search(r'DETALLE DE MOVIMIENTOS', page)
+            header_end_match = patterns.search("header_end", page)
             if header_end_match:
                 current_pos = header_end_match.end()
 
@@ -154,7 +167,7 @@ class MercadoPagoParser:
 
             # Process transactions
             while current_pos < len(page):
-                transaction, next_pos = self._extract_transaction(page, current_pos)
+                transaction, next_pos = self._extract_transaction(context, page, current_pos)
                 if transaction:
                     page_transactions.append(transaction)
                 current_pos = next_pos
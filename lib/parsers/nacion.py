@@ -1,7 +1,15 @@
-import streamlit as st
 from typing import Dict, List
 from lib.parsers.nacion_alt import NacionParser as NacionParserAlt
-import re
+from lib.parsers.context import parser_instance
+from lib.parsers.markers import MarkerMatcher
+from lib.parsers.patterns import PatternRegistry
+
+stop_markers = MarkerMatcher(["SALDO FINAL"])
+
+patterns = PatternRegistry("Nación", {
+    "date": r'^\d{2}/\d{2}/\d{2}',
+    "trailing_a": r'A$',
+})
 
 def convert_to_canonical_format(data: List[Dict[str, str]]) -> List[Dict[str, str]]:
     canonical_rows = []
@@ -34,9 +42,24 @@ def convert_to_canonical_format(data: List[Dict[str, str]]) -> List[Dict[str, st
     return canonical_rows
 
 class NacionParser:
+    @staticmethod
+    def is_standard_layout(data: List[str]) -> bool:
+        """
+        The standard layout has "SALDO ANTERIOR" on its own line with the amount
+        on the next one; the alternate layout keeps both on the same line.
+        """
+        return any(line.strip().upper() == "SALDO ANTERIOR" for page in data for line in page.split("\n"))
+
     def parse(self, data: List[str]) -> List[List[Dict[str, str]]]:
+        if not self.is_standard_layout(data):
+            return parser_instance(NacionParserAlt).parse(data)
+
+        return self.parse_standard(data)
+
+    def parse_standard(self, data: List[str]) -> List[List[Dict[str, str]]]:
         text = "\n".join(data)
         lines = text.split("\n")
+        stop_lines = stop_markers.line_hits(text)
 
         records = []
         previous_saldo = None
@@ -48,7 +71,7 @@ class NacionParser:
             if line.upper() == "SALDO ANTERIOR":
                 i += 1  # The next line should contain the amount.
                 saldo_line = lines[i].strip() if i < len(lines) else "0,00"
-                saldo_line = re.sub(r'A$', '', saldo_line)  # remove trailing A if present
+                saldo_line = patterns.sub("trailing_a", '', saldo_line)  # remove trailing A if present
                 records.append({
                     "FECHA": "",
                     "MOVIMIENTOS": "SALDO ANTERIOR",
@@ -62,16 +85,13 @@ class NacionParser:
                 break
             i += 1
 
-        # Regex to detect a date at the beginning of a transaction line.
-        date_regex = re.compile(r'^\d{2}/\d{2}/\d{2}')
-
         # Process transactions until "SALDO FINAL" is encountered.
         while i < len(lines):
             line = lines[i].strip()
-            if "SALDO FINAL" in line.upper():
+            if i in stop_lines:
                 break
             # Only process lines that start with a date.
-            if not date_regex.match(line):
+            if not patterns.match("date", line):
                 i += 1
                 continue
 
@@ -101,14 +121,14 @@ class NacionParser:
                 break
             guessed_value_str = lines[i].strip()
             # Remove trailing "A" if present.
-            guessed_value_str = re.sub(r'A$', '', guessed_value_str)
+            guessed_value_str = patterns.sub("trailing_a", '', guessed_value_str)
             i += 1
 
             # Next line: SALDO after the transaction.
             if i >= len(lines):
                 break
             saldo_str = lines[i].strip()
-            saldo_str = re.sub(r'A$', '', saldo_str)
+            saldo_str = patterns.sub("trailing_a", '', saldo_str)
             i += 1
 
             # Determine if this amount is a debit or a credit based on the change in balance.
@@ -133,10 +153,7 @@ class NacionParser:
             records.append(record)
             previous_saldo = current_saldo
 
-        if records:
-            return [convert_to_canonical_format(records)]
-        else:
-            return NacionParserAlt().parse(data)
+        return [convert_to_canonical_format(records)]
 
     def _convert_currency(self, value: str) -> float:
         """
@@ -146,7 +163,7 @@ class NacionParser:
         if not value:
             return 0.0
         # Remove trailing A if exists.
-        value = re.sub(r'A$', '', value)
+        value = patterns.sub("trailing_a", '', value)
         negative = False
         if value.endswith('-'):
             negative = True
@@ -1,6 +1,13 @@
-import streamlit as st
 from typing import Dict, List
-import re
+from lib.parsers.markers import MarkerMatcher
+from lib.parsers.patterns import PatternRegistry
+
+stop_markers = MarkerMatcher(["SALDO FINAL"])
+
+patterns = PatternRegistry("Nación (alternate)", {
+    "date": r'^\d{2}/\d{2}/\d{2}',
+    "trailing_a": r'A$',
+})
 
 def convert_to_canonical_format(data: List[Dict[str, str]]) -> List[Dict[str, str]]:
     canonical_rows = []
@@ -36,6 +43,7 @@ class NacionParser:
     def parse(self, data: List[str]) -> List[List[Dict[str, str]]]:
         text = "\n".join(data)
         lines = text.split("\n")
+        stop_lines = stop_markers.line_hits(text)
 
         records = []
         previous_saldo = None
@@ -48,7 +56,7 @@ class NacionParser:
                 # Extract the saldo value from the end of the line
                 parts = line.split()
                 saldo_line = parts[-1] if parts else "0,00"
-                saldo_line = re.sub(r'A$', '', saldo_line)  # remove trailing A if present
+                saldo_line = patterns.sub("trailing_a", '', saldo_line)  # remove trailing A if present
                 records.append({
                     "FECHA": "",
                     "MOVIMIENTOS": "SALDO ANTERIOR",
@@ -62,16 +70,13 @@ class NacionParser:
                 break
             i += 1
 
-        # Regex to detect a date at the beginning of a transaction line.
-        date_regex = re.compile(r'^\d{2}/\d{2}/\d{2}')
-
         # Process transactions until "SALDO FINAL" is encountered.
         while i < len(lines):
             line = lines[i].strip()
-            if "SALDO FINAL" in line.upper():
+            if i in stop_lines:
                 break
             # Only process lines that start with a date.
-            if not date_regex.match(line):
+            if not patterns.match("date", line):
                 i += 1
                 continue
 
@@ -85,7 +90,7 @@ class NacionParser:
 
             # Find the last numeric value which should be the SALDO
             saldo_str = parts[-1]
-            saldo_str = re.sub(r'A$', '', saldo_str)
+            saldo_str = patterns.sub("trailing_a", '', saldo_str)
 
             # Find COMPROB which is the last integer in the line (ignoring decimals/currency)
             comprob = "0"  # Default value
@@ -125,7 +130,7 @@ class NacionParser:
 
             if amount_index != -1:
                 amount_str = parts[amount_index]
-                amount_str = re.sub(r'A$', '', amount_str)
+                amount_str = patterns.sub("trailing_a", '', amount_str)
 
                 # Determine if this is a debit or credit based on the change in balance
                 current_saldo = self._convert_currency(saldo_str)
@@ -157,7 +162,7 @@ class NacionParser:
         if not value:
             return 0.0
         # Remove trailing A if exists.
-        value = re.sub(r'A$', '', value)
+        value = patterns.sub("trailing_a", '', value)
         negative = False
         if value.endswith('-'):
             negative = True
@@ -1,5 +1,5 @@
-import streamlit as st
 from typing import Dict, List
+from lib import debug
 
 class PatagoniaParser:
     def parse(self, data: List[Dict]) -> List[Dict]:
@@ -107,8 +107,8 @@ class PatagoniaParser:
             if any([entry["FECHA"], entry["CONCEPTO"], entry["DEBITOS"], entry["CREDITOS"], entry["SALDO"]]):
                 output.append(entry)
         
-        # Optionally, display the raw data for debugging purposes
-        st.write("Processed Data:", output)
+        # Record the processed rows for diagnostics
+        debug.debug("Processed data: %s", output)
         
         return output
 
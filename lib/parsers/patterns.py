@@ -0,0 +1,188 @@
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+# Set CONVERTER_REGEX_STATS=1 to count calls, hits and time per pattern from startup
+_instrumented = os.environ.get("CONVERTER_REGEX_STATS", "") not in ("", "0")
+_lock = threading.Lock()
+_registries: List["PatternRegistry"] = []
+# Counters sent back by worker processes, by (bank, pattern)
+_received: Dict[Tuple[str, str], List] = {}
+
+
+class PatternRegistry:
+    """
+    Named regular expressions of one parser, compiled once at import.
+
+    Every match goes through the registry so that, with instrumentation
+    enabled, calls, hits and cumulative time are counted per pattern.
+    """
+    def __init__(self, bank: str, patterns: Dict[str, Union[str, Tuple[str, int]]]):
+        self.bank = bank
+        self._patterns = {}
+        self._counters = {}
+        for name, pattern in patterns.items():
+            self.define(name, *(pattern if isinstance(pattern, tuple) else (pattern,)))
+        _registries.append(self)
+
+    def define(self, name: str, pattern: str, flags: int = 0) -> None:
+        self._patterns[name] = re.compile(pattern, flags)
+        self._counters[name] = [0, 0, 0.0]
+
+    def get(self, name: str) -> re.Pattern:
+        return self._patterns[name]
+
+    def matcher(self, name: str, method: str = "match"):
+        """
+        The given method of a pattern bound once, for per-line loops; it is
+        still counted when instrumentation is enabled
+        """
+        bound = getattr(self._patterns[name], method)
+
+        def call(*args):
+            if _instrumented:
+                return self._timed(name, method, *args)
+            return bound(*args)
+        return call
+
+    def _timed(self, name: str, method: str, *args):
+        start = time.perf_counter()
+        result = getattr(self._patterns[name], method)(*args)
+        if method == "finditer":
+            result = list(result)
+        elapsed = time.perf_counter() - start
+
+        hit = result != args[-1] if method == "sub" else bool(result)
+        with _lock:
+            counter = self._counters[name]
+            counter[0] += 1
+            counter[1] += hit
+            counter[2] += elapsed
+        return result
+
+    def match(self, name: str, string: str) -> Optional[re.Match]:
+        if _instrumented:
+            return self._timed(name, "match", string)
+        return self._patterns[name].match(string)
+
+    def fullmatch(self, name: str, string: str) -> Optional[re.Match]:
+        if _instrumented:
+            return self._timed(name, "fullmatch", string)
+        return self._patterns[name].fullmatch(string)
+
+    def search(self, name: str, string: str) -> Optional[re.Match]:
+        if _instrumented:
+            return self._timed(name, "search", string)
+        return self._patterns[name].search(string)
+
+    def findall(self, name: str, string: str) -> List:
+        if _instrumented:
+            return self._timed(name, "findall", string)
+        return self._patterns[name].findall(string)
+
+    def finditer(self, name: str, string: str) -> Iterator[re.Match]:
+        if _instrumented:
+            return iter(self._timed(name, "finditer", string))
+        return self._patterns[name].finditer(string)
+
+    def split(self, name: str, string: str) -> List[str]:
+        if _instrumented:
+            return self._timed(name, "split", string)
+        return self._patterns[name].split(string)
+
+    def sub(self, name: str, repl: str, string: str) -> str:
+        if _instrumented:
+            return self._timed(name, "sub", repl, string)
+        return self._patterns[name].sub(repl, string)
+
+
+def enable_stats(enabled: bool = True) -> None:
+    """
+    Turn per-pattern instrumentation on or off at runtime
+    """
+    global _instrumented
+    _instrumented = enabled
+
+
+def stats_enabled() -> bool:
+    return _instrumented
+
+
+def reset_stats() -> None:
+    with _lock:
+        for registry in _registries:
+            for counter in registry._counters.values():
+                counter[:] = [0, 0, 0.0]
+        _received.clear()
+
+
+def _counts() -> Dict[Tuple[str, str], List]:
+    """
+    Copy of the counters of this process, by (bank, pattern)
+    """
+    counts = {}
+    with _lock:
+        for registry in _registries:
+            for name, counter in registry._counters.items():
+                total = counts.setdefault((registry.bank, name), [0, 0, 0.0])
+                for index, value in enumerate(counter):
+                    total[index] += value
+    return counts
+
+
+def stats_mark() -> Dict[Tuple[str, str], List]:
+    """
+    Counters now, to get what a piece of work added with stats_since
+    """
+    return _counts() if _instrumented else {}
+
+
+def stats_since(mark: Dict[Tuple[str, str], List]) -> List[Tuple]:
+    """
+    (bank, pattern, calls, hits, seconds) counted since the mark, for a
+    worker process to send back with its result
+    """
+    if not _instrumented:
+        return []
+    deltas = []
+    for key, counter in _counts().items():
+        before = mark.get(key, [0, 0, 0.0])
+        if counter[0] > before[0]:
+            deltas.append(key + tuple(value - previous for value, previous in zip(counter, before)))
+    return deltas
+
+
+def merge_stats(deltas: List[Tuple]) -> None:
+    """
+    Add counters sent back by a worker process to this one's
+    """
+    with _lock:
+        for bank, name, *values in deltas:
+            counter = _received.setdefault((bank, name), [0, 0, 0.0])
+            for index, value in enumerate(values):
+                counter[index] += value
+
+
+def pattern_stats() -> List[Dict]:
+    """
+    Calls, hits and cumulative seconds per pattern per bank, counted here
+    and in the worker processes, slowest first
+    """
+    counts = _counts()
+    with _lock:
+        for key, received in _received.items():
+            total = counts.setdefault(key, [0, 0, 0.0])
+            for index, value in enumerate(received):
+                total[index] += value
+
+    rows = [{
+        "bank": bank,
+        "pattern": name,
+        "calls": counter[0],
+        "hits": counter[1],
+        "seconds": counter[2]
+    } for (bank, name), counter in counts.items() if counter[0]]
+
+    return sorted(rows, key=lambda row: row["seconds"], reverse=True)
@@ -1,5 +1,9 @@
 from typing import List, Dict
-import re
+from lib.parsers.patterns import PatternRegistry
+
+patterns = PatternRegistry("Roela", {
+    "date": r'\d{2}/\d{2}/\d{4}',
+})
 
 def convert_to_canonical_format(data: Dict) -> Dict:
     canonical_rows = []
@@ -46,15 +50,12 @@ class RoelaParser:
         # Initialize list to hold parsed transactions
         transactions = []
 
-        # Regular expression to match dates in dd/mm/yyyy format
-        date_pattern = re.compile(r'\d{2}/\d{2}/\d{4}')
-
         # Helper functions
         def is_importe(line: str) -> bool:
             return line.strip().startswith('$') or line.strip().startswith('-$')
 
         def is_date(line: str) -> bool:
-            return bool(date_pattern.fullmatch(line.strip()))
+            return bool(patterns.fullmatch("date", line.strip()))
 
         # Remove header lines: skip until first importe line
         current_index = 0
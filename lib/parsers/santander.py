@@ -1,5 +1,23 @@
-import re
 from typing import Dict, List
+from lib import debug
+from lib.parsers.markers import MarkerMatcher
+from lib.parsers.patterns import PatternRegistry
+
+patterns = PatternRegistry("Santander", {
+    "pesos_amount": r'pesos\s+[\d.,]+',
+    "date_line": r'^(\d{2}/\d{2}/\d{2})$',
+    "date_comprobante": r'^(\d{2}/\d{2}/\d{2})\s+(\d+)$',
+    "comprobante": r'^(\d{1,15})$',
+    "date": r'^(\d{2}/\d{2}/\d{2})',
+    "amount_new": r'^\s*-?\$\s*[\d.,]+\s*$',
+    "last_header": r'saldo en cuenta',
+    "cc_or_ca": r'cuenta corriente n|caja de ahorro n',
+})
+
+# Markers delimiting the transaction section of the new format
+SECTION_START_MARKERS = ['movimientos en pesos', 'saldo inicial', 'fecha', 'comprobante']
+SECTION_END_MARKERS = ['saldo total', 'movimientos en dólares', 'legales', 'otros fondos']
+section_markers = MarkerMatcher(SECTION_START_MARKERS + SECTION_END_MARKERS)
 
 def convert_to_canonical_format(data: Dict) -> Dict:
     canonical_rows = []
@@ -19,21 +37,24 @@ def convert_to_canonical_format(data: Dict) -> Dict:
     return canonical_rows
 
 class SantanderParser:
-    def detect_format(self, data: List[str]) -> str:
-        """Detect if it's old format (pesos) or new format ($) by checking first 100 lines"""
+    @staticmethod
+    def is_old_format(data: List[str]) -> bool:
+        """Old format (pesos) shows "pesos <amount>" within the first 100 lines"""
         # Join first few pages to get enough content for detection
         first_pages = data[:3] if len(data) > 3 else data
         text = '\n'.join(first_pages)
         lines = text.split('\n')[:100]  # Check first 100 lines
 
         # Look for "pesos" followed by a number pattern
-        pesos_pattern = re.compile(r'pesos\s+[\d.,]+')
-
         for line in lines:
-            if pesos_pattern.search(line.lower()):
-                return "old"
+            if patterns.search("pesos_amount", line.lower()):
+                return True
 
-        return "new"
+        return False
+
+    def detect_format(self, data: List[str]) -> str:
+        """Detect if it's old format (pesos) or new format ($) by checking first 100 lines"""
+        return "old" if self.is_old_format(data) else "new"
 
     def parse(self, data: List[str]) -> List[List[Dict[str, str]]]:
         format_type = self.detect_format(data)
@@ -61,7 +82,7 @@ class SantanderParser:
         # Find the start index: first date line followed by "Saldo Inicial"
         start_index = -1
         for idx in range(n-1):
-            if re.match(r'^\d{2}/\d{2}/\d{2}$', lines[idx].strip()) and 'Saldo Inicial' in lines[idx+1]:
+            if patterns.match("date_line", lines[idx].strip()) and 'Saldo Inicial' in lines[idx+1]:
                 start_index = idx
                 break
         if start_index == -1:
@@ -76,7 +97,7 @@ class SantanderParser:
                 break
 
             # Check for date and comprobante on the same line
-            date_comprobante_match = re.match(r'^(\d{2}/\d{2}/\d{2})\s+(\d+)$', line)
+            date_comprobante_match = patterns.match("date_comprobante", line)
             if date_comprobante_match:
                 current_date = date_comprobante_match.group(1)
                 current_comprobante = date_comprobante_match.group(2)
@@ -84,7 +105,7 @@ class SantanderParser:
                 continue
 
             # Check for standalone date line
-            date_match = re.match(r'^(\d{2}/\d{2}/\d{2})$', line)
+            date_match = patterns.match("date_line", line)
             if date_match:
                 current_date = date_match.group(1)
                 current_comprobante = ''
@@ -113,7 +134,7 @@ class SantanderParser:
                     continue
 
             # Check for comprobante line
-            comprobante_match = re.match(r'^(\d{1,15})$', line)
+            comprobante_match = patterns.match("comprobante", line)
             if comprobante_match and not current_comprobante:
                 current_comprobante = comprobante_match.group(1)
                 i += 1
@@ -121,7 +142,7 @@ class SantanderParser:
 
             # Collect Movimiento lines
             movimiento_lines = []
-            while i < n and not self.is_amount_line_old(lines[i]) and not re.match(r'^\d{2}/\d{2}/\d{2}$', lines[i].strip()) and not re.match(r'^\d{1,15}$', lines[i].strip()):
+            while i < n and not self.is_amount_line_old(lines[i]) and not patterns.match("date_line", lines[i].strip()) and not patterns.match("comprobante", lines[i].strip()):
                 movimiento_lines.append(lines[i].strip())
                 i += 1
             movimiento = '\n'.join(movimiento_lines).strip()
@@ -171,7 +192,6 @@ class SantanderParser:
         transactions = []
         i = 0
         n = len(lines)
-        date_regex = re.compile(r'^(\d{2}/\d{2}/\d{2})')
 
         # Find and process Saldo Inicial
         start_index = -1
@@ -213,7 +233,7 @@ class SantanderParser:
                 continue
 
             # A transaction starts with a date, either on its own line or with other info
-            date_match = date_regex.match(line)
+            date_match = patterns.match("date", line)
             if not date_match:
                 i += 1
                 continue
@@ -244,7 +264,7 @@ class SantanderParser:
                     continue
 
                 # Stop condition: we've reached amounts or a new transaction date
-                if self.is_amount_line_new(line) or date_regex.match(line):
+                if self.is_amount_line_new(line) or patterns.match("date", line):
                     break
 
                 # Comprobante check: is it a numeric-only line and we don't have a comprobante yet?
@@ -308,8 +328,7 @@ class SantanderParser:
 
         # Amount lines should start with $ or -$ and be primarily numeric
         # Examples: "$ 640.322,55", "-$ 100,00"
-        amount_pattern = re.compile(r'^\s*-?\$\s*[\d.,]+\s*$')
-        result = bool(amount_pattern.match(line_stripped))
+        result = bool(patterns.match("amount_new", line_stripped))
 
         return result
 
@@ -341,7 +360,7 @@ class SantanderParser:
             result = float(amount_str)
             return result
         except ValueError:
-            st.write(f"Failed to parse '{original}' (cleaned: '{amount_str}')")
+            debug.warning("Failed to parse '%s' (cleaned: '%s')", original, amount_str)
             return None
 
     def format_amount(self, amount):
@@ -351,8 +370,6 @@ class SantanderParser:
 
     def clean_pages(self, pages):
         """Clean pages for old format"""
-        last_header_regex = r'saldo en cuenta'
-        cc_or_ca_regex = r'cuenta corriente n|caja de ahorro n'
         lines = []
 
         for page in pages:
@@ -360,11 +377,11 @@ class SantanderParser:
             skip_until_headers = False
 
             for line in page.split('\n'):
-                if first_line and re.search(cc_or_ca_regex, line.lower()):
+                if first_line and patterns.search("cc_or_ca", line.lower()):
                     skip_until_headers = True
                     continue
 
-                if skip_until_headers and re.search(last_header_regex, line.lower()):
+                if skip_until_headers and patterns.search("last_header", line.lower()):
                     skip_until_headers = False
                     continue
 
@@ -384,18 +401,20 @@ class SantanderParser:
             # Check if this page contains transaction data
             if 'Saldo Inicial' in page or 'Movimiento' in page or any(date_pattern in page for date_pattern in ['01/08/24', '02/08/24', '03/08/24']):
                 page_lines = page.split('\n')
+                marker_hits = section_markers.line_hits(page)
 
                 # Find where the actual transaction data starts
                 start_capturing = False
                 for line_idx, line in enumerate(page_lines):
                     line_stripped = line.strip()
+                    line_markers = marker_hits.get(line_idx, ())
 
                     # Look for various markers that indicate transaction section start
-                    if any(marker in line.lower() for marker in ['movimientos en pesos', 'saldo inicial', 'fecha', 'comprobante']):
+                    if any(marker in line_markers for marker in SECTION_START_MARKERS):
                         start_capturing = True
 
                     # Stop at certain end markers
-                    if start_capturing and any(marker in line.lower() for marker in ['saldo total', 'movimientos en dólares', 'legales', 'otros fondos']):
+                    if start_capturing and any(marker in line_markers for marker in SECTION_END_MARKERS):
                         break
 
                     if start_capturing and line_stripped:  # Only add non-empty lines
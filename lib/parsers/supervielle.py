@@ -1,5 +1,19 @@
-import re
 from typing import List, Dict
+from lib.parsers.markers import MarkerMatcher
+from lib.parsers.patterns import PatternRegistry
+
+patterns = PatternRegistry("Supervielle", {
+    "saldo_anterior": r"Saldo del período anterior\s+([\d.,]+-?)",
+    "transaction": r"(\d{2}/\d{2}/\d{2})\s+(.*)",
+    # Amount, then saldo which may end with '-'
+    "amounts": r'([\d.,]+)\s+([\d.,]+-?)$',
+    # Referencia with possible asterisks after digits
+    "referencia": r'(.*?)(R \d+\**|\d+\**)$',
+    "date": r"\d{2}/\d{2}/\d{2}",
+})
+
+# Lines that end the multi-line concepto of a transaction
+concepto_stop_markers = MarkerMatcher(["Imp Ley 25413", "SUBTOTAL", "SALDO PERIODO ACTUAL", "Saldo del período anterior"], ignore_case=False)
 
 def convert_to_canonical_format(data: Dict) -> Dict:
     canonical_rows = []
@@ -25,6 +39,9 @@ def convert_to_canonical_format(data: Dict) -> Dict:
     return canonical_rows
 
 class SupervielleParser:
+    # Every movement row carries the balance printed in the statement
+    prints_balances = True
+
     def parse_currency(self, s: str) -> float:
         """
         Converts a Spanish-formatted currency string to a float.
@@ -51,10 +68,9 @@ class SupervielleParser:
         previous_saldo_float = None
 
         # Combine all pages into a single list of lines
-        lines = []
-        for page in data:
-            page_lines = page.split('\n')
-            lines.extend(page_lines)
+        text = "\n".join(data)
+        lines = text.split('\n')
+        concepto_stop_lines = concepto_stop_markers.line_hits(text)
 
         i = 0
         while i < len(lines):
@@ -72,7 +88,7 @@ class SupervielleParser:
                 in_entries = False  # Reset entries flag for new account
                 in_subtotal = False  # Reset subtotal flag for new account
                 # Extract the saldo
-                match = re.search(r"Saldo del período anterior\s+([\d.,]+-?)", line)
+                match = patterns.search("saldo_anterior", line)
                 if match:
                     saldo = match.group(1)
                     current_account.append({
@@ -113,23 +129,19 @@ class SupervielleParser:
                     continue
 
                 # Process transaction lines
-                match = re.match(r"(\d{2}/\d{2}/\d{2})\s+(.*)", line)
+                match = patterns.match("transaction", line)
                 if match:
                     fecha = match.group(1)
                     rest_of_line = match.group(2)
                     # Extract amounts at the end of the line, possibly with negative saldo
-                    # Pattern: amount, then saldo which may end with '-'
-                    num_pattern = r'([\d.,]+)\s+([\d.,]+-?)$'
-                    num_match = re.search(num_pattern, rest_of_line)
+                    num_match = patterns.search("amounts", rest_of_line)
                     if num_match:
                         amount_str = num_match.group(1)
                         saldo_str = num_match.group(2)
                         # Remove the amounts from rest_of_line
                         rest_of_line_no_amounts = rest_of_line[:num_match.start()].strip()
                         # Extract referencia
-                        # Updated pattern to include possible asterisks after digits
-                        ref_pattern = r'(.*?)(R \d+\**|\d+\**)$'
-                        ref_match = re.match(ref_pattern, rest_of_line_no_amounts)
+                        ref_match = patterns.match("referencia", rest_of_line_no_amounts)
                         if ref_match:
                             concepto = ref_match.group(1).strip()
                             referencia = ref_match.group(2).strip()
@@ -141,8 +153,7 @@ class SupervielleParser:
                         i += 1
                         while i < len(lines):
                             next_line = lines[i].strip()
-                            ignore_lines = ["Imp Ley 25413", "SUBTOTAL", "SALDO PERIODO ACTUAL", "Saldo del período anterior"]
-                            if not next_line or re.match(r"\d{2}/\d{2}/\d{2}", next_line) or any(ignore_line in next_line for ignore_line in ignore_lines):
+                            if not next_line or patterns.match("date", next_line) or i in concepto_stop_lines:
                                 break
                             else:
                                 concepto_lines.append(next_line)
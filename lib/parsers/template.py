@@ -0,0 +1,161 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from lib.parsers.patterns import PatternRegistry
+
+CANONICAL_FIELDS = ("FECHA", "DETALLE", "REFERENCIA", "DEBITOS", "CREDITOS", "SALDO")
+
+# Engine states
+SEEK, SECTION, DONE = "seek", "section", "done"
+
+
+class AmountNotation:
+    """
+    How amounts are written: thousands and decimal separators
+    """
+    def __init__(self, thousands: str = ".", decimal: str = ","):
+        self.thousands = thousands
+        self.decimal = decimal
+
+    def parse(self, value: str) -> float:
+        return float(value.replace(self.thousands, '').replace(self.decimal, '.'))
+
+
+class LineKind:
+    """
+    A kind of line inside the movements section. The pattern is matched at
+    the start of the stripped line; its named groups fill the fields:
+    fecha, detalle, referencia, importe and saldo.
+    """
+    def __init__(self, name: str, pattern: str):
+        self.name = name
+        self.pattern = pattern
+
+
+class BankTemplate:
+    """
+    Declarative description of a single-section statement layout, where the
+    printed balance tells whether each amount is a debit or a credit.
+
+    start: pattern opening the movements section; its "saldo" group is the opening balance
+    stop: pattern closing the section
+    lines: line kinds producing rows, tried in order
+    opening_detail: DETALLE of the opening balance row
+    detail_split: pattern splitting the detail; the first chunk is DETALLE and the
+        last one, if there are several, REFERENCIA
+    """
+    def __init__(self, bank: str, start: str, stop: str, lines: List[LineKind], opening_detail: str = "",
+                 amounts: Optional[AmountNotation] = None, detail_split: Optional[str] = None):
+        self.bank = bank
+        self.start = start
+        self.stop = stop
+        self.lines = lines
+        self.opening_detail = opening_detail
+        self.amounts = amounts or AmountNotation()
+        self.detail_split = detail_split
+
+
+class CompiledTemplate:
+    """
+    A template compiled into a transition table: for every state, the ordered
+    (matcher, action) pairs tried against each line, with the pattern
+    methods bound once
+    """
+    def __init__(self, template: BankTemplate):
+        self.template = template
+        definitions = {"start": template.start, "stop": template.stop}
+        for kind in template.lines:
+            definitions[f"line_{kind.name}"] = kind.pattern
+        if template.detail_split:
+            definitions["detail_split"] = template.detail_split
+        self.patterns = PatternRegistry(f"{template.bank} (template)", definitions)
+
+        self.transitions: Dict[str, List[Tuple[Callable, str]]] = {
+            SEEK: [(self.patterns.matcher("start", "search"), "open")],
+            SECTION: [(self.patterns.matcher("stop", "search"), "close")]
+                     + [(self.patterns.matcher(f"line_{kind.name}"), "row") for kind in template.lines],
+            DONE: []
+        }
+        self.split_detail = self.patterns.matcher("detail_split", "split") if template.detail_split else None
+
+
+def compile_template(template: BankTemplate) -> CompiledTemplate:
+    return CompiledTemplate(template)
+
+
+class TemplateEngine:
+    """
+    Runs compiled templates over extracted text. BPN is the only bank on a
+    template so far; other layouts need more than this engine offers
+    (multi-line records, positional columns, several accounts).
+    """
+    def run(self, compiled: CompiledTemplate, data: List[str]) -> List[List[Dict]]:
+        template = compiled.template
+        transitions = compiled.transitions
+        amounts = template.amounts
+
+        rows = []
+        previous_saldo = None
+        state = SEEK
+
+        for line in "\n".join(data).split("\n"):
+            if state == DONE:
+                break
+            line = line.strip()
+
+            for matcher, action in transitions[state]:
+                match = matcher(line)
+                if not match:
+                    continue
+
+                if action == "open":
+                    previous_saldo = amounts.parse(match.group("saldo"))
+                    rows = [self._row(compiled, "", template.opening_detail, "", "", "", previous_saldo)]
+                    state = SECTION
+                elif action == "close":
+                    state = DONE
+                else:
+                    previous_saldo = self._transaction(compiled, match, rows, previous_saldo)
+                break
+
+        # Always exactly one account
+        return [rows]
+
+    def _transaction(self, compiled: CompiledTemplate, match, rows: List[Dict], previous_saldo: Optional[float]) -> Optional[float]:
+        amounts = compiled.template.amounts
+        groups = match.groupdict()
+
+        saldo_str = groups.get("saldo") or ""
+        try:
+            saldo = amounts.parse(saldo_str) if saldo_str else None
+        except ValueError:
+            saldo = None
+
+        debito, credito = "", ""
+        if saldo is not None and previous_saldo is not None:
+            importe = groups.get("importe") or ""
+            if saldo > previous_saldo:
+                credito = importe
+            else:
+                debito = importe
+
+        rows.append(self._row(
+            compiled,
+            groups.get("fecha") or "",
+            (groups.get("detalle") or "").strip(),
+            (groups.get("referencia") or "").strip(),
+            amounts.parse(debito) if debito else "",
+            amounts.parse(credito) if credito else "",
+            amounts.parse(saldo_str) if saldo_str else ""
+        ))
+
+        return saldo if saldo is not None else previous_saldo
+
+    def _row(self, compiled: CompiledTemplate, fecha: str, detalle: str, referencia: str, debitos, creditos, saldo) -> Dict:
+        if compiled.split_detail:
+            parts = [part for part in compiled.split_detail(detalle) if part] if detalle else []
+            detalle = parts[0] if parts else ""
+            referencia = parts[-1] if len(parts) > 1 else (referencia if parts else "")
+
+        return dict(zip(CANONICAL_FIELDS, (fecha, detalle, referencia, debitos, creditos, saldo)))
+
+
+engine = TemplateEngine()
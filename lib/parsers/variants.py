@@ -0,0 +1,50 @@
+from typing import Callable, Dict, List, Union
+from lib.parsers.context import parser_instance, resolve
+
+
+class FormatVariant:
+    """
+    One layout of a bank statement: a cheap detection predicate and the
+    parser method that handles it. A variant without predicate always matches.
+    The parser class and predicate may be given as "module:attribute" paths,
+    imported when the variant is first used.
+    """
+    def __init__(self, name: str, parser_class: Union[str, type], detect: Union[str, Callable[[List[str]], bool], None] = None,
+                 method: str = "parse"):
+        self.name = name
+        self.parser_class = parser_class
+        self.detect = detect
+        self.method = method
+
+    def matches(self, data: List[str]) -> bool:
+        return self.detect is None or bool(resolve(self.detect)(data))
+
+    def parse(self, data: List[str]):
+        return getattr(parser_instance(self.parser_class), self.method)(data)
+
+
+class VariantRegistry:
+    def __init__(self):
+        self._variants: Dict[str, List[FormatVariant]] = {}
+
+    def register(self, bank_name: str, variants: List[FormatVariant]) -> None:
+        """
+        Register the variants of a bank, checked in order
+        """
+        self._variants[bank_name] = list(variants)
+
+    def has_variants(self, bank_name: str) -> bool:
+        return bank_name in self._variants
+
+    def select(self, bank_name: str, data: List[str]) -> FormatVariant:
+        """
+        Pick exactly one variant for the document. The predicates are cheap
+        text checks, so the decision isn't cached.
+        """
+        variant = next((variant for variant in self._variants[bank_name] if variant.matches(data)), None)
+        if variant is None:
+            raise ValueError(f"No format variant of {bank_name} matches the document")
+        return variant
+
+
+variant_registry = VariantRegistry()
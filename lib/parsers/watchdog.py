@@ -0,0 +1,251 @@
+import multiprocessing
+import os
+import time
+from typing import Dict, List, Optional
+from lib import debug
+from lib.parsers import patterns
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; the memory limit is skipped there
+    resource = None
+
+# Defaults, overridable through the environment
+TIME_BUDGET = float(os.environ.get("CONVERTER_PARSE_SECONDS", "30"))
+MEMORY_LIMIT_MB = int(os.environ.get("CONVERTER_PARSE_MEMORY_MB", "1024"))
+MAX_LINES_PER_ACCOUNT = int(os.environ.get("CONVERTER_MAX_LINES_PER_ACCOUNT", "20000"))
+
+# Time allowed for each probe while locating the offending page
+PROBE_BUDGET = 5.0
+# Outcomes worth locating: a page makes the parser run away. Ordinary
+# parse errors are reported without bisecting.
+LOCATED_STATUSES = ("timeout", "memory", "too_long")
+
+
+class ParseGuardError(Exception):
+    """
+    A guarded parse was stopped. page is the 1-based page where the problem
+    starts, when it could be located.
+    """
+    reason = "failed"
+
+    def __init__(self, bank_name: str, detail: str, page: Optional[int] = None):
+        self.bank_name = bank_name
+        self.detail = detail
+        self.page = page
+        location = f" (page {page})" if page else ""
+        super().__init__(f"{bank_name} parser {self.reason}{location}: {detail}")
+
+
+class ParseTimeout(ParseGuardError):
+    reason = "ran out of time"
+
+
+class ParseMemoryError(ParseGuardError):
+    reason = "ran out of memory"
+
+
+class ParseTooLong(ParseGuardError):
+    reason = "produced too many lines"
+
+
+class ParseFailed(ParseGuardError):
+    reason = "failed"
+
+
+def process_context():
+    """
+    Start method for worker processes: forkserver where available, so workers
+    don't inherit the state of a threaded server
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _address_space() -> int:
+    """
+    Current virtual memory size of this process in bytes, 0 when unknown
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def _limit_memory(memory_limit_mb: int) -> Optional[int]:
+    """
+    Allow the process memory_limit_mb of address space on top of what it
+    already maps, returning the previous soft limit (None if none was set)
+    """
+    if resource is None or not memory_limit_mb:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = memory_limit_mb * 1024 * 1024 + _address_space()
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    return soft
+
+
+def _restore_memory(previous: Optional[int]) -> None:
+    if previous is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (previous, resource.getrlimit(resource.RLIMIT_AS)[1]))
+
+
+def _parse(bank_name: str, data: List[str], memory_limit_mb: int, max_lines: int, level: str, regex_stats: bool):
+    """
+    Runs in a worker process (fresh or from the pool): parse and return
+    (status, payload, diagnostics recorded during the parse, regex counters
+    it added when regex_stats is on)
+    """
+    from lib.parsers.base import BankParser
+
+    patterns.enable_stats(regex_stats)
+    mark = patterns.stats_mark()
+    # Limit only what the parse itself allocates, after the imports are mapped
+    previous = _limit_memory(memory_limit_mb)
+    try:
+        with debug.capture(level) as diagnostics:
+            try:
+                result = BankParser.parse(bank_name, data)
+                oversized = next(((index, len(account)) for index, account in enumerate(result or [], 1)
+                                  if len(account) > max_lines), None)
+                if oversized:
+                    status, payload = "too_long", f"account {oversized[0]} has {oversized[1]} lines (limit {max_lines})"
+                else:
+                    status, payload = "ok", result
+            except MemoryError:
+                status, payload = "memory", f"limit of {memory_limit_mb} MB reached"
+            except Exception as e:
+                status, payload = "error", f"{type(e).__name__}: {e}"
+    finally:
+        _restore_memory(previous)
+    return status, payload, diagnostics.records(), patterns.stats_since(mark)
+
+
+def _worker(conn, bank_name: str, data: List[str], memory_limit_mb: int, max_lines: int, level: str, regex_stats: bool) -> None:
+    """
+    Runs in a fresh process: parse and send back the outcome
+    """
+    try:
+        conn.send(_parse(bank_name, data, memory_limit_mb, max_lines, level, regex_stats))
+    finally:
+        conn.close()
+
+
+def _received(outcome):
+    """
+    (status, payload, diagnostics) of a worker's outcome, its regex counters
+    added to this process's
+    """
+    status, payload, diagnostics, regex_stats = outcome
+    patterns.merge_stats(regex_stats)
+    return status, payload, diagnostics
+
+
+def _run(bank_name: str, data: List[str], time_budget: float, memory_limit_mb: int, max_lines: int):
+    """
+    Parse in a warm worker of the pool, returning (status, payload,
+    diagnostics); in a fresh process when the pool can't be used
+    """
+    from lib.pool import PoolTimeout, PoolUnavailable, WorkerDied, pool, usable
+
+    if not usable():
+        return _run_isolated(bank_name, data, time_budget, memory_limit_mb, max_lines)
+    try:
+        return _received(pool.run(_parse, bank_name, data, memory_limit_mb, max_lines, debug.channel().level,
+                                  patterns.stats_enabled(), timeout=time_budget))
+    except PoolTimeout:
+        return "timeout", f"no result after {time_budget:g}s", []
+    except WorkerDied as e:
+        if e.exitcode is not None and e.exitcode < 0:
+            return "memory", f"worker killed by signal {-e.exitcode}", []
+        return "error", str(e), []
+    except PoolUnavailable as e:
+        debug.warning("Worker pool unavailable, parsing in a new process: %s", e)
+        return _run_isolated(bank_name, data, time_budget, memory_limit_mb, max_lines)
+
+
+def _run_isolated(bank_name: str, data: List[str], time_budget: float, memory_limit_mb: int, max_lines: int):
+    """
+    Parse in a fresh worker process, returning (status, payload, diagnostics)
+    """
+    context = process_context()
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_worker, args=(child_conn, bank_name, data, memory_limit_mb, max_lines,
+                                                    debug.channel().level, patterns.stats_enabled()), daemon=True)
+    process.start()
+    child_conn.close()
+
+    try:
+        if not parent_conn.poll(time_budget):
+            return "timeout", f"no result after {time_budget:g}s", []
+        try:
+            return _received(parent_conn.recv())
+        except EOFError:
+            process.join(1)
+            if process.exitcode is not None and process.exitcode < 0:
+                return "memory", f"worker killed by signal {-process.exitcode}", []
+            return "error", f"worker exited with code {process.exitcode}", []
+    finally:
+        parent_conn.close()
+        if process.is_alive():
+            process.terminate()
+            process.join(1)
+            if process.is_alive():
+                process.kill()
+        process.join()
+
+
+def _locate(bank_name: str, data: List[str], status: str, budget: float, memory_limit_mb: int, max_lines: int) -> Optional[int]:
+    """
+    Find the first page whose inclusion reproduces the failure, bisecting on
+    page prefixes with short probes within the given total budget
+    """
+    low, high = 1, len(data)
+    deadline = time.monotonic() + budget
+    while low < high:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        middle = (low + high) // 2
+        probe_status, _, _ = _run(bank_name, data[:middle], min(PROBE_BUDGET, remaining), memory_limit_mb, max_lines)
+        if probe_status == status:
+            high = middle
+        else:
+            low = middle + 1
+    return low if data else None
+
+
+def run_guarded(bank_name: str, data: List[str], time_budget: float = TIME_BUDGET,
+                memory_limit_mb: int = MEMORY_LIMIT_MB, max_lines: int = MAX_LINES_PER_ACCOUNT,
+                locate: bool = False) -> List[List[Dict]]:
+    """
+    BankParser.parse in an isolated worker process (a warm one of lib.pool)
+    with a wall-clock budget, an address-space allowance (on top of what the
+    loaded modules take) and a maximum number of lines per account.
+
+    Diagnostics recorded by the parser are forwarded to the caller's debug
+    channel. Raises a ParseGuardError subclass when a guard trips or the parser fails.
+    With locate, the page where a guard trips is searched for (costing up to
+    another time_budget) and recorded on the error; callers enable it only
+    for an attempt whose error is shown to the user.
+    """
+    status, payload, diagnostics = _run(bank_name, data, time_budget, memory_limit_mb, max_lines)
+    debug.channel().extend(diagnostics)
+    if status == "ok":
+        return payload
+
+    page = None
+    if len(data) == 1:
+        page = 1
+    elif locate and status in LOCATED_STATUSES:
+        page = _locate(bank_name, data, status, time_budget, memory_limit_mb, max_lines)
+
+    error = {
+        "timeout": ParseTimeout,
+        "memory": ParseMemoryError,
+        "too_long": ParseTooLong,
+    }.get(status, ParseFailed)
+    raise error(bank_name, payload, page)
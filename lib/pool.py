@@ -0,0 +1,372 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from lib import debug
+from lib.executor import CONCURRENCY
+from lib.parsers.watchdog import process_context
+
+# Warm worker processes kept for extractions and guarded parses. A
+# conversion's preview parse runs while its extraction holds a worker, and
+# uploads are counted and detected in them too, hence twice the executor
+POOL_WORKERS = int(os.environ.get("CONVERTER_POOL_WORKERS", 2 * CONCURRENCY))
+# A worker is replaced after this many tasks, or once its resident memory
+# passes the threshold, so leaks of the PDF library don't accumulate
+MAX_TASKS = int(os.environ.get("CONVERTER_POOL_MAX_TASKS", 200))
+MAX_RSS_MB = int(os.environ.get("CONVERTER_POOL_MAX_RSS_MB", 1024))
+
+# Seconds to wait for an idle worker before giving up on the pool
+CHECKOUT_TIMEOUT = 30.0
+# Wall-clock limit of pymupdf work done in a worker (extraction, page counts,
+# detection), after which the worker is killed
+EXTRACT_SECONDS = float(os.environ.get("CONVERTER_EXTRACT_SECONDS", 120))
+
+
+class PoolError(Exception):
+    pass
+
+
+class PoolUnavailable(PoolError):
+    """
+    No worker became available in time (e.g. workers fail to start)
+    """
+
+
+class PoolTimeout(PoolError):
+    """
+    The task ran past its timeout; its worker was killed
+    """
+
+
+class WorkerDied(PoolError):
+    def __init__(self, exitcode: Optional[int]):
+        self.exitcode = exitcode
+        super().__init__(f"worker exited with code {exitcode}")
+
+
+def _rss() -> int:
+    """
+    Resident memory of this process in bytes, 0 when unknown
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def preload() -> None:
+    """
+    Load what conversions need once per worker process: pymupdf and every
+    parser, with their compiled patterns
+    """
+    from lib.parsers.base import BankParser
+
+    try:
+        import pymupdf  # noqa: F401
+    except ImportError:
+        pass
+    BankParser.warm()
+
+
+# Held while pymupdf runs in a process that can't use the pool: it can't be
+# used from several threads at once
+pymupdf_lock = threading.Lock()
+
+# Sends progress of the running task to its caller, in worker processes
+_reporter: Optional[Callable] = None
+
+
+def report(payload) -> None:
+    """
+    From a task running in a worker: hand payload to the on_progress of
+    pool.run while the task goes on. Does nothing outside the pool.
+    """
+    if _reporter is not None:
+        _reporter(payload)
+
+
+def _serve(conn, initializer: Optional[Callable]) -> None:
+    """
+    Main loop of a worker process: run each (fn, args) received and send
+    back (status, result or exception, resident memory), preceded by any
+    ("progress", payload, 0) the task reports
+    """
+    global _reporter
+    _reporter = lambda payload: conn.send(("progress", payload, 0))
+    if initializer is not None:
+        initializer()
+    try:
+        conn.send(("ready", None, _rss()))
+    except OSError:
+        # The pool went away while this worker was starting
+        return
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+
+        fn, args = message
+        try:
+            reply = ("ok", fn(*args))
+        except Exception as e:
+            reply = ("error", e)
+        try:
+            conn.send(reply + (_rss(),))
+        except Exception as e:
+            # The result or the exception couldn't be pickled
+            conn.send(("error", PoolError(f"{type(e).__name__}: {e}"), _rss()))
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.tasks = 0
+        self.rss = 0
+        self.started = time.monotonic()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.conn.close()
+        self.process.join(1)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1)
+            if self.process.is_alive():
+                self.process.kill()
+        self.process.join()
+
+
+class WorkerPool:
+    """
+    Pre-started worker processes that load pymupdf and the parsers once,
+    so a task only pays for sending its arguments and result. Tasks run one
+    per worker in the caller's thread. A worker is checked to be alive
+    before each task and replaced (in the background, so callers get a warm
+    one) when it dies, times out, or reaches max_tasks or max_rss_mb.
+    """
+    def __init__(self, size: int = POOL_WORKERS, max_tasks: int = MAX_TASKS, max_rss_mb: int = MAX_RSS_MB,
+                 initializer: Optional[Callable] = preload):
+        self.size = max(1, size)
+        self.max_tasks = max_tasks
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024
+        self.initializer = initializer
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._busy: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._started = False
+        self._counts = {"tasks": 0, "failed": 0, "timeouts": 0, "died": 0, "recycled": 0, "started": 0}
+        self._busy_seconds = 0.0
+        self._since = time.monotonic()
+
+    def start(self) -> None:
+        """
+        Start the workers in the background; the first task also does this
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._since = time.monotonic()
+        for _ in range(self.size):
+            self._replace()
+
+    def run(self, fn: Callable, *args, timeout: Optional[float] = None,
+            on_progress: Optional[Callable] = None):
+        """
+        fn(*args) in a worker, which must be a module-level function. What fn
+        passes to report() is handed to on_progress as it comes; when
+        on_progress raises, the task is stopped (its worker killed) and the
+        exception goes on. Raises what fn raised, PoolTimeout after timeout
+        seconds, WorkerDied if the worker exits, and PoolUnavailable if no
+        worker could be had.
+        """
+        self.start()
+        worker = self._checkout()
+        began = time.monotonic()
+        deadline = None if timeout is None else began + timeout
+        try:
+            worker.conn.send((fn, args))
+            while True:
+                if not worker.conn.poll(None if deadline is None else max(deadline - time.monotonic(), 0)):
+                    self._count("timeouts")
+                    raise PoolTimeout(f"no result after {timeout:g}s")
+                try:
+                    status, payload, rss = worker.conn.recv()
+                except (EOFError, OSError):
+                    worker.process.join(1)
+                    self._count("died")
+                    raise WorkerDied(worker.process.exitcode)
+                if status != "progress":
+                    break
+                if on_progress is not None:
+                    on_progress(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            self._count("died")
+            self._retire(worker, kill=True)
+            raise WorkerDied(worker.process.exitcode)
+        except BaseException:
+            # Timed out, dead, stopped by on_progress, or the task couldn't be
+            # sent: the worker may still be on the task, so it is replaced
+            self._retire(worker, kill=True)
+            raise
+        finally:
+            with self._lock:
+                self._busy_seconds += time.monotonic() - began
+
+        worker.tasks += 1
+        worker.rss = rss
+        self._count("tasks")
+        self._checkin(worker)
+        if status != "ok":
+            self._count("failed")
+            raise payload
+        return payload
+
+    def stats(self) -> Dict:
+        with self._lock:
+            elapsed = max(time.monotonic() - self._since, 1e-9)
+            return {
+                "workers": self.size,
+                "alive": len(self._workers),
+                "idle": self._idle.qsize(),
+                "busy": len(self._busy),
+                "utilisation": min(1.0, self._busy_seconds / (elapsed * self.size)),
+                "rss_bytes": [worker.rss for worker in self._workers],
+                "tasks_by_worker": [worker.tasks for worker in self._workers],
+                **self._counts
+            }
+
+    def shutdown(self) -> None:
+        """
+        Stop the idle workers; busy ones stop as their task ends
+        """
+        with self._lock:
+            self._started = False
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._workers.remove(worker)
+            worker.stop()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def _checkout(self) -> _Worker:
+        deadline = time.monotonic() + CHECKOUT_TIMEOUT
+        while True:
+            try:
+                worker = self._idle.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                raise PoolUnavailable(f"no worker available after {CHECKOUT_TIMEOUT:g}s")
+            if worker.process.is_alive():
+                with self._lock:
+                    self._busy.append(worker)
+                return worker
+            debug.info("Pool worker %s found dead (exit code %s)", worker.process.pid, worker.process.exitcode)
+            self._count("died")
+            self._retire(worker, kill=True)
+
+    def _checkin(self, worker: _Worker) -> None:
+        with self._lock:
+            started = self._started
+        if not started:
+            self._retire(worker)
+            return
+        if worker.tasks >= self.max_tasks or (self.max_rss_bytes and worker.rss > self.max_rss_bytes):
+            debug.debug("Recycling pool worker %s after %s tasks (%s MB)", worker.process.pid, worker.tasks,
+                        worker.rss // (1024 * 1024))
+            self._count("recycled")
+            self._retire(worker)
+            return
+        with self._lock:
+            self._busy.remove(worker)
+        self._idle.put(worker)
+
+    def _retire(self, worker: _Worker, kill: bool = False) -> None:
+        with self._lock:
+            if worker in self._busy:
+                self._busy.remove(worker)
+            if worker in self._workers:
+                self._workers.remove(worker)
+        threading.Thread(target=worker.kill if kill else worker.stop, daemon=True).start()
+        self._replace()
+
+    def _replace(self) -> None:
+        with self._lock:
+            if not self._started:
+                return
+        threading.Thread(target=self._spawn, name="pool-spawn", daemon=True).start()
+
+    def _spawn(self) -> None:
+        context = process_context()
+        parent_conn, child_conn = context.Pipe()
+        process = context.Process(target=_serve, args=(child_conn, self.initializer), daemon=True)
+        try:
+            process.start()
+            child_conn.close()
+            status, _, rss = parent_conn.recv()
+        except Exception as e:
+            debug.warning("Pool worker couldn't start: %s", e)
+            parent_conn.close()
+            if process.is_alive():
+                process.kill()
+            return
+
+        worker = _Worker(process, parent_conn)
+        worker.rss = rss
+        self._count("started")
+        with self._lock:
+            started = self._started
+            if started:
+                self._workers.append(worker)
+        if started:
+            self._idle.put(worker)
+        else:
+            worker.stop()
+
+
+pool = WorkerPool()
+
+
+def usable() -> bool:
+    """
+    Whether this process may use the shared pool: worker processes run their
+    guarded parses in fresh processes instead of starting pools of their own
+    """
+    return multiprocessing.parent_process() is None
+
+
+def call(fn: Callable, *args, timeout: Optional[float] = EXTRACT_SECONDS):
+    """
+    fn(*args) in a warm worker of the shared pool, for pymupdf work of the
+    app's threads; in this process, one call at a time, when the pool can't
+    be used. WorkerDied and PoolTimeout are raised as from pool.run.
+    """
+    if usable():
+        try:
+            return pool.run(fn, *args, timeout=timeout)
+        except PoolUnavailable as e:
+            debug.warning("Worker pool unavailable, running %s here: %s", fn.__name__, e)
+    with pymupdf_lock:
+        return fn(*args)
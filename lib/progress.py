@@ -0,0 +1,101 @@
+import time
+from typing import Callable, Dict, List, Optional
+
+# Movements shown as a preview before the conversion finishes
+PREVIEW_ROWS = 20
+
+
+class ConversionCancelled(Exception):
+    pass
+
+
+class Progress:
+    """
+    Progress of a conversion as reported by the extraction and parsing steps.
+    Stages are "extract" (per page, per engine tried) and "parse". on_update
+    receives the progress itself after every change, on_preview the first
+    movements parsed from the first page, before the rest is extracted.
+    cancel() stops the conversion at the next page.
+    """
+    def __init__(self, on_update: Optional[Callable[["Progress"], None]] = None,
+                 on_preview: Optional[Callable[[List[Dict]], None]] = None, preview_rows: int = PREVIEW_ROWS):
+        self.on_update = on_update
+        self.on_preview = on_preview
+        self.preview_rows = preview_rows
+        self.stage = None
+        self.engine = None
+        self.done = 0
+        self.total = 0
+        self.started = None
+        self.stage_started = None
+        self.cancelled = False
+        self.previewed = False
+
+    def start(self, stage: str, total: int = 0, engine: Optional[str] = None) -> None:
+        self.check()
+        if self.started is None:
+            self.started = time.monotonic()
+        self.stage, self.engine = stage, engine
+        self.done, self.total = 0, total
+        self.stage_started = time.monotonic()
+        self._notify()
+
+    def page(self, index: int, total: int, output=None) -> None:
+        """
+        Page callback of the extraction engines
+        """
+        self.check()
+        self.done, self.total = index + 1, total
+        self._notify()
+
+    def finish(self) -> None:
+        self.done = self.total = max(self.total, 1)
+        self._notify()
+
+    def wants_preview(self) -> bool:
+        return self.on_preview is not None and not self.previewed
+
+    def preview(self, rows: List[Dict]) -> None:
+        self.previewed = True
+        if self.on_preview and rows:
+            self.on_preview(rows[:self.preview_rows])
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise ConversionCancelled("Conversion cancelled")
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started if self.started is not None else 0.0
+
+    def eta(self) -> Optional[float]:
+        """
+        Seconds left in the current stage at its pace so far, None until a
+        page has been done
+        """
+        if not self.done or not self.total or self.stage_started is None:
+            return None
+        return (time.monotonic() - self.stage_started) / self.done * (self.total - self.done)
+
+    def fraction(self) -> float:
+        return self.done / self.total if self.total else 0.0
+
+    def describe(self) -> str:
+        if self.stage == "extract":
+            text = f"Extracting page {self.done} of {self.total}" if self.total else "Extracting"
+            if self.engine:
+                text += f" ({self.engine})"
+        elif self.stage == "parse":
+            text = "Parsing movements"
+        else:
+            text = "Starting"
+        eta = self.eta()
+        if eta is not None and self.done < self.total:
+            text += f" · about {eta:.0f}s left"
+        return text
+
+    def _notify(self) -> None:
+        if self.on_update:
+            self.on_update(self)
@@ -0,0 +1,337 @@
+import atexit
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from lib import debug
+
+# Compressed results kept in memory before the least recently used spill to disk
+MEMORY_MB = int(os.environ.get("CONVERTER_RESULTS_MB", 128))
+# Spilled results kept on disk, 0 disables spilling
+DISK_MB = int(os.environ.get("CONVERTER_RESULTS_DISK_MB", 1024))
+# Where each process creates its private spill directory (converter-results-<pid>-*)
+SPILL_DIR = os.environ.get("CONVERTER_RESULTS_DIR", tempfile.gettempdir())
+SPILL_PREFIX = "converter-results-"
+# Seconds a result is kept after its last use
+TTL = int(os.environ.get("CONVERTER_RESULTS_TTL", 3600))
+# Seconds between sweeps dropping expired results while nothing else happens
+SWEEP_SECONDS = 60
+# Handles remembered (for regenerating) after their data is gone
+MAX_HANDLES = 10000
+
+
+def pack(accounts: List) -> bytes:
+    return zlib.compress(json.dumps(accounts, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def unpack(blob: bytes) -> List:
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+def _write_private(path: str, data: bytes) -> None:
+    # Statements and their results are readable by this user only
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(descriptor, 'wb') as file:
+        file.write(data)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def remove_stale_spills(parent: str) -> None:
+    """
+    Remove the spill directories left in parent by processes that are gone.
+    Called before this process creates its own, so one with its pid is from
+    an earlier process (e.g. pid 1 of a restarted container).
+    """
+    try:
+        names = os.listdir(parent)
+    except OSError:
+        return
+    for name in names:
+        pid = name[len(SPILL_PREFIX):].split('-', 1)[0]
+        if name.startswith(SPILL_PREFIX) and pid.isdigit() and (int(pid) == os.getpid() or not _alive(int(pid))):
+            debug.info("Removing results left by process %s", pid)
+            shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+
+class _Entry:
+    def __init__(self, regenerate: Optional[Callable[..., Optional[List]]], regenerable: Optional[Callable[[], bool]]):
+        self.blob: Optional[bytes] = None
+        self.path: Optional[str] = None
+        self.size = 0
+        self.regenerate = regenerate
+        self.regenerable = regenerable
+        # Document the result was converted from, kept on disk to regenerate it
+        self.source_path: Optional[str] = None
+        self.source_size = 0
+        self.used = time.monotonic()
+
+
+class ResultStore:
+    """
+    Parsed results shared by every session of the process, each behind a
+    handle. Results are kept compressed in memory up to a budget; past it
+    the least recently used spill to disk, and past the disk budget or TTL
+    they are dropped. A dropped result is rebuilt with the regenerate
+    function it was stored with, given the source document when one was
+    stored (it is kept on disk, within the disk budget, until the TTL).
+
+    Files go to a directory private to the process, created (mode 0700) in
+    spill_parent on first use and removed at exit; those of processes that
+    died are removed then. Expired results are dropped on every use and by
+    a background sweep.
+    """
+    def __init__(self, memory_bytes: int = MEMORY_MB * 1024 * 1024, disk_bytes: int = DISK_MB * 1024 * 1024,
+                 spill_parent: str = SPILL_DIR, ttl: float = TTL, sweep_seconds: float = SWEEP_SECONDS):
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.spill_parent = spill_parent
+        self.spill_dir: Optional[str] = None
+        self.ttl = ttl
+        self.sweep_seconds = sweep_seconds
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._memory = 0
+        self._disk = 0
+        self._lock = threading.RLock()
+        self._sweeper: Optional[threading.Thread] = None
+
+    def put(self, accounts: List, regenerate: Optional[Callable[..., Optional[List]]] = None,
+            source: Optional[bytes] = None, regenerable: Optional[Callable[[], bool]] = None) -> str:
+        """
+        Store a result. regenerate(source=...) rebuilds it once dropped, from
+        the source document when one is given here; without a source,
+        regenerable tells whether regenerate can still work.
+        """
+        handle = uuid.uuid4().hex
+        entry = _Entry(regenerate, regenerable)
+        with self._lock:
+            self._entries[handle] = entry
+            self._store(entry, pack(accounts))
+            if regenerate is not None and source is not None:
+                self._keep_source(handle, entry, source)
+            self._evict()
+            if self._sweeper is None and self.sweep_seconds:
+                self._sweeper = threading.Thread(target=self._sweep, name="results-sweep", daemon=True)
+                self._sweeper.start()
+        return handle
+
+    def get(self, handle: Optional[str]) -> Optional[List]:
+        """
+        The result behind a handle, regenerated when it was dropped; None when
+        it is unknown or can't be rebuilt
+        """
+        with self._lock:
+            self._evict()
+            entry = self._entries.get(handle) if handle else None
+            if entry is None:
+                return None
+            self._entries.move_to_end(handle)
+            entry.used = time.monotonic()
+            blob = entry.blob if entry.blob is not None else self._read(entry)
+            regenerate = entry.regenerate
+            source = self._read_source(entry) if blob is None and regenerate is not None else None
+
+        if blob is not None:
+            return unpack(blob)
+        if regenerate is None:
+            return None
+
+        try:
+            accounts = regenerate(source=source)
+        except Exception as e:
+            debug.info("Result %s couldn't be regenerated: %s", handle, e)
+            return None
+        if accounts is None:
+            return None
+
+        with self._lock:
+            if handle in self._entries:
+                self._store(entry, pack(accounts))
+                self._evict()
+        return accounts
+
+    def available(self, handle: Optional[str]) -> bool:
+        """
+        Whether get() can still return the result, short of regenerating it
+        failing
+        """
+        with self._lock:
+            self._evict()
+            entry = self._entries.get(handle) if handle else None
+            if entry is None:
+                return False
+            if entry.blob is not None or entry.path is not None:
+                return True
+            if entry.regenerate is None:
+                return False
+            if entry.source_path is not None:
+                return True
+            regenerable = entry.regenerable
+        return regenerable is None or regenerable()
+
+    def discard(self, handle: Optional[str]) -> None:
+        with self._lock:
+            entry = self._entries.pop(handle, None) if handle else None
+            if entry is not None:
+                self._drop(entry)
+                self._drop_source(entry)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "results": len(self._entries),
+                "in_memory": sum(entry.blob is not None for entry in self._entries.values()),
+                "on_disk": sum(entry.path is not None for entry in self._entries.values()),
+                "sources": sum(entry.source_path is not None for entry in self._entries.values()),
+                "memory_bytes": self._memory,
+                "disk_bytes": self._disk
+            }
+
+    def close(self) -> None:
+        """
+        Drop every result and remove the spill directory
+        """
+        with self._lock:
+            for entry in self._entries.values():
+                self._drop(entry)
+                self._drop_source(entry)
+            self._entries.clear()
+            if self.spill_dir is not None:
+                shutil.rmtree(self.spill_dir, ignore_errors=True)
+                self.spill_dir = None
+
+    def _sweep(self) -> None:
+        while True:
+            time.sleep(self.sweep_seconds)
+            with self._lock:
+                self._evict()
+
+    def _directory(self) -> str:
+        if self.spill_dir is None:
+            os.makedirs(self.spill_parent, exist_ok=True)
+            remove_stale_spills(self.spill_parent)
+            # mkdtemp creates it readable by this user only
+            self.spill_dir = tempfile.mkdtemp(prefix=f"{SPILL_PREFIX}{os.getpid()}-", dir=self.spill_parent)
+            atexit.register(self.close)
+        return self.spill_dir
+
+    def _store(self, entry: _Entry, blob: bytes) -> None:
+        self._drop(entry)
+        entry.blob, entry.size = blob, len(blob)
+        self._memory += entry.size
+
+    def _read(self, entry: _Entry) -> Optional[bytes]:
+        if entry.path is None:
+            return None
+        try:
+            with open(entry.path, 'rb') as file:
+                return file.read()
+        except OSError as e:
+            debug.info("Spilled result %s is gone: %s", entry.path, e)
+            self._drop(entry)
+            return None
+
+    def _spill(self, handle: str, entry: _Entry) -> None:
+        blob, self._memory = entry.blob, self._memory - entry.size
+        entry.blob = None
+        if not self.disk_bytes or entry.size > self.disk_bytes:
+            return
+        try:
+            path = os.path.join(self._directory(), f"{handle}.json.z")
+            _write_private(path, blob)
+            entry.path = path
+            self._disk += entry.size
+        except OSError as e:
+            debug.warning("Result couldn't be spilled to disk: %s", e)
+
+    def _keep_source(self, handle: str, entry: _Entry, source: bytes) -> None:
+        if not self.disk_bytes or len(source) > self.disk_bytes:
+            return
+        try:
+            path = os.path.join(self._directory(), f"{handle}.source")
+            _write_private(path, source)
+            entry.source_path, entry.source_size = path, len(source)
+            self._disk += entry.source_size
+        except OSError as e:
+            debug.warning("Source of a result couldn't be kept on disk: %s", e)
+
+    def _read_source(self, entry: _Entry) -> Optional[bytes]:
+        if entry.source_path is None:
+            return None
+        try:
+            with open(entry.source_path, 'rb') as file:
+                return file.read()
+        except OSError as e:
+            debug.info("Source %s is gone: %s", entry.source_path, e)
+            self._drop_source(entry)
+            return None
+
+    def _drop_source(self, entry: _Entry) -> None:
+        if entry.source_path is not None:
+            try:
+                os.remove(entry.source_path)
+            except OSError:
+                pass
+            self._disk -= entry.source_size
+            entry.source_path = None
+
+    def _drop(self, entry: _Entry) -> None:
+        if entry.blob is not None:
+            self._memory -= entry.size
+            entry.blob = None
+        if entry.path is not None:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+            self._disk -= entry.size
+            entry.path = None
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        for handle, entry in self._entries.items():
+            if now - entry.used > self.ttl:
+                self._drop(entry)
+                self._drop_source(entry)
+
+        # Least recently used first
+        for handle, entry in self._entries.items():
+            if self._memory <= self.memory_bytes:
+                break
+            if entry.blob is not None:
+                self._spill(handle, entry)
+
+        for entry in self._entries.values():
+            if self._disk <= self.disk_bytes:
+                break
+            if entry.path is not None:
+                self._drop(entry)
+
+        # Then the sources of the least recently used
+        for entry in self._entries.values():
+            if self._disk <= self.disk_bytes:
+                break
+            self._drop_source(entry)
+
+        while len(self._entries) > MAX_HANDLES:
+            _, entry = self._entries.popitem(last=False)
+            self._drop(entry)
+            self._drop_source(entry)
+
+
+result_store = ResultStore()
@@ -0,0 +1,81 @@
+"""
+Import-time benchmark of what the app loads before the first page renders.
+
+Each run imports the modules in a fresh interpreter (Streamlit and SQLAlchemy,
+which the app can't avoid, are imported before the clock starts) and fails
+when the best time is over budget or a module that should load lazily is in
+sys.modules afterwards (whoever imported it, Streamlit included).
+
+    python scripts/import_benchmark.py [--budget SECONDS] [--runs N]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Modules imported by app.py and the views at startup
+STARTUP_MODULES = [
+    "config.database",
+    "config.seed",
+    "lib.parsers.base",
+    "lib.conversion",
+    "lib.export",
+    "lib.batch",
+    "lib.extraction",
+    "lib.results",
+    "lib.executor",
+    "lib.progress",
+    "lib.data.usage",
+    "lib.data.history",
+]
+
+# Imported only by the stage that needs them
+LAZY_MODULES = ["pymupdf", "pandas", "numpy", "openpyxl", "pyarrow", "requests"]
+
+# About three times the 13-20 ms the imports take, leaving room for a slower
+# machine but not for a heavy module or import-time work slipping in
+DEFAULT_BUDGET = 0.05
+
+PROBE = """
+import importlib, json, sys, time
+import streamlit, sqlalchemy
+start = time.perf_counter()
+for name in {modules!r}:
+    importlib.import_module(name)
+elapsed = time.perf_counter() - start
+loaded = [name for name in {lazy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "loaded": loaded}}))
+"""
+
+
+def measure(root: str) -> dict:
+    probe = PROBE.format(modules=STARTUP_MODULES, lazy=LAZY_MODULES)
+    output = subprocess.run([sys.executable, "-c", probe], cwd=root, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="seconds allowed (default %(default)s)")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to time (default %(default)s)")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = [measure(root) for _ in range(args.runs)]
+    best = min(result["seconds"] for result in results)
+    loaded = sorted({name for result in results for name in result["loaded"]})
+
+    print(f"Startup imports: best {best * 1000:.0f} ms of {args.runs} runs (budget {args.budget * 1000:.0f} ms)")
+    failed = False
+    if loaded:
+        print(f"Loaded at startup but should be lazy: {', '.join(loaded)}")
+        failed = True
+    if best > args.budget:
+        print("Over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,457 @@
+"""
+HTTP API for converting statements without the Streamlit UI.
+
+    python server.py [--host HOST] [--port PORT]
+
+    GET    /health                  pool, queue and job counts
+    GET    /banks                   supported banks
+    POST   /detect                  bank of the PDF in the body
+    POST   /convert?bank=&format=&account=
+                                    convert the PDF in the body; JSON by
+                                    default, or any export format (several
+                                    accounts come as a ZIP unless one is picked)
+    POST   /jobs?bank=&format=&account=
+                                    same, in the background: returns the job id
+    GET    /jobs/<id>               status of a job
+    GET    /jobs/<id>/result        output of a finished job
+    DELETE /jobs/<id>               cancel or forget a job
+
+The bank is detected when none is given. Conversions share the fair
+executor and the warm worker pool with the UI running in the same process.
+Usage is recorded when DATABASE_URL is set.
+
+Jobs and usage belong to the user a request authenticates as: the one of its
+token in CONVERTER_API_USERS, otherwise "api". The X-User header is only
+taken with CONVERTER_API_TRUST_X_USER=1, behind a proxy that authenticates
+users and sets the header itself (clients can't be trusted to set it).
+"""
+import argparse
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import CancelledError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional
+from urllib.parse import parse_qs, urlparse
+
+from lib import debug
+from lib.api.file import first_page, stats
+from lib.batch import BatchItem, bundle, convert_document
+from lib.data.usage import UsageTracker
+from lib.executor import executor
+from lib.export import export_rows, get_format
+from lib.parsers.base import BankParser
+from lib.pool import pool
+from lib.results import result_store
+
+HOST = os.environ.get("CONVERTER_API_HOST", "127.0.0.1")
+PORT = int(os.environ.get("CONVERTER_API_PORT", 8000))
+# Largest PDF accepted
+MAX_UPLOAD_MB = int(os.environ.get("CONVERTER_API_MAX_MB", 50))
+# When set, requests need "Authorization: Bearer <token>"
+TOKEN = os.environ.get("CONVERTER_API_TOKEN")
+# Per-user tokens as "user:token,user:token"; requests with one act as its user
+USERS = os.environ.get("CONVERTER_API_USERS", "")
+# Only behind a proxy that authenticates users and sets X-User itself
+TRUST_USER_HEADER = os.environ.get("CONVERTER_API_TRUST_X_USER", "") not in ("", "0")
+# Background jobs remembered; the oldest finished ones are forgotten first
+MAX_JOBS = int(os.environ.get("CONVERTER_API_MAX_JOBS", 1000))
+
+# Bytes buffered before a chunk of a streamed response is sent
+CHUNK_BYTES = 64 * 1024
+
+usage_tracker = UsageTracker(os.environ["DATABASE_URL"]) if os.environ.get("DATABASE_URL") else None
+
+
+class ApiError(Exception):
+    """
+    Error response: its HTTP status and a JSON body with the message and
+    details (which may have a "status" of their own, e.g. a job's)
+    """
+    def __init__(self, http_status: int, message: str, **details):
+        self.http_status = http_status
+        self.message = message
+        self.details = details
+        super().__init__(message)
+
+
+def user_tokens(users: str) -> Dict[str, str]:
+    """
+    User of each token, from "user:token,user:token"
+    """
+    tokens = {}
+    for number, entry in enumerate(filter(None, (entry.strip() for entry in users.split(","))), 1):
+        user, separator, token = entry.partition(":")
+        if not separator or not user or not token:
+            # Not echoed, it may be a token
+            raise ValueError(f"Entry {number} of the user tokens isn't user:token")
+        tokens[token] = user
+    return tokens
+
+
+USER_TOKENS = user_tokens(USERS)
+
+
+class ChunkedOutput(io.RawIOBase):
+    """
+    Write-only stream sending what is written as HTTP chunks
+    """
+    def __init__(self, wfile, chunk_bytes: int = CHUNK_BYTES):
+        self.wfile = wfile
+        self.chunk_bytes = chunk_bytes
+        self._buffer = bytearray()
+        self._written = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._written += len(data)
+        if len(self._buffer) >= self.chunk_bytes:
+            self._send()
+        return len(data)
+
+    def tell(self) -> int:
+        return self._written
+
+    def finish(self) -> None:
+        self._send()
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _send(self) -> None:
+        if self._buffer:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(self._buffer), bytes(self._buffer)))
+            self._buffer.clear()
+
+
+class Options:
+    """
+    Conversion settings of a request: bank (None to detect it), output
+    format and account (1-based, None for all)
+    """
+    def __init__(self, query: Dict):
+        self.bank = query.get("bank", [None])[0] or None
+        self.format = query.get("format", ["json"])[0]
+        account = query.get("account", [None])[0]
+
+        if self.bank is not None and self.bank not in BankParser.bank_names():
+            raise ApiError(400, f"Unknown bank: {self.bank}", banks=BankParser.bank_names())
+        if self.format != "json":
+            try:
+                export_format = get_format(self.format)
+            except ValueError as e:
+                raise ApiError(400, str(e))
+            if not export_format.available():
+                raise ApiError(400, f"{export_format.label} isn't available on this server")
+        try:
+            self.account = int(account) if account else None
+        except ValueError:
+            raise ApiError(400, f"Invalid account: {account}")
+
+
+class Job:
+    def __init__(self, user: str, name: str, options: Options, future):
+        self.id = uuid.uuid4().hex
+        self.user = user
+        self.name = name
+        self.options = options
+        self.future = future
+        self.created = time.time()
+
+
+_jobs: "OrderedDict[str, Job]" = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+def _remember(job: Job) -> None:
+    with _jobs_lock:
+        _jobs[job.id] = job
+        for old in [old for old in _jobs.values() if old.future.done()][:max(0, len(_jobs) - MAX_JOBS)]:
+            _forget(old)
+
+
+def _forget(job: Job) -> None:
+    _jobs.pop(job.id, None)
+    if job.future.done() and not job.future.cancelled() and job.future.exception() is None:
+        result_store.discard(job.future.result().handle)
+
+
+def run_conversion(name: str, data: bytes, bank_name: Optional[str], user: str) -> BatchItem:
+    """
+    Convert a document, record its usage and move its accounts to the
+    result store
+    """
+    item = convert_document(name, data, bank_name)
+    if item.status == "done":
+        if usage_tracker is not None:
+            try:
+                usage_tracker.record_conversion(dict(item.stats, source="api"), user)
+            except Exception as e:
+                debug.warning("Usage of %s couldn't be recorded: %s", user, e)
+        item.handle = result_store.put(item.conversion.accounts)
+        item.conversion.accounts = None
+    return item
+
+
+def _json_pieces(item: BatchItem, accounts) -> Iterable[bytes]:
+    """
+    The JSON document of a conversion, a piece at a time
+    """
+    head = {
+        "file": item.name,
+        "bank": item.bank,
+        "engine": item.conversion.engine,
+        "reconciled": item.conversion.reconciled,
+        "stats": item.stats
+    }
+    yield json.dumps(head, ensure_ascii=False, default=str)[:-1].encode("utf-8") + b', "accounts": ['
+    for number, account in enumerate(accounts):
+        yield (b", [" if number else b"[")
+        for index, row in enumerate(account):
+            yield (b", " if index else b"") + json.dumps(row, ensure_ascii=False, default=str).encode("utf-8")
+        yield b"]"
+    yield b"]}"
+
+
+def _select(accounts, account: Optional[int]):
+    if account is None:
+        return accounts
+    if not 1 <= account <= len(accounts):
+        raise ApiError(400, f"The statement has {len(accounts)} accounts, there is no account {account}")
+    return [accounts[account - 1]]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "StatementConverter"
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        debug.debug("%s %s", self.address_string(), format % args)
+
+    def _dispatch(self, method: str) -> None:
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        query = parse_qs(url.query)
+        self._streaming = False
+        try:
+            self._authorize()
+            if method == "GET" and parts == ["health"]:
+                self._json(200, {"status": "ok", "executor": executor.stats(), "pool": pool.stats(),
+                                 "results": result_store.stats(), "jobs": len(_jobs)})
+            elif method == "GET" and parts == ["banks"]:
+                self._json(200, [{"name": name, "status": BankParser.get_parser_status(name)}
+                                 for name in BankParser.bank_names()])
+            elif method == "POST" and parts == ["detect"]:
+                self._detect()
+            elif method == "POST" and parts == ["convert"]:
+                self._convert(Options(query))
+            elif method == "POST" and parts == ["jobs"]:
+                self._submit(Options(query))
+            elif len(parts) in (2, 3) and parts[0] == "jobs":
+                self._job(method, parts[1], parts[2:])
+            else:
+                raise ApiError(404, f"No such endpoint: {method} {url.path}")
+        except ApiError as e:
+            self._error(e.http_status, dict({"error": e.message}, **e.details))
+        except Exception as e:
+            debug.error("%s %s failed: %s", method, self.path, e)
+            self._error(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def _error(self, status: int, payload: Dict) -> None:
+        # The body may not have been read, so the connection can't be reused
+        self.close_connection = True
+        if self._streaming:
+            # Headers are out: ending without the last chunk tells the client
+            return
+        self._json(status, payload)
+
+    def _authorize(self) -> None:
+        authorization = self.headers.get("Authorization") or ""
+        token = authorization[len("Bearer "):] if authorization.startswith("Bearer ") else None
+        if token is not None and token in USER_TOKENS:
+            self._user_name = USER_TOKENS[token]
+        elif (TOKEN or USER_TOKENS) and (not TOKEN or token != TOKEN):
+            raise ApiError(401, "Missing or invalid token")
+        else:
+            self._user_name = "api"
+        if TRUST_USER_HEADER and self.headers.get("X-User"):
+            self._user_name = self.headers.get("X-User")
+
+    def _user(self) -> str:
+        return self._user_name
+
+    def _body(self) -> bytes:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise ApiError(400, f"Invalid Content-Length: {self.headers.get('Content-Length')}")
+        if not length:
+            raise ApiError(400, "Send the PDF as the request body")
+        if length > MAX_UPLOAD_MB * 1024 * 1024:
+            raise ApiError(413, f"Files are limited to {MAX_UPLOAD_MB} MB")
+        return self.rfile.read(length)
+
+    def _name(self) -> str:
+        return self.headers.get("X-File-Name") or "statement.pdf"
+
+    def _pages(self, data: bytes) -> int:
+        try:
+            return stats(data)["pages"]
+        except Exception as e:
+            raise ApiError(400, f"Not a readable PDF: {e}")
+
+    def _detect(self) -> None:
+        data = self._body()
+        self._pages(data)
+        bank, confidence = BankParser.detect_bank(first_page(data))
+        self._json(200, {"bank": bank, "confidence": confidence})
+
+    def _convert(self, options: Options) -> None:
+        data = self._body()
+        future = executor.submit(self._user(), self._pages(data), run_conversion,
+                                 self._name(), data, options.bank, self._user())
+        item = future.result()
+        try:
+            self._result(item, options)
+        finally:
+            result_store.discard(item.handle)
+
+    def _submit(self, options: Options) -> None:
+        data = self._body()
+        future = executor.submit(self._user(), self._pages(data), run_conversion,
+                                 self._name(), data, options.bank, self._user())
+        job = Job(self._user(), self._name(), options, future)
+        _remember(job)
+        self._json(202, dict(self._status(job), url=f"/jobs/{job.id}"))
+
+    def _job(self, method: str, job_id: str, rest) -> None:
+        with _jobs_lock:
+            job = _jobs.get(job_id)
+        if job is None or job.user != self._user():
+            raise ApiError(404, f"No such job: {job_id}")
+
+        if method == "GET" and not rest:
+            self._json(200, self._status(job))
+        elif method == "GET" and rest == ["result"]:
+            if not job.future.done():
+                raise ApiError(409, "The job hasn't finished", **self._status(job))
+            try:
+                item = job.future.result()
+            except CancelledError:
+                raise ApiError(409, "The job was cancelled")
+            self._result(item, job.options)
+        elif method == "DELETE" and not rest:
+            job.future.cancel()
+            with _jobs_lock:
+                _forget(job)
+            self._json(200, {"id": job.id, "status": "deleted"})
+        else:
+            raise ApiError(404, f"No such endpoint: {method} {self.path}")
+
+    def _status(self, job: Job) -> Dict:
+        status = {"id": job.id, "file": job.name, "created": job.created}
+        future = job.future
+        if future.cancelled():
+            return dict(status, status="cancelled")
+        if not future.done():
+            position = executor.position(future)
+            return dict(status, status="running" if position is None else "queued", position=position)
+        error = future.exception()
+        if error is not None:
+            return dict(status, status="failed", error=f"{type(error).__name__}: {error}")
+        item = future.result()
+        return dict(status, status=item.status, bank=item.bank, accounts=item.account_count, error=item.error)
+
+    def _result(self, item: BatchItem, options: Options) -> None:
+        if item.status != "done":
+            raise ApiError(422, item.error or "The statement couldn't be converted", status=item.status,
+                           bank=item.bank, diagnostics=item.diagnostics)
+        accounts = result_store.get(item.handle)
+        if accounts is None:
+            raise ApiError(410, "The result is no longer available")
+        accounts = _select(accounts, options.account)
+        stem = item.stem()
+
+        if options.format == "json":
+            output = self._stream(200, "application/json")
+            for piece in _json_pieces(item, accounts):
+                output.write(piece)
+            output.finish()
+            return
+
+        export_format = get_format(options.format)
+        if len(accounts) == 1:
+            suffix = f"_{options.account}" if options.account else ""
+            output = self._stream(200, export_format.mime, f"{stem}{suffix}.{export_format.extension}")
+            export_rows(accounts[0], options.format, output)
+        else:
+            archive = bundle([item], options.format, lambda _: accounts)
+            output = self._stream(200, "application/zip", f"{stem}.zip")
+            output.write(archive)
+        output.finish()
+
+    def _stream(self, status: int, content_type: str, file_name: Optional[str] = None) -> ChunkedOutput:
+        self._streaming = True
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        if file_name:
+            self.send_header("Content-Disposition", f'attachment; filename="{file_name}"')
+        self.end_headers()
+        return ChunkedOutput(self.wfile)
+
+    def _json(self, status: int, payload) -> None:
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Connections waiting to be accepted during bursts
+    request_queue_size = 128
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bank statement conversion API")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+
+    pool.start()
+    threading.Thread(target=BankParser.warm, name="warm-parsers", daemon=True).start()
+    server = Server((args.host, args.port), Handler)
+    print(f"Listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
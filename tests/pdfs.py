@@ -0,0 +1,46 @@
+"""
+Statements built on the fly for the tests
+"""
+from datetime import date, timedelta
+
+import pymupdf
+
+
+def amount(value: int) -> str:
+    return f"{value:,}".replace(",", ".") + ",00"
+
+
+def statement_lines(movements: int = 20, first_day: date = date(2024, 1, 1)):
+    """
+    Lines of a BPN statement of daily movements, a credit then two debits,
+    opening with a balance of 1.000,00
+    """
+    lines, balance = [f"Saldo Anterior en $ : {amount(1000)}"], 1000
+    for number in range(movements):
+        value = 10 + number
+        balance += value if number % 3 == 0 else -value
+        day = first_day + timedelta(days=number)
+        lines.append(f"{day:%d/%m/%Y}  MOVIMIENTO {number}  {amount(value)}   {amount(balance)}")
+    lines.append(f"Saldo en $ : {amount(balance)}")
+    return lines
+
+
+def statement_pdf(movements: int = 20, per_page: int = 10) -> bytes:
+    """
+    The statement with per_page movements on each page, the opening balance
+    on the first one and the closing balance on the last one
+    """
+    opening, *rows, closing = statement_lines(movements)
+    pages = [rows[i:i + per_page] for i in range(0, len(rows), per_page)]
+    pages[0].insert(0, opening)
+    pages[-1].append(closing)
+    return text_pdf(pages)
+
+
+def text_pdf(pages) -> bytes:
+    doc = pymupdf.open()
+    for page_lines in pages:
+        page = doc.new_page()
+        for number, line in enumerate(page_lines):
+            page.insert_text((40, 60 + number * 14), line, fontsize=9)
+    return doc.tobytes()
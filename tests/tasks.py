@@ -0,0 +1,35 @@
+"""
+Module-level tasks for the worker pool tests: workers import them by name
+"""
+import os
+import time
+
+from lib.pool import report
+
+
+def echo(value):
+    return value
+
+
+def pid():
+    return os.getpid()
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def exit_now(code):
+    os._exit(code)
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def count_to(total):
+    for number in range(total):
+        report(number)
+        time.sleep(0.01)
+    return total
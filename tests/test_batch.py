@@ -0,0 +1,65 @@
+import io
+import zipfile
+
+import pytest
+
+pytest.importorskip("pymupdf")
+
+from lib.batch import bundle, iter_documents, process_batch
+from tests.pdfs import statement_pdf, text_pdf
+
+
+def archive(entries) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_file:
+        for name, data in entries:
+            zip_file.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_iter_documents_reads_the_pdfs_of_an_archive():
+    pdf = statement_pdf(3)
+    data = archive([("a.pdf", pdf), ("notes.txt", b"x"), ("__MACOSX/._a.pdf", b"x"), ("dir/.hidden.pdf", b"x"),
+                    ("dir/B.PDF", pdf)])
+    assert [name for name, _ in iter_documents("upload.zip", data)] == ["a.pdf", "dir/B.PDF"]
+    assert list(iter_documents("single.pdf", pdf)) == [("single.pdf", pdf)]
+
+
+def test_process_batch_keeps_input_order_and_records_failures():
+    documents = [("first.pdf", statement_pdf(30)), ("broken.pdf", b"not a pdf"),
+                 ("unknown.pdf", text_pdf([["Nothing to see here"]])), ("last.pdf", statement_pdf(3))]
+    done = []
+    items = process_batch(documents, workers=2, on_done=lambda item: done.append(item.name))
+
+    assert [item.name for item in items] == ["first.pdf", "broken.pdf", "unknown.pdf", "last.pdf"]
+    assert sorted(done) == sorted(name for name, _ in documents)
+    assert [item.status for item in items] == ["done", "failed", "skipped", "done"]
+    assert items[0].bank == "BPN" and items[0].account_count == 1
+    assert len(items[0].conversion.accounts[0]) == 31
+    assert items[1].error and items[2].error == "Bank not recognised"
+
+
+def test_process_batch_reads_documents_as_jobs_finish():
+    read = []
+
+    def documents():
+        for number in range(5):
+            read.append(number)
+            yield f"{number}.pdf", statement_pdf(3)
+
+    seen = []
+    process_batch(documents(), "BPN", workers=2, on_done=lambda item: seen.append(len(read)))
+    # Never more than two documents read ahead of the finished ones
+    assert all(count <= finished + 2 for finished, count in enumerate(seen))
+
+
+def test_bundle_names_files_after_their_document():
+    items = process_batch([("dir/statement.pdf", statement_pdf(3)), ("statement.pdf", statement_pdf(4)),
+                           ("broken.pdf", b"not a pdf")], "BPN")
+    with zipfile.ZipFile(io.BytesIO(bundle(items, "csv"))) as zip_file:
+        assert zip_file.namelist() == ["statement_1.csv", "statement (2)_1.csv"]
+        assert b"MOVIMIENTO 3" in zip_file.read("statement (2)_1.csv")
+
+    loaded = bundle(items, "csv", load=lambda item: [[{"FECHA": "", "DETALLE": item.name}]])
+    with zipfile.ZipFile(io.BytesIO(loaded)) as zip_file:
+        assert b"dir/statement.pdf" in zip_file.read("statement_1.csv")
@@ -0,0 +1,58 @@
+from datetime import date
+
+import pytest
+
+from lib import conversion
+from lib.conversion import convert, convert_range, filter_range
+
+
+def row(fecha, debitos="", creditos="", saldo=""):
+    return {"FECHA": fecha, "DETALLE": "", "REFERENCIA": "", "DEBITOS": debitos, "CREDITOS": creditos, "SALDO": saldo}
+
+
+def test_filter_range_opens_with_the_last_balance_before_the_window():
+    account = [row("", saldo=100.0), row("01/01/2024", creditos=10.0, saldo=110.0),
+               row("02/01/2024", debitos=5.0, saldo=105.0), row("03/01/2024", creditos=1.0, saldo=106.0)]
+    opening, *window = filter_range([account], date(2024, 1, 2), date(2024, 1, 3))[0]
+    assert opening["SALDO"] == 110.0
+    assert window == account[2:]
+
+
+def test_misread_first_movement_is_inconsistent():
+    # A credit read as a debit for want of the previous balance
+    account = [row("", saldo=432.0), row("18/02/2024", debitos=58.0, saldo=490.0)]
+    assert not conversion._consistent_opening(account)
+    assert conversion._consistent_opening([row("", saldo=432.0), row("18/02/2024", creditos=58.0, saldo=490.0)])
+
+
+@pytest.fixture(scope="module")
+def statement():
+    pytest.importorskip("pymupdf")
+    from tests.pdfs import statement_pdf
+    # 60 daily movements from 01/01/2024, 8 pages
+    return statement_pdf(60, per_page=8)
+
+
+@pytest.mark.parametrize("start, end", [
+    (date(2024, 2, 18), date(2024, 2, 29)),
+    (date(2024, 1, 9), date(2024, 1, 20)),
+    (date(2024, 1, 1), date(2024, 1, 5)),
+    (date(2024, 2, 1), date(2024, 2, 1)),
+])
+def test_convert_range_matches_the_whole_document(statement, start, end):
+    expected = filter_range(convert("BPN", statement, guarded=False).accounts, start, end)
+    result = convert_range("BPN", statement, start, end, guarded=False)
+    assert result.accounts == expected
+    assert result.reconciled
+
+
+def test_convert_range_skips_pages_without_misreading(statement, monkeypatch):
+    selected = []
+    select_pages = conversion.select_pages
+    monkeypatch.setattr(conversion, "select_pages", lambda data, pages: selected.append(pages) or select_pages(data, pages))
+
+    # Movement 48, a credit, opens both the window and the 7th page
+    opening, first, *_ = convert_range("BPN", statement, date(2024, 2, 18), date(2024, 2, 29), guarded=False).accounts[0]
+    assert selected and len(selected[0]) < 8
+    assert (first["DETALLE"], first["DEBITOS"], first["CREDITOS"]) == ("MOVIMIENTO 48", "", 58.0)
+    assert opening["SALDO"] == first["SALDO"] - 58.0
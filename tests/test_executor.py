@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+
+from lib.executor import FairExecutor
+
+
+@pytest.fixture
+def blocked():
+    """
+    A one-worker executor without aging, its worker held until release()
+    """
+    executor = FairExecutor(max_workers=1, aging=0)
+    gate = threading.Event()
+    started = threading.Event()
+
+    def hold():
+        started.set()
+        gate.wait(10)
+
+    executor.submit("holder", 0, hold)
+    assert started.wait(10)
+    executor.release = gate.set
+    yield executor
+    gate.set()
+
+
+def run_order(executor, jobs):
+    """
+    Submit (user, cost, name) jobs on the blocked executor and return the
+    names in the order they ran
+    """
+    order = []
+    futures = [executor.submit(user, cost, order.append, name) for user, cost, name in jobs]
+    executor.release()
+    for future in futures:
+        future.result(10)
+    return order, futures
+
+
+def test_shortest_job_first(blocked):
+    order, _ = run_order(blocked, [("a", 10, "large"), ("b", 1, "small"), ("c", 5, "medium")])
+    assert order == ["small", "medium", "large"]
+
+
+def test_ties_run_in_submission_order(blocked):
+    order, _ = run_order(blocked, [("a", 3, "first"), ("b", 3, "second"), ("a", 3, "third")])
+    assert order == ["first", "second", "third"]
+
+
+def test_users_with_fewer_running_jobs_go_first():
+    executor = FairExecutor(max_workers=2, aging=0)
+    gates = {user: threading.Event() for user in ("a", "b")}
+    started = threading.Barrier(3)
+
+    def hold(user):
+        started.wait(10)
+        gates[user].wait(10)
+
+    executor.submit("a", 0, hold, "a")
+    executor.submit("b", 0, hold, "b")
+    started.wait(10)
+
+    order = []
+    futures = [executor.submit("a", 1, order.append, "a small"), executor.submit("c", 50, order.append, "c large")]
+    # b's worker frees up while a still has a job running
+    gates["b"].set()
+    for future in futures:
+        future.result(10)
+    gates["a"].set()
+    assert order == ["c large", "a small"]
+
+
+def test_waiting_jobs_age():
+    executor = FairExecutor(max_workers=1, aging=1000)
+    gate = threading.Event()
+    executor.submit("holder", 0, gate.wait, 10)
+    order = []
+    large = executor.submit("a", 100, order.append, "large")
+    time.sleep(0.2)
+    small = executor.submit("b", 1, order.append, "small")
+    gate.set()
+    large.result(10), small.result(10)
+    assert order == ["large", "small"]
+
+
+def test_position(blocked):
+    large = blocked.submit("a", 10, time.sleep, 0)
+    small = blocked.submit("b", 1, time.sleep, 0)
+    assert (blocked.position(small), blocked.position(large)) == (0, 1)
+    assert blocked.stats()["queued"] == 2 and blocked.stats()["running_by_user"] == {"holder": 1}
+    blocked.release()
+    large.result(10)
+    assert blocked.position(large) is None
+
+
+def test_cancelled_jobs_are_skipped(blocked):
+    order = []
+    cancelled = blocked.submit("a", 1, order.append, "cancelled")
+    assert cancelled.cancel()
+    kept = blocked.submit("a", 2, order.append, "kept")
+    blocked.release()
+    kept.result(10)
+    assert order == ["kept"]
+
+
+def test_failures_resolve_the_future_and_keep_workers(monkeypatch):
+    executor = FairExecutor(max_workers=1, aging=0)
+
+    def fail(error):
+        raise error
+
+    assert isinstance(executor.submit("a", 1, fail, ValueError("bad")).exception(10), ValueError)
+    # A BaseException ends its worker once the job is resolved; the next
+    # submit starts another
+    worker, = executor._workers
+    monkeypatch.setattr(threading, "excepthook", lambda args: None)
+    assert isinstance(executor.submit("a", 1, fail, SystemExit(3)).exception(10), SystemExit)
+    worker.join(10)
+    assert not worker.is_alive()
+    assert executor.submit("a", 1, sum, [1, 2]).result(10) == 3
+    assert executor.stats()["running"] == 0
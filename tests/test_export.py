@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+
+import pytest
+
+from lib.export import account_summary, export_rows, parse_amount
+
+ROWS = [
+    {"FECHA": "", "DETALLE": "Saldo Anterior", "REFERENCIA": "", "DEBITOS": "", "CREDITOS": "", "SALDO": "1.000,00"},
+    {"FECHA": "02/01/2024", "DETALLE": "Transferencia", "REFERENCIA": "123", "DEBITOS": "", "CREDITOS": "1.234,56", "SALDO": "2.234,56"},
+    {"FECHA": "03/01/2024", "DETALLE": "Comision", "REFERENCIA": "", "DEBITOS": 34.56, "CREDITOS": "", "SALDO": 2200.0},
+    {"FECHA": "04/01/2024", "DETALLE": "Ajuste", "REFERENCIA": "", "DEBITOS": "", "CREDITOS": "", "SALDO": "s/d"},
+]
+
+
+@pytest.mark.parametrize("value, amount", [
+    ("1.234,56", 1234.56), ("-1.234,56", -1234.56), ("1.234,56-", -1234.56), ("−7,00", -7.0),
+    ("$ 12,00", 12.0), ("50", 50.0), (3, 3.0), ("s/d", None), ("1,2,3", None), ("", None), (None, None),
+])
+def test_parse_amount(value, amount):
+    assert parse_amount(value) == amount
+
+
+def test_csv_parses_string_amounts():
+    records = list(csv.DictReader(io.StringIO(export_rows(ROWS, "csv").decode("utf-8"))))
+    assert [record["SALDO"] for record in records] == ["1000.0", "2234.56", "2200.0", "s/d"]
+    assert records[1]["CREDITOS"] == "1234.56"
+    assert records[1]["FECHA"] == "2024-01-02" and records[1]["REFERENCIA"] == "123"
+
+
+def test_jsonl_parses_string_amounts():
+    records = [json.loads(line) for line in export_rows(ROWS, "jsonl").splitlines()]
+    assert records[1]["CREDITOS"] == 1234.56 and records[1]["DEBITOS"] is None
+    assert records[2]["DEBITOS"] == 34.56
+    # Kept as written rather than dropped
+    assert records[3]["SALDO"] == "s/d"
+
+
+@pytest.mark.parametrize("format_name", ["parquet", "arrow"])
+def test_columnar_formats_parse_string_amounts(format_name):
+    pa = pytest.importorskip("pyarrow")
+    data = export_rows(ROWS, format_name)
+    if format_name == "parquet":
+        import pyarrow.parquet as pq
+        table = pq.read_table(pa.BufferReader(data))
+    else:
+        table = pa.ipc.open_file(pa.BufferReader(data)).read_all()
+    assert table.schema.field("SALDO").type == pa.float64()
+    assert table.column("SALDO").to_pylist() == [1000.0, 2234.56, 2200.0, None]
+    assert table.column("CREDITOS").to_pylist() == [None, 1234.56, None, None]
+
+
+def test_excel_parses_string_amounts():
+    openpyxl = pytest.importorskip("openpyxl")
+    sheet = openpyxl.load_workbook(io.BytesIO(export_rows(ROWS, "xlsx"))).active
+    saldos = [row[5] for row in sheet.iter_rows(min_row=2, values_only=True)]
+    assert saldos == [1000.0, 2234.56, 2200.0, "s/d"]
+
+
+def test_summary_of_string_amounts():
+    summary = account_summary("Account 1", ROWS)
+    assert (summary["OPENING"], summary["CLOSING"]) == (1000.0, 2200.0)
+    assert (summary["DEBITOS"], summary["CREDITOS"], summary["MOVEMENTS"]) == (34.56, 1234.56, 2)
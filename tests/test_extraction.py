@@ -0,0 +1,53 @@
+from concurrent.futures import Future
+
+import pytest
+
+pytest.importorskip("pymupdf")
+
+from lib import extraction
+from lib.api.engines import get_engine
+from lib.extraction import ExtractionCache, document_key, extract, speculate, status
+from tests.pdfs import statement_pdf
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(extraction, "extraction_cache", ExtractionCache())
+
+
+def test_speculated_extraction_is_used():
+    data = statement_pdf(30)
+    assert status(data, "text") is None
+    assert speculate(data, ["text"]) == document_key(data)
+    assert status(data, "text") in ("running", "ready")
+
+    pages = []
+    output = extract(data, "text", lambda index, total, page: pages.append((index, total)))
+    assert output == get_engine("text").extract(data)
+    assert status(data, "text") == "ready"
+    # Pages of an output that was already there are replayed
+    assert pages == [(index, len(output)) for index in range(len(output))]
+
+
+def test_remote_engines_are_not_speculated():
+    data = statement_pdf(3)
+    speculate(data, ["datalab"])
+    assert status(data, "datalab") is None
+
+
+def test_extract_waits_for_the_background_extraction(monkeypatch):
+    data = statement_pdf(3)
+    future = Future()
+    future.set_result(["from the background"])
+    monkeypatch.setitem(extraction._pending, (document_key(data), "text"), future)
+    assert status(data, "text") == "running"
+    assert extract(data, "text") == ["from the background"]
+    assert status(data, "text") == "ready"
+
+
+def test_failed_background_extraction_is_redone(monkeypatch):
+    data = statement_pdf(3)
+    future = Future()
+    future.set_exception(RuntimeError("worker died"))
+    monkeypatch.setitem(extraction._pending, (document_key(data), "text"), future)
+    assert extract(data, "text") == get_engine("text").extract(data)
@@ -0,0 +1,16 @@
+import os
+
+from scripts.import_benchmark import DEFAULT_BUDGET, LAZY_MODULES, measure
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_startup_imports_stay_lazy():
+    result = measure(ROOT)
+    assert result["loaded"] == []
+    assert {"pymupdf", "pandas", "numpy", "openpyxl", "pyarrow"} <= set(LAZY_MODULES)
+
+
+def test_startup_imports_within_budget():
+    # Best of a few fresh interpreters, as the benchmark does
+    assert min(measure(ROOT)["seconds"] for _ in range(3)) <= DEFAULT_BUDGET
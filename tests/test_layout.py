@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from lib.parsers import layout
+from lib.parsers.credicoop import CredicoopParser
+from lib.parsers.layout import infer_field_config, matches_header
+
+HEADER = "FECHA    COMBTE DESCRIPCION                              DEBITO           CREDITO             SALDO"
+FIELDS = list(CredicoopParser.FIELD_CONFIG)
+
+
+def amount(value: float) -> str:
+    return f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def movement(day: int, description: str, debito: str = "", credito: str = "", saldo: str = "") -> str:
+    return f"{day:02d}/01/24 {100 + day:<6} {description:<40} {debito:>17} {credito:>17} {saldo:>17}".rstrip()
+
+
+def statement(descriptions, credits=True):
+    balance, rows = 1000.0, []
+    for day, description in enumerate(descriptions, 1):
+        value = 10.0 + day
+        credit = credits and day % 2 == 0
+        balance += value if credit else -value
+        rows.append(movement(day, description, "" if credit else amount(value), amount(value) if credit else "",
+                             amount(balance)))
+    return rows
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    layout._cache.clear()
+
+
+def test_inferred_columns_sit_under_their_titles():
+    rows = statement([f"COMPRA {day}" for day in range(8)])
+    config = infer_field_config(rows, FIELDS, header_line=HEADER)
+    assert config is not None and matches_header(config, HEADER)
+    assert [row[slice(*config["DEBITO"])].strip() for row in rows[:2]] == ["11,00", ""]
+
+
+def test_columns_not_under_their_titles_are_rejected():
+    # Only debits on the page and a description in two runs: as many columns as
+    # fields, but the second description run would be taken for DEBITO
+    rows = statement([f"TRANSF {'X' * (day % 3)}         CBU {day}" for day in range(8)], credits=False)
+    assert len(layout.infer_columns(rows, header_line=HEADER)) == len(FIELDS)
+    assert infer_field_config(rows, FIELDS, header_line=HEADER) is None
+
+
+def test_parser_falls_back_to_the_static_columns():
+    rows = statement([f"TRANSF {'X' * (day % 3)}         CBU {day}" for day in range(8)], credits=False)
+    page = "\n".join([HEADER, f"SALDO ANTERIOR {amount(1000.0):>50}"] + rows + ["SALDO AL 31/01/24 " + amount(1000.0 - sum(range(11, 19)))])
+    opening, *movements, closing = CredicoopParser().parse([page])[0]
+    assert [row["DEBITOS"] for row in movements] == [10.0 + day for day in range(1, 9)]
+    assert all(row["CREDITOS"] == "" and row["DETALLE"].startswith("TRANSF") for row in movements)
@@ -0,0 +1,50 @@
+import pytest
+
+from lib.parsers import patterns
+from lib.parsers.patterns import PatternRegistry, pattern_stats
+from lib.parsers.watchdog import run_guarded
+from tests.pdfs import statement_lines
+
+registry = PatternRegistry("Test", {"digits": r'\d+'})
+
+
+@pytest.fixture
+def regex_stats():
+    patterns.enable_stats(True)
+    patterns.reset_stats()
+    yield
+    patterns.enable_stats(False)
+    patterns.reset_stats()
+
+
+def counts(bank: str):
+    return {row["pattern"]: (row["calls"], row["hits"]) for row in pattern_stats() if row["bank"] == bank}
+
+
+def test_counts_calls_and_hits(regex_stats):
+    registry.match("digits", "12")
+    registry.search("digits", "ab")
+    assert counts("Test") == {"digits": (2, 1)}
+
+
+def test_stats_since_a_mark(regex_stats):
+    registry.match("digits", "1")
+    mark = patterns.stats_mark()
+    registry.match("digits", "2")
+    registry.match("digits", "x")
+    assert [delta[:4] for delta in patterns.stats_since(mark) if delta[0] == "Test"] == [("Test", "digits", 2, 1)]
+
+
+def test_guarded_parses_report_their_counters(regex_stats):
+    # The parse runs in a worker process, whose counters come back with it
+    accounts = run_guarded("BPN", ["\n".join(statement_lines(5))])
+    assert len(accounts[0]) == 6
+    assert counts("BPN (template)")
+    assert sum(calls for calls, _ in counts("BPN (template)").values()) >= 6
+
+
+def test_nothing_counted_when_disabled():
+    patterns.reset_stats()
+    run_guarded("BPN", ["\n".join(statement_lines(5))])
+    registry.match("digits", "1")
+    assert pattern_stats() == []
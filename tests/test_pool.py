@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from lib.pool import PoolTimeout, WorkerDied, WorkerPool
+from tests import tasks
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(size=1, max_tasks=100, initializer=None)
+    yield pool
+    pool.shutdown()
+
+
+def test_runs_tasks_in_a_warm_worker(pool):
+    assert pool.run(tasks.echo, 42) == 42
+    assert pool.run(tasks.pid) == pool.run(tasks.pid)
+    assert pool.stats()["tasks"] == 3
+
+
+def test_task_exceptions_are_raised(pool):
+    with pytest.raises(ValueError, match="broken"):
+        pool.run(tasks.fail, "broken")
+    assert pool.stats()["failed"] == 1
+    assert pool.run(tasks.echo, 1) == 1
+
+
+def test_workers_are_recycled_after_max_tasks():
+    pool = WorkerPool(size=1, max_tasks=2, initializer=None)
+    try:
+        first = pool.run(tasks.pid)
+        assert pool.run(tasks.pid) == first
+        assert pool.run(tasks.pid) != first
+        assert pool.stats()["recycled"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_dead_worker_is_replaced(pool):
+    with pytest.raises(WorkerDied) as died:
+        pool.run(tasks.exit_now, 3)
+    assert died.value.exitcode == 3
+    assert pool.run(tasks.echo, "again") == "again"
+    assert pool.stats()["died"] == 1
+
+
+def test_timed_out_worker_is_killed(pool):
+    with pytest.raises(PoolTimeout):
+        pool.run(tasks.sleep, 10, timeout=0.2)
+    assert pool.run(tasks.echo, "again") == "again"
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_progress_is_streamed(pool):
+    received = []
+    began = time.monotonic()
+    assert pool.run(tasks.count_to, 5, on_progress=lambda number: received.append((number, time.monotonic()))) == 5
+    assert [number for number, _ in received] == [0, 1, 2, 3, 4]
+    # The first report arrives while the task is still going
+    assert received[0][1] < time.monotonic() - 0.02 and received[0][1] >= began
+
+
+def test_raising_from_progress_stops_the_task(pool):
+    def stop(number):
+        if number == 1:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        pool.run(tasks.count_to, 100, on_progress=stop)
+    assert pool.stats()["busy"] == 0
+    assert pool.run(tasks.echo, "again") == "again"
+
+
+def test_unsendable_task_frees_its_worker(pool):
+    with pytest.raises(Exception):
+        pool.run(tasks.echo, lambda: None)
+    assert pool.stats()["busy"] == 0
+    assert pool.run(tasks.echo, "again") == "again"
+
+
+def test_shutdown_stops_busy_workers_when_done(pool):
+    pool.run(tasks.echo, 0)
+    runner = threading.Thread(target=pool.run, args=(tasks.sleep, 0.3))
+    runner.start()
+    time.sleep(0.1)
+    pool.shutdown()
+    runner.join()
+    deadline = time.monotonic() + 5
+    while pool.stats()["alive"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert pool.stats()["alive"] == 0
@@ -0,0 +1,114 @@
+import os
+import stat
+import subprocess
+import sys
+import time
+
+import pytest
+
+from lib.results import SPILL_PREFIX, ResultStore
+
+ACCOUNTS = [[{"FECHA": "01/01/2024", "DETALLE": f"MOVIMIENTO {number}", "SALDO": float(number)} for number in range(50)]]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(memory_bytes=1 << 20, disk_bytes=1 << 20, spill_parent=str(tmp_path), ttl=60, sweep_seconds=0)
+    yield store
+    store.close()
+
+
+def mode(path) -> int:
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_results_come_back(store):
+    handle = store.put(ACCOUNTS)
+    assert store.get(handle) == ACCOUNTS
+    assert store.available(handle)
+    assert store.get("unknown") is None and not store.available(None)
+
+
+def test_results_past_the_memory_budget_spill_privately(store):
+    store.memory_bytes = 0
+    handle = store.put(ACCOUNTS)
+    assert store.stats()["on_disk"] == 1 and store.stats()["in_memory"] == 0
+    assert mode(store.spill_dir) == 0o700
+    assert [mode(os.path.join(store.spill_dir, name)) for name in os.listdir(store.spill_dir)] == [0o600]
+    assert store.get(handle) == ACCOUNTS
+
+
+def test_results_past_the_disk_budget_are_dropped(store):
+    store.memory_bytes = store.disk_bytes = 0
+    handle = store.put(ACCOUNTS)
+    assert store.stats()["on_disk"] == 0
+    assert store.get(handle) is None and not store.available(handle)
+
+
+def test_expired_results_are_dropped_on_use(store):
+    store.ttl = 0.05
+    handle = store.put(ACCOUNTS)
+    time.sleep(0.1)
+    assert store.get(handle) is None
+    assert store.stats()["memory_bytes"] == 0
+
+
+def test_expired_results_are_swept_while_idle(tmp_path):
+    store = ResultStore(spill_parent=str(tmp_path), ttl=0.05, sweep_seconds=0.05)
+    try:
+        store.put(ACCOUNTS)
+        time.sleep(0.3)
+        assert store.stats()["memory_bytes"] == 0
+    finally:
+        store.close()
+
+
+def test_dropped_results_are_regenerated_from_their_source(store):
+    calls = []
+
+    def regenerate(source=None):
+        calls.append(source)
+        return ACCOUNTS if source == b"%PDF" else None
+
+    store.memory_bytes = store.disk_bytes // 2
+    handle = store.put(ACCOUNTS, regenerate, b"%PDF", regenerable=lambda: False)
+    with store._lock:
+        store._drop(store._entries[handle])
+    # The source kept on disk is enough, whatever regenerable says
+    assert store.available(handle)
+    assert store.get(handle) == ACCOUNTS and calls == [b"%PDF"]
+    assert mode(store._entries[handle].source_path) == 0o600
+
+
+def test_availability_without_a_source_asks_regenerable(store):
+    state = {"cached": True}
+    handle = store.put(ACCOUNTS, lambda source=None: ACCOUNTS if state["cached"] else None,
+                       regenerable=lambda: state["cached"])
+    with store._lock:
+        store._drop(store._entries[handle])
+    assert store.available(handle)
+    state["cached"] = False
+    assert not store.available(handle)
+    assert store.get(handle) is None
+
+
+def test_discard_removes_files(store):
+    store.memory_bytes = 0
+    handle = store.put(ACCOUNTS, lambda source=None: None, b"%PDF")
+    assert len(os.listdir(store.spill_dir)) == 2
+    store.discard(handle)
+    assert os.listdir(store.spill_dir) == []
+    assert store.stats()["disk_bytes"] == 0
+
+
+def test_spills_of_dead_processes_are_removed(store, tmp_path):
+    dead = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    stale = tmp_path / f"{SPILL_PREFIX}{dead.stdout.strip()}-old"
+    stale.mkdir()
+    (stale / "result.json.z").write_bytes(b"old")
+    live = tmp_path / f"{SPILL_PREFIX}{os.getppid()}-live"
+    live.mkdir()
+
+    store.memory_bytes = 0
+    store.put(ACCOUNTS)
+    assert not stale.exists() and live.exists()
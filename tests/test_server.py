@@ -0,0 +1,179 @@
+import http.client
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import Future
+
+import pytest
+
+pytest.importorskip("pymupdf")
+
+import server
+from lib.pool import pool
+from tests.pdfs import statement_pdf, text_pdf
+
+
+@pytest.fixture(scope="module")
+def api():
+    httpd = server.Server(("127.0.0.1", 0), server.Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+    pool.shutdown()
+
+
+def request(url: str, method: str = "GET", data: bytes = None, headers=None):
+    """
+    (HTTP status, parsed JSON or raw body) of a request, errors included
+    """
+    try:
+        response = urllib.request.urlopen(urllib.request.Request(url, data=data, method=method, headers=headers or {}))
+    except urllib.error.HTTPError as e:
+        response = e
+    with response:
+        body = response.read()
+        if response.headers.get("Content-Type", "").startswith("application/json"):
+            body = json.loads(body)
+        return response.status, body
+
+
+def test_health_and_banks(api):
+    status, health = request(f"{api}/health")
+    assert status == 200 and health["status"] == "ok"
+
+    status, banks = request(f"{api}/banks")
+    assert status == 200 and "BPN" in [bank["name"] for bank in banks]
+
+
+def test_convert(api):
+    status, body = request(f"{api}/convert?bank=BPN", "POST", statement_pdf())
+    assert status == 200
+    assert body["bank"] == "BPN"
+    account, = body["accounts"]
+    assert account[0]["SALDO"] == 1000.0
+    assert len(account) == 21
+    assert account[1]["CREDITOS"] == 10.0 and account[2]["DEBITOS"] == 11.0
+
+
+def test_convert_to_csv(api):
+    status, body = request(f"{api}/convert?bank=BPN&format=csv", "POST", statement_pdf())
+    assert status == 200
+    assert b"MOVIMIENTO 19" in body
+
+
+def test_convert_errors(api):
+    pdf = statement_pdf()
+
+    status, body = request(f"{api}/convert?bank=Nowhere", "POST", pdf)
+    assert status == 400 and "BPN" in body["banks"]
+
+    status, body = request(f"{api}/convert?bank=BPN&format=nothing", "POST", pdf)
+    assert status == 400
+
+    status, body = request(f"{api}/convert?bank=BPN&account=2", "POST", pdf)
+    assert status == 400 and "no account 2" in body["error"]
+
+    status, body = request(f"{api}/convert", "POST", b"not a pdf")
+    assert status == 400 and body["error"].startswith("Not a readable PDF")
+
+    status, body = request(f"{api}/convert", "POST", b"")
+    assert status == 400
+
+    status, body = request(f"{api}/nothing")
+    assert status == 404
+
+
+def test_convert_unconvertible_statement(api):
+    # Neither a bank to detect nor movements: the outcome of the conversion
+    # comes with the 422, not a server error
+    status, body = request(f"{api}/convert", "POST", text_pdf([["Nothing to see here"]]))
+    assert status == 422
+    assert body["status"] in ("failed", "skipped")
+    assert body["error"]
+
+
+def test_invalid_content_length(api):
+    host, port = api[len("http://"):].split(":")
+    for length in ("abc", "-5"):
+        connection = http.client.HTTPConnection(host, int(port), timeout=10)
+        connection.putrequest("POST", "/convert")
+        connection.putheader("Content-Length", length)
+        connection.endheaders()
+        response = connection.getresponse()
+        assert response.status == 400
+        assert json.loads(response.read())["error"] == f"Invalid Content-Length: {length}"
+        connection.close()
+
+
+def test_user_tokens():
+    assert server.user_tokens(" alice:one, bob:two:three ,") == {"one": "alice", "two:three": "bob"}
+    with pytest.raises(ValueError):
+        server.user_tokens("alice:one,two")
+
+
+def test_jobs_belong_to_the_token_user(api, monkeypatch):
+    monkeypatch.setattr(server, "USER_TOKENS", {"one": "alice", "two": "bob"})
+    alice, bob = {"Authorization": "Bearer one"}, {"Authorization": "Bearer two"}
+    assert request(f"{api}/banks")[0] == 401
+
+    status, job = request(f"{api}/jobs?bank=BPN", "POST", statement_pdf(), headers=dict(alice, **{"X-User": "bob"}))
+    assert status == 202
+    try:
+        assert request(f"{api}/jobs/{job['id']}", headers=alice)[0] == 200
+        assert request(f"{api}/jobs/{job['id']}", headers=bob)[0] == 404
+
+        # Behind a trusted proxy the header names the user
+        monkeypatch.setattr(server, "TRUST_USER_HEADER", True)
+        assert request(f"{api}/jobs/{job['id']}", headers=dict(bob, **{"X-User": "alice"}))[0] == 200
+        assert request(f"{api}/jobs/{job['id']}", headers=dict(alice, **{"X-User": "bob"}))[0] == 404
+    finally:
+        monkeypatch.setattr(server, "TRUST_USER_HEADER", False)
+        request(f"{api}/jobs/{job['id']}", "DELETE", headers=alice)
+
+
+def test_token(api, monkeypatch):
+    monkeypatch.setattr(server, "TOKEN", "secret")
+    assert request(f"{api}/banks")[0] == 401
+    assert request(f"{api}/banks", headers={"Authorization": "Bearer secret"})[0] == 200
+
+
+def test_jobs(api):
+    status, job = request(f"{api}/jobs?bank=BPN", "POST", statement_pdf(40))
+    assert status == 202 and job["url"] == f"/jobs/{job['id']}"
+
+    deadline = time.monotonic() + 60
+    while job["status"] in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.05)
+        status, job = request(f"{api}/jobs/{job['id']}")
+        assert status == 200
+    assert job["status"] == "done" and job["accounts"] == 1
+
+    status, body = request(f"{api}/jobs/{job['id']}/result")
+    assert status == 200 and len(body["accounts"][0]) == 41
+
+    # X-User comes from clients unless a trusted proxy sets it
+    assert request(f"{api}/jobs/{job['id']}", headers={"X-User": "someone else"})[0] == 200
+
+    assert request(f"{api}/jobs/{job['id']}", "DELETE") == (200, {"id": job["id"], "status": "deleted"})
+    assert request(f"{api}/jobs/{job['id']}")[0] == 404
+
+
+def test_job_not_finished(api):
+    job = server.Job("api", "statement.pdf", server.Options({}), Future())
+    server._remember(job)
+    try:
+        status, body = request(f"{api}/jobs/{job.id}/result")
+        assert status == 409
+        assert body["id"] == job.id and body["status"] == "running"
+    finally:
+        job.future.cancel()
+        request(f"{api}/jobs/{job.id}", "DELETE")
+
+
+def test_unknown_job(api):
+    assert request(f"{api}/jobs/nothing")[0] == 404
+    assert request(f"{api}/jobs/nothing/result")[0] == 404
@@ -0,0 +1,55 @@
+import random
+from datetime import date
+
+import pytest
+
+from lib.parsers.bpn import BPNParser
+from tests.legacy_bpn import BPNParser as LegacyBPNParser
+from tests.pdfs import amount, statement_lines
+
+# Pages around the movements and lines the parser has to cope with
+SAMPLE = [
+    "BANCO PROVINCIA DEL NEUQUEN\nResumen de cuenta\nSaldo Anterior en $ : 19.607,54\n"
+    "02/01/2024  TRANSFERENCIA RECIBIDA  CBU 0970012  5.000,00   24.607,54\n"
+    "03/01/2024  COMISION MANTENIMIENTO  A12 B  1.250,50   23.357,04",
+    "Fecha  Descripción  Comprobante  Importe  Saldo\n"
+    "04/01/2024  PAGO TARJETA    23.357,04   0,00\n"
+    "05/01/2024  DEBITO AUTOMATICO  9.000,00   -9.000,00\n"
+    "05/01/2024  AJUSTE  0,00   -9.000,00\n"
+    "06/01/2024  SIN IMPORTE   -9.000,00\n"
+    "07/01/2024  DEPOSITO EFECTIVO  12.345,67   3.345,67\n"
+    "Saldo en $ : 3.345,67\n"
+    "09/01/2024  FUERA DE LA SECCION  1,00   3.346,67",
+]
+
+
+def generated(seed: int):
+    generator = random.Random(seed)
+    balance = generator.randint(0, 100000)
+    lines = [f"Saldo Anterior en $ : {amount(balance)}"]
+    for number in range(generator.randint(0, 40)):
+        value = generator.randint(0, 50000)
+        balance += value if generator.random() < 0.4 else -value
+        reference = f"  REF{generator.randint(1, 999)}" if generator.random() < 0.5 else ""
+        sign = "-" if balance < 0 else ""
+        lines.append(f"{number % 28 + 1:02d}/03/2024  MOVIMIENTO {number}{reference}  {amount(value)}   "
+                     f"{sign}{amount(abs(balance))}")
+    lines.append(f"Saldo en $ : {amount(abs(balance))}")
+    return ["\n".join(lines)]
+
+
+@pytest.mark.parametrize("data", [
+    SAMPLE,
+    ["\n".join(statement_lines(60, date(2024, 1, 1)))],
+    ["sin movimientos"],
+] + [generated(seed) for seed in range(50)])
+def test_bpn_template_matches_the_hand_written_parser(data):
+    assert BPNParser().parse(data) == LegacyBPNParser().parse(data)
+
+
+def test_bpn_template_reads_the_sample():
+    opening, *rows = BPNParser().parse(SAMPLE)[0]
+    assert opening["DETALLE"] == "Saldo Anterior" and opening["SALDO"] == 19607.54
+    assert rows[0]["REFERENCIA"] == "CBU 0970012" and rows[0]["CREDITOS"] == 5000.0
+    assert rows[1]["DEBITOS"] == 1250.5
+    assert len(rows) == 7
@@ -4,6 +4,7 @@ import json
 from sqlalchemy import text
 from datetime import datetime, timedelta
 from lib.data.usage import usage_tracker
+from lib.parsers.patterns import pattern_stats
 
 def get_month_range(selected_date):
     start_date = selected_date.replace(day=1)
@@ -100,5 +101,11 @@ if st.session_state.logged_in and st.session_state.username == "admin":
         )
     else:
         st.info("No usage data found for the selected period")
+
+    # Regex instrumentation, populated when CONVERTER_REGEX_STATS=1
+    regex_stats = pattern_stats()
+    if regex_stats:
+        with st.expander("Parser regex statistics"):
+            st.dataframe(pd.DataFrame(regex_stats))
 else:
     st.error("Access denied. Admin privileges required.")
\ No newline at end of file
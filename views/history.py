@@ -0,0 +1,76 @@
+import streamlit as st
+
+from lib.data.history import conversion_history
+from lib.export import EXCEL_MIME, available_formats, excel_workbook, export_rows
+from functools import partial
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_conversion(conversion_id: int, username: str, timestamp):
+    # Converting the same document again updates the row in place with a new
+    # timestamp, which keys a fresh entry instead of serving the old output
+    return conversion_history.load(conversion_id, username)
+
+
+def build_export(conversion_id: int, username: str, timestamp, position: int, format_name: str) -> bytes:
+    accounts = load_conversion(conversion_id, username, timestamp) or []
+    return export_rows(accounts[position] if position < len(accounts) else [], format_name)
+
+
+def build_workbook(conversion_id: int, username: str, timestamp) -> bytes:
+    return excel_workbook(load_conversion(conversion_id, username, timestamp) or [])
+
+
+if st.session_state.logged_in:
+    st.title("History")
+    st.write("Download any of your past conversions again, in any format, without uploading the PDF.")
+
+    username = st.session_state.get('username', 'anonymous')
+    history = conversion_history.get_user_history(username)
+
+    if not history:
+        st.info("You haven't converted any statement yet")
+    else:
+        st.dataframe([{
+            "Date": entry['timestamp'],
+            "File": entry['file_name'],
+            "Bank": entry['bank'],
+            "Scope": entry['scope'] or "Whole statement",
+            "Accounts": entry['accounts'],
+            "Movements": entry['movements']
+        } for entry in history], hide_index=True)
+
+        selected = st.selectbox(
+            "Conversion",
+            history,
+            format_func=lambda entry: f"{entry['timestamp']:%d/%m/%Y %H:%M} · {entry['file_name']} · {entry['bank']}"
+                                      + (f" · {entry['scope']}" if entry['scope'] else "")
+        )
+        export_format = st.selectbox(
+            "Format",
+            available_formats(),
+            format_func=lambda option: option.label,
+            key="history_export_format"
+        )
+
+        file_name = (selected['file_name'] or "statement").rsplit('.', 1)[0]
+
+        if selected['accounts'] > 1 and export_format.name == "xlsx":
+            st.download_button(
+                label="Download all accounts in one Excel file",
+                data=partial(build_workbook, selected['id'], username, selected['timestamp']),
+                file_name=f"{file_name}.xlsx",
+                mime=EXCEL_MIME,
+                on_click="ignore",
+                key=f"history_{selected['id']}_all"
+            )
+
+        for position in range(selected['accounts']):
+            st.download_button(
+                label=f"Download {export_format.label} file - Account {position + 1}",
+                data=partial(build_export, selected['id'], username, selected['timestamp'], position, export_format.name),
+                file_name=f"{file_name}_{position + 1}.{export_format.extension}",
+                mime=export_format.mime,
+                on_click="ignore",
+                key=f"history_{selected['id']}_{position}_{export_format.name}"
+            )
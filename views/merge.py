@@ -0,0 +1,86 @@
+import streamlit as st
+
+from lib.parsers.base import BankParser
+from lib.parsers.watchdog import ParseGuardError
+from lib.merge import merge_statements
+from lib.api.file import stats
+from lib.executor import executor
+from lib.data.usage import usage_tracker
+from lib.export import available_formats, export_rows
+from lib import debug
+from functools import partial
+
+
+if st.session_state.logged_in:
+    st.title("Merge statements")
+    st.write("Upload consecutive or overlapping statements of one account to get a single continuous table.")
+
+    selected_bank = st.selectbox("Select a bank", BankParser.bank_names(), key="merge_bank_select")
+    uploaded_files = st.file_uploader("Upload your PDFs", type=['pdf'], accept_multiple_files=True)
+    account_number = st.number_input("Account", min_value=1, value=1, help="Position of the account in multi-account statements")
+
+    if uploaded_files and st.button("Merge PDFs"):
+        st.session_state.merged_statement = None
+
+        with st.spinner("Merging statements..."), debug.capture() as diagnostics:
+            try:
+                documents = [file.getvalue() for file in uploaded_files]
+                # Queued on the shared executor like any conversion, sized by its pages
+                merged = executor.submit(
+                    st.session_state.get('username', 'anonymous'),
+                    sum(stats(document)['pages'] for document in documents),
+                    merge_statements, selected_bank, documents, account_number - 1
+                ).result()
+            except (ParseGuardError, ValueError) as e:
+                st.error(str(e))
+                merged = None
+            except Exception as e:
+                debug.error("Merge failed: %s", e)
+                st.error(f"The statements couldn't be merged: {type(e).__name__}: {e}")
+                merged = None
+
+            if merged and merged.rows:
+                usage_tracker.record_conversion({
+                    'bank': selected_bank,
+                    'pages': sum(document['pages'] for document in merged.documents),
+                    'merged_documents': len(merged.documents)
+                })
+                st.session_state.merged_statement = merged
+            elif merged:
+                st.error("No movements found for this account")
+
+        st.session_state.merge_diagnostics = diagnostics.records()
+
+    if st.session_state.get('merge_diagnostics'):
+        with st.expander(f"Diagnostics ({len(st.session_state.merge_diagnostics)})"):
+            for record in st.session_state.merge_diagnostics:
+                st.text(f"[{record['level']}] {record['message']}")
+
+    merged = st.session_state.get('merged_statement')
+    if merged and uploaded_files:
+        summary = [{
+            "File": uploaded_files[document['document']].name if document['document'] < len(uploaded_files) else document['document'],
+            "Pages": document['pages'],
+            "Pages skipped": document['skipped_pages'],
+            "Overlapping rows": document['overlap_rows'],
+            "Connected": "✅" if document['connected'] else "⚠️"
+        } for document in merged.documents]
+        st.dataframe(summary, hide_index=True)
+
+        if not all(document['connected'] for document in merged.documents):
+            st.warning("Some statements don't continue the balance of the previous one, there may be missing movements")
+
+        export_format = st.selectbox(
+            "Format",
+            available_formats(),
+            format_func=lambda option: option.label,
+            key="merge_export_format"
+        )
+
+        st.download_button(
+            label=f"Download merged {export_format.label} file",
+            data=partial(export_rows, merged.rows, export_format.name),
+            file_name=f"{selected_bank}_merged.{export_format.extension}",
+            mime=export_format.mime,
+            on_click="ignore"
+        )
@@ -1,70 +1,489 @@
 import streamlit as st
-import pandas as pd
 
 from lib.parsers.base import BankParser
-from lib.api.file import stats
+from lib.parsers.watchdog import ParseGuardError
+from lib.conversion import can_reconvert, convert, convert_account, convert_range, conversion_stats, filter_range, reconvert
+from lib.parsers.accounts import account_directory, has_directory
+from lib.api.file import stats, first_page
+from lib.export import EXCEL_MIME, available_formats, excel_workbook, export_rows
+from lib.batch import bundle, iter_documents, process_batch
 from lib.data.usage import usage_tracker
-from io import BytesIO
+from lib.data.history import conversion_history
+from lib.progress import ConversionCancelled, Progress
+from lib.results import result_store
+from lib.executor import executor
+from lib import debug, extraction
+from functools import partial
+from concurrent.futures import TimeoutError as FutureTimeout
+import hashlib
+
+
+def stored_result(handle: str):
+    """
+    Accounts of a processed result; raises rather than exporting nothing
+    once it can't be had any more, so no empty file gets cached
+    """
+    accounts = result_store.get(handle)
+    if accounts is None:
+        raise ValueError("The result has expired, please convert the statement again")
+    return accounts
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def build_export(result_key: str, account_number: int, format_name: str, _handle: str, _position: int) -> bytes:
+    """
+    File of one account in the given format. Cached by the processed result
+    it belongs to, the account number and the format; the rows are only
+    loaded from the result store when the file is built.
+    """
+    accounts = stored_result(_handle)
+    return export_rows(accounts[_position] if _position < len(accounts) else [], format_name)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def build_workbook(result_key: str, account_numbers: tuple, _handle: str) -> bytes:
+    """
+    Single workbook with a sheet per account and a summary sheet
+    """
+    return excel_workbook(stored_result(_handle), [f"Account {number + 1}" for number in account_numbers])
+
+
+def keep_result(accounts, regenerate, source: bytes, engine_name: str, account_numbers, key: str):
+    """
+    Put a processed result in the result store, replacing the session's
+    previous one; the session only keeps its handle. The source document is
+    kept with it, so the result can be rebuilt once its extraction is evicted.
+    """
+    result_store.discard(st.session_state.get('processed_handle'))
+    st.session_state.processed_handle = result_store.put(
+        accounts, regenerate, source, partial(can_reconvert, extraction.document_key(source), engine_name))
+    st.session_state.processed_accounts = list(account_numbers)
+    st.session_state.processed_key = key
+
+
+def history_scope(date_range, account_numbers=None) -> str:
+    """
+    What part of the statement a conversion covers, for the history
+    """
+    parts = []
+    if account_numbers is not None:
+        parts.append("accounts " + ", ".join(str(number + 1) for number in account_numbers))
+    if date_range:
+        parts.append(f"{date_range[0]:%d/%m/%Y} - {date_range[1]:%d/%m/%Y}")
+    return " · ".join(parts)
+
+
+def clear_result():
+    result_store.discard(st.session_state.get('processed_handle'))
+    st.session_state.processed_handle = None
+
+
+def result_key(data: bytes, *settings) -> str:
+    """
+    Identifies a processed result: the document and what it was processed with
+    """
+    digest = hashlib.sha1(data)
+    for setting in settings:
+        digest.update(repr(setting).encode('utf-8'))
+    return digest.hexdigest()
+
+
+@st.fragment
+def downloads(file_name: str):
+    """
+    Download buttons of the processed accounts. Each file is built when its
+    button is clicked, and clicking doesn't rerun the page.
+    """
+    key = st.session_state.processed_key
+    handle = st.session_state.processed_handle
+    account_numbers = tuple(st.session_state.processed_accounts)
+
+    if not result_store.available(handle):
+        st.warning("This result is no longer available, please process the PDF again")
+        return
+
+    export_format = st.selectbox(
+        "Format",
+        available_formats(),
+        format_func=lambda option: option.label,
+        key="export_format"
+    )
+
+    if len(account_numbers) > 1 and export_format.name == "xlsx":
+        st.download_button(
+            label="Download all accounts in one Excel file",
+            data=partial(build_workbook, key, account_numbers, handle),
+            file_name=f"{file_name}.xlsx",
+            mime=EXCEL_MIME,
+            on_click="ignore",
+            key=f"download_{key}_all"
+        )
+
+    for position, account_number in enumerate(account_numbers):
+        account_index = account_number + 1
+        st.subheader(f"Account {account_index}")
+
+        st.download_button(
+            label=f"Download {export_format.label} file - Account {account_index}",
+            data=partial(build_export, key, account_number, export_format.name, handle, position),
+            file_name=f"{file_name}_{account_index}.{export_format.extension}",
+            mime=export_format.mime,
+            on_click="ignore",
+            key=f"download_{key}_{account_number}_{export_format.name}"
+        )
+
+
+# Seconds between refreshes of the progress of a queued or running conversion
+POLL_SECONDS = 0.5
+
+
+class StreamlitProgress(Progress):
+    """
+    Progress bar with the queue position, current page and ETA, and a
+    preview of the first movements while the rest of the document is
+    converted. The conversion runs on the shared executor; the page script
+    polls and draws its progress.
+    """
+    def __init__(self):
+        self.bar = st.progress(0.0, text="Starting")
+        self.preview_area = st.empty()
+        self.preview_rows = None
+        self.shown_preview = None
+        super().__init__(on_preview=self.keep_preview)
+
+    def keep_preview(self, rows):
+        self.preview_rows = rows
+
+    def show(self):
+        self.bar.progress(self.fraction(), text=self.describe())
+        if self.preview_rows is not None and self.shown_preview is not self.preview_rows:
+            self.shown_preview = self.preview_rows
+            with self.preview_area.container():
+                st.caption(f"Preview: first {len(self.preview_rows)} movements")
+                st.dataframe(self.preview_rows, hide_index=True)
+
+    def wait(self, future):
+        """
+        Result of the conversion submitted as future. A rerun (e.g. Cancel)
+        interrupts the wait and cancels the conversion.
+        """
+        try:
+            while True:
+                try:
+                    return future.result(timeout=POLL_SECONDS)
+                except FutureTimeout:
+                    pass
+                position = executor.position(future)
+                if position is not None:
+                    ahead = "next in line" if position == 0 else f"{position} ahead"
+                    self.bar.progress(0.0, text=f"Waiting for a free worker ({ahead})")
+                else:
+                    self.show()
+        finally:
+            if not future.done():
+                self.cancel()
+                future.cancel()
+
+    def clear(self):
+        self.bar.empty()
+        self.preview_area.empty()
+
+
+def process_document(bank_name: str, data: bytes, engine_name: str, date_range, progress: Progress):
+    """
+    Conversion run on the executor. Multi-account statements only get their
+    account directory, to parse the accounts the user picks.
+    Returns (directory, conversion, parse error).
+    """
+    directory = None
+    try:
+        if has_directory(bank_name):
+            progress.start("extract")
+            pages = extraction.extract(data, engine_name, progress.page)
+            directory = account_directory(bank_name, pages) if pages else None
+            if directory is not None and len(directory) > 1:
+                return directory, None, None
+
+        if date_range:
+            return directory, convert_range(bank_name, data, *date_range, progress=progress), None
+        return directory, convert(bank_name, data, progress=progress), None
+    except ConversionCancelled:
+        raise
+    except Exception as e:
+        if not isinstance(e, ParseGuardError):
+            debug.error("Conversion with the %s parser failed: %s", bank_name, e)
+        return directory, None, e
+
+
+def conversion_error(error: Exception) -> str:
+    """
+    Message shown for a conversion that raised
+    """
+    if isinstance(error, ParseGuardError):
+        return str(error)
+    return f"Error processing the PDF ({type(error).__name__}: {error})"
+
+
+def process_accounts(bank_name: str, data: bytes, engine_name: str, directory, indexes, date_range):
+    pages = extraction.extract(data, engine_name)
+    accounts = [convert_account(bank_name, pages, directory, index) for index in indexes]
+    if date_range:
+        accounts = filter_range(accounts, *date_range)
+    return pages, accounts
+
+
+def submit(data: bytes, fn, *args):
+    """
+    Queue a conversion of data for the current user on the shared executor,
+    sized by its page count
+    """
+    return executor.submit(st.session_state.get('username', 'anonymous'), stats(data)['pages'], fn, *args)
+
+
+STATUS_ICONS = {"done": "✅", "failed": "❌", "skipped": "⚠️"}
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def build_bundle(batch_key: str, format_name: str, _items) -> bytes:
+    return bundle(_items, format_name, lambda item: stored_result(item.handle))
+
+
+def batch_rows(items):
+    return [{
+        "File": item.name,
+        "Bank": item.bank or "",
+        "Status": f"{STATUS_ICONS.get(item.status, '')} {item.status}",
+        "Accounts": item.account_count,
+        "Extraction": item.conversion.engine if item.conversion else "",
+        "Error": item.error or ""
+    } for item in items]
+
+
+def batch(uploaded_files, selected_bank: str):
+    """
+    Convert many PDFs, or the PDFs of ZIP archives, concurrently and offer
+    all the outputs as one ZIP
+    """
+    upload_ids = ','.join(uploaded.file_id for uploaded in uploaded_files)
+    detect = st.checkbox("Detect the bank of each file", value=True, key="batch_detect")
+    if detect:
+        st.caption("Files whose bank isn't recognised are skipped")
+    else:
+        st.caption(f"Every file is converted as {selected_bank}")
+
+    if st.button(f"Process {len(uploaded_files)} uploads"):
+        for item in st.session_state.get('batch_items') or []:
+            result_store.discard(item.handle)
+        st.session_state.batch_items = None
+        documents = (document for uploaded in uploaded_files for document in iter_documents(uploaded.name, uploaded.getvalue()))
+        finished = []
+
+        with st.status("Processing files...", expanded=True) as status:
+            table = st.empty()
+
+            def on_done(item):
+                finished.append(item)
+                if item.status == "done":
+                    usage_tracker.record_conversion(item.stats)
+                    conversion_history.record(item.document_key, item.bank, item.name, item.conversion.accounts)
+                    # The session keeps only a handle to the accounts
+                    item.handle = result_store.put(item.conversion.accounts)
+                    item.conversion.accounts = None
+                table.dataframe(batch_rows(finished), hide_index=True)
+                status.update(label=f"Processed {len(finished)} files...")
+
+            items = process_batch(documents, None if detect else selected_bank,
+                                  st.session_state.get('username', 'anonymous'), on_done=on_done)
+            converted = sum(item.status == "done" for item in items)
+            status.update(label=f"Converted {converted} of {len(items)} files",
+                          state="complete" if converted == len(items) else "error")
+
+        st.session_state.batch_items = items
+        st.session_state.batch_key = result_key(upload_ids.encode('utf-8'), None if detect else selected_bank)
+        st.session_state.batch_uploads = upload_ids
+
+    items = st.session_state.get('batch_items')
+    if items and st.session_state.get('batch_uploads') == upload_ids:
+        st.dataframe(batch_rows(items), hide_index=True)
+        batch_downloads(st.session_state.batch_key, items)
+
+
+@st.fragment
+def batch_downloads(key: str, items):
+    if not any(item.status == "done" for item in items):
+        return
+    export_format = st.selectbox(
+        "Format",
+        available_formats(),
+        format_func=lambda option: option.label,
+        key="batch_export_format"
+    )
+    st.download_button(
+        label=f"Download all as ZIP ({export_format.label})",
+        data=partial(build_bundle, key, export_format.name, items),
+        file_name=f"converted_{export_format.extension}.zip",
+        mime="application/zip",
+        on_click="ignore",
+        key=f"bundle_{key}_{export_format.name}"
+    )
 
 
 if st.session_state.logged_in:
     st.title("PDF Transformer")
 
+    uploaded_files = st.file_uploader(
+        "Upload your PDF, several PDFs or a ZIP of PDFs",
+        type=['pdf', 'zip'],
+        accept_multiple_files=True
+    )
+
+    # A single PDF gets the interactive flow, anything else is a batch
+    single = len(uploaded_files) == 1 and uploaded_files[0].name.lower().endswith('.pdf')
+    uploaded_file = uploaded_files[0] if single else None
+    batch_files = uploaded_files if uploaded_files and not single else None
+
+    # Detect the bank once per upload and preselect it
+    if uploaded_file is not None and st.session_state.get('detected_file_id') != uploaded_file.file_id:
+        st.session_state.detected_file_id = uploaded_file.file_id
+        st.session_state.account_directory = None
+        clear_result()
+        detected_bank, confidence = BankParser.detect_bank(first_page(uploaded_file.getvalue()))
+        st.session_state.detected_bank = (detected_bank, confidence)
+        if detected_bank:
+            st.session_state.bank_select = detected_bank
+
     selected_bank = st.selectbox(
         "Select a bank",
         BankParser.bank_names(),
         key="bank_select"
     )
 
-    uploaded_file = st.file_uploader("Upload your PDF", type=['pdf'])
+    if uploaded_file is not None and st.session_state.get('detected_bank', (None, 0.0))[0]:
+        detected_bank, confidence = st.session_state.detected_bank
+        st.caption(f"Detected bank: {detected_bank} (confidence {confidence:.0%})")
 
     st.write(f"{selected_bank} status: {BankParser.get_parser_status(selected_bank)}")
 
+    # Extract in the background while the user checks the bank, so that
+    # processing only has to parse
+    if uploaded_file is not None:
+        first_engine = BankParser.get_engine_chain(selected_bank)[0].name
+        extraction.speculate(uploaded_file.getvalue(), [first_engine])
+        if extraction.status(uploaded_file.getvalue(), first_engine) == "running":
+            st.caption("Reading the document in the background...")
+
+    if batch_files:
+        batch(batch_files, selected_bank)
+
+    date_range = None
     if uploaded_file is not None:
         st.write("File uploaded successfully!")
 
+        if st.toggle("Only a date range", key="use_date_range"):
+            selected_range = st.date_input("Date range", value=(), format="DD/MM/YYYY", key="date_range")
+            if len(selected_range) == 2:
+                date_range = selected_range
+
         if st.button("Process PDF"):
-            st.session_state.processed_data = None
+            clear_result()
+            st.session_state.account_directory = None
 
-            with st.spinner("Processing PDF..."):
-                parser = BankParser.get_parser_api(selected_bank)
+            # Clicking Cancel reruns the page, which stops this run
+            st.button("Cancel", key="cancel_processing")
+            progress = StreamlitProgress()
+
+            with debug.capture() as diagnostics:
                 bytes_data = uploaded_file.read()
-                data = parser(bytes_data)
-
-                if data:
-                    parser = BankParser.get_parser(selected_bank)
-                    parsed_data = parser.parse(data)
-                    #st.write(parsed_data)
-
-                    if parsed_data:
-                        file_stats = stats(bytes_data)
-                        file_stats['bank'] = selected_bank
-                        usage_tracker.record_conversion(file_stats)
-                        st.success("PDF processed successfully!")
-                        st.session_state.processed_data = parsed_data
-                    else:
-                        st.error("Error parsing the data")
-                        st.session_state.processed_data = None
+
+                # Multi-account statements: list the accounts first and parse
+                # only the ones the user picks
+                directory, conversion, parse_error = progress.wait(
+                    submit(bytes_data, process_document, selected_bank, bytes_data, first_engine, date_range, progress)
+                )
+                multi_account = directory is not None and len(directory) > 1
+
+                progress.clear()
+                if multi_account:
+                    st.session_state.account_directory = (selected_bank, first_engine, directory)
+                elif conversion:
+                    file_stats = stats(bytes_data)
+                    file_stats['bank'] = selected_bank
+                    file_stats.update(conversion_stats(conversion))
+                    usage_tracker.record_conversion(file_stats)
+                    st.success(f"PDF processed successfully! (extraction: {conversion.engine})")
+                    if not conversion.reconciled:
+                        st.warning("The balances don't add up with any extraction method, please review the result")
+                    conversion_history.record(extraction.document_key(bytes_data), selected_bank, uploaded_file.name,
+                                              conversion.accounts, history_scope(date_range))
+                    keep_result(
+                        conversion.accounts,
+                        partial(reconvert, selected_bank, extraction.document_key(bytes_data), conversion.engine, date_range),
+                        bytes_data,
+                        conversion.engine,
+                        range(len(conversion.accounts)),
+                        result_key(bytes_data, selected_bank, date_range)
+                    )
+                elif parse_error:
+                    st.error(conversion_error(parse_error))
                 else:
                     st.error("Error processing the PDF")
-                    st.session_state.processed_data = None
 
-    # Display download buttons if data has been processed
-    if 'processed_data' in st.session_state and st.session_state.processed_data:
-        file_name = uploaded_file.name.rsplit('.', 1)[0]
+            st.session_state.diagnostics = diagnostics.records()
+
+    if uploaded_file is not None and st.session_state.get('account_directory'):
+        bank_name, engine_name, directory = st.session_state.account_directory
+        selected_accounts = st.multiselect(
+            f"{len(directory)} accounts found, select the ones to convert",
+            directory,
+            format_func=lambda entry: entry.label()
+        )
 
-        for account_index, account_data in enumerate(st.session_state.processed_data, 1):
-            st.subheader(f"Account {account_index}")
+        if selected_accounts and st.button("Convert selected accounts"):
+            clear_result()
 
-            df = pd.DataFrame(account_data)
+            st.button("Cancel", key="cancel_accounts")
+            progress = StreamlitProgress()
 
-            excel_buffer = BytesIO()
-            df.to_excel(excel_buffer, index=False, engine='openpyxl')
-            excel_buffer.seek(0)
+            with debug.capture() as diagnostics:
+                try:
+                    pages, accounts = progress.wait(submit(
+                        uploaded_file.getvalue(), process_accounts, bank_name, uploaded_file.getvalue(), engine_name,
+                        directory, [entry.index for entry in selected_accounts], date_range
+                    ))
+                except Exception as e:
+                    # Reruns (e.g. Cancel) aren't Exceptions and still stop the run
+                    st.error(conversion_error(e))
+                    accounts = None
 
-            st.download_button(
-                label=f"Download Excel file - Account {account_index}",
-                data=excel_buffer,
-                file_name=f"{file_name}_{account_index}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
\ No newline at end of file
+                progress.clear()
+                if accounts and any(accounts):
+                    usage_tracker.record_conversion({
+                        'pages': len(pages),
+                        'bank': bank_name,
+                        'accounts': len(selected_accounts)
+                    })
+                    st.success("Accounts processed successfully!")
+                    indexes = [entry.index for entry in selected_accounts]
+                    conversion_history.record(extraction.document_key(uploaded_file.getvalue()), bank_name, uploaded_file.name,
+                                              accounts, history_scope(date_range, indexes))
+                    keep_result(
+                        accounts,
+                        partial(reconvert, bank_name, extraction.document_key(uploaded_file.getvalue()), engine_name, date_range, indexes),
+                        uploaded_file.getvalue(),
+                        engine_name,
+                        indexes,
+                        result_key(uploaded_file.getvalue(), bank_name, date_range)
+                    )
+                elif accounts is not None:
+                    st.error("Error parsing the data")
+
+            st.session_state.diagnostics = diagnostics.records()
+
+    if st.session_state.get('diagnostics'):
+        with st.expander(f"Diagnostics ({len(st.session_state.diagnostics)})"):
+            for record in st.session_state.diagnostics:
+                st.text(f"[{record['level']}] {record['message']}")
+
+    # Display download buttons if data has been processed
+    if uploaded_file is not None and st.session_state.get('processed_handle'):
+        downloads(uploaded_file.name.rsplit('.', 1)[0])